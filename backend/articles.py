@@ -0,0 +1,562 @@
+import asyncio
+import contextlib
+import ipaddress
+import logging
+import os
+import re
+import socket
+import time
+from html.parser import HTMLParser
+from urllib.parse import parse_qsl, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpcore
+import httpx
+
+import cache
+import metrics
+import singleflight
+
+logger = logging.getLogger(__name__)
+
+# Server-side page fetching for /detect/url. Pages come through one pooled client with
+# a concurrency cap per host; the main article is extracted from the HTML and cached
+# under the canonical URL. A cached article younger than ARTICLE_FRESH_SECONDS is used
+# as is; after that it is revalidated with If-None-Match/If-Modified-Since, so an
+# unchanged page costs a 304 instead of a download and a re-extraction.
+URL_FETCH_TIMEOUT = float(os.getenv("URL_FETCH_TIMEOUT", "10"))
+URL_MAX_BYTES = int(os.getenv("URL_MAX_BYTES", str(3 * 1024 * 1024)))
+URL_MAX_REDIRECTS = int(os.getenv("URL_MAX_REDIRECTS", "5"))
+URL_MAX_CONNECTIONS = int(os.getenv("URL_MAX_CONNECTIONS", "64"))
+URL_PER_HOST_CONCURRENCY = int(os.getenv("URL_PER_HOST_CONCURRENCY", "4"))
+URL_USER_AGENT = os.getenv("URL_USER_AGENT", "AbangKaripapBot/1.0 (+https://abangkaripap.onrender.com)")
+# Refuse hosts that resolve to loopback/private/link-local addresses (the fixture server needs this on)
+URL_ALLOW_PRIVATE = os.getenv("URL_ALLOW_PRIVATE", "false").lower() in ("1", "true", "yes")
+ARTICLE_FRESH_SECONDS = int(os.getenv("ARTICLE_FRESH_SECONDS", "600"))
+ARTICLE_MIN_CHARS = int(os.getenv("ARTICLE_MIN_CHARS", "200"))
+
+# Query parameters that only track the visitor; dropped from the cache key
+TRACKING_PARAMS = re.compile(r"^(utm_\w+|fbclid|gclid|dclid|msclkid|igshid|mc_cid|mc_eid|ref_src|_ga|yclid|spm)$", re.I)
+HTML_TYPES = ("text/html", "application/xhtml+xml")
+
+
+class FetchError(Exception):
+    """A page that can't be analysed; status_code is what /detect/url answers with"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def canonical_url(url):
+    """Normalise a URL for caching: lower-case scheme/host, no default port, fragment or tracking parameters"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    if scheme not in ("http", "https") or not parts.hostname:
+        raise FetchError(400, "URL must be an absolute http(s) URL")
+    host = parts.hostname.lower().rstrip(".")
+    if ":" in host:
+        host = f"[{host}]"
+    try:
+        port = parts.port
+    except ValueError:
+        raise FetchError(400, "URL has an invalid port") from None
+    if port and port != {"http": 80, "https": 443}[scheme]:
+        host = f"{host}:{port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if not TRACKING_PARAMS.match(k))
+    return urlunsplit((scheme, host, parts.path or "/", urlencode(query), ""))
+
+
+# EXTRACTION
+# A dependency-free readability-style pass: text blocks (paragraphs, headings, list
+# items) are credited to their enclosing container, boilerplate subtrees are skipped,
+# and the container holding the most paragraph text wins; <article>/<main> and
+# articleBody markup get a head start.
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "nav", "header", "footer", "aside", "form",
+             "button", "select", "iframe", "object", "canvas", "figure"}
+BLOCK_TAGS = {"p", "h1", "h2", "h3", "h4", "h5", "h6", "li", "blockquote", "pre", "td", "dd", "figcaption"}
+CONTAINER_TAGS = {"body", "article", "main", "section", "div", "td"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+BOILERPLATE_HINTS = re.compile(
+    r"comment|sidebar|footer|masthead|menu|navbar|breadcrumb|share|social|related|recommend|promo|sponsor|"
+    r"advert|\bads?\b|ad-|banner|cookie|consent|subscribe|newsletter|signup|popup|modal|outbrain|taboola",
+    re.I,
+)
+CONTENT_HINTS = re.compile(r"article|story|content|post-body|entry|main-text|body-text", re.I)
+_SPACES = re.compile(r"[ \t\r\f\v\u00a0]+")
+
+
+class _ArticleParser(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []            # (tag, container index or None)
+        self.skip_depth = 0
+        self.containers = []       # {"tag", "parent", "bonus"}
+        self.blocks = []           # [container index, tag, text parts]
+        self.open_block = None
+        self.meta = {}
+        self.title_parts = None
+        self.title = ""
+        self.h1 = None
+
+    def _container(self):
+        for _, index in reversed(self.stack):
+            if index is not None:
+                return index
+        return None
+
+    def _close_block(self):
+        self.open_block = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = {name: value or "" for name, value in attrs}
+        if tag == "meta":
+            key = (attrs.get("property") or attrs.get("name") or "").lower()
+            if key in ("og:title", "og:url", "og:description", "description", "article:published_time", "twitter:title"):
+                self.meta.setdefault(key, attrs.get("content", "").strip())
+            return
+        if tag == "link" and "canonical" in attrs.get("rel", "").lower().split():
+            self.meta.setdefault("canonical", attrs.get("href", "").strip())
+            return
+        if tag == "html" and attrs.get("lang"):
+            self.meta.setdefault("lang", attrs["lang"])
+        if tag == "title":
+            if self.title_parts is None:
+                self.title_parts = []
+            return
+        if tag in VOID_TAGS:
+            if tag == "br" and self.open_block is not None:
+                self.open_block[2].append("\n")
+            return
+
+        # Browsers close an open <p> when a new block starts; do the same
+        if tag in BLOCK_TAGS or tag in CONTAINER_TAGS:
+            while self.stack and self.stack[-1][0] == "p":
+                self.handle_endtag("p")
+
+        hints = f"{attrs.get('class', '')} {attrs.get('id', '')} {attrs.get('role', '')}"
+        skip = (self.skip_depth > 0 or tag in SKIP_TAGS or attrs.get("aria-hidden") == "true"
+                or attrs.get("role") in ("navigation", "complementary", "banner", "contentinfo")
+                or (tag not in ("body", "article", "main") and BOILERPLATE_HINTS.search(hints) is not None))
+        if skip:
+            self.skip_depth += 1
+            self.stack.append((tag, None))
+            return
+
+        index = None
+        if tag in CONTAINER_TAGS:
+            bonus = 1.0
+            if tag in ("article", "main") or attrs.get("itemprop") == "articleBody":
+                bonus = 1.6
+            elif CONTENT_HINTS.search(hints):
+                bonus = 1.25
+            index = len(self.containers)
+            self.containers.append({"tag": tag, "parent": self._container(), "bonus": bonus})
+        self.stack.append((tag, index))
+        if tag in BLOCK_TAGS:
+            self.open_block = [self._container(), tag, []]
+            self.blocks.append(self.open_block)
+            if tag == "h1" and self.h1 is None:
+                self.h1 = self.open_block
+
+    def handle_endtag(self, tag):
+        if tag == "title" and self.title_parts is not None and not self.title:
+            self.title = "".join(self.title_parts).strip()
+            return
+        if not any(open_tag == tag for open_tag, _ in self.stack):
+            return
+        while self.stack:
+            open_tag, _ = self.stack.pop()
+            if self.skip_depth > 0:
+                self.skip_depth -= 1
+            elif open_tag in BLOCK_TAGS:
+                self._close_block()
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.title_parts is not None and not self.title:
+            self.title_parts.append(data)
+            return
+        if self.skip_depth > 0:
+            return
+        if self.open_block is None:
+            if not data.strip():
+                return
+            # Loose text directly inside a container (e.g. <div>text<br>text</div>)
+            self.open_block = [self._container(), "div", []]
+            self.blocks.append(self.open_block)
+        self.open_block[2].append(data)
+
+
+def _clean(text):
+    lines = (_SPACES.sub(" ", line).strip() for line in text.split("\n"))
+    return "\n".join(line for line in lines if line)
+
+
+def extract_article(html, url=None):
+    """Main article of an HTML page: {"title", "text", "canonical", "lang", "published"}"""
+    parser = _ArticleParser()
+    parser.feed(html)
+    parser.close()
+
+    blocks = []
+    for container, tag, parts in parser.blocks:
+        text = _clean("".join(parts))
+        if text:
+            blocks.append((container, tag, text))
+
+    # Score containers by their paragraph text, with half credit to the parent
+    scores = {}
+    for container, tag, text in blocks:
+        if container is None or (len(text) < 25 and not tag.startswith("h")):
+            continue
+        weight = len(text) * (1.0 if tag in ("p", "blockquote", "pre") else 0.5)
+        scores[container] = scores.get(container, 0.0) + weight
+        parent = parser.containers[container]["parent"]
+        if parent is not None:
+            scores[parent] = scores.get(parent, 0.0) + weight / 2
+    best = max(scores, key=lambda index: scores[index] * parser.containers[index]["bonus"], default=None)
+
+    def inside(container, root):
+        while container is not None:
+            if container == root:
+                return True
+            container = parser.containers[container]["parent"]
+        return False
+
+    def collect(root):
+        body = []
+        for container, tag, text in blocks:
+            if root is not None and not inside(container, root):
+                continue
+            # Drop one-line fragments (bylines, "Read more", share counts) unless they are headings
+            if len(text) < 25 and not tag.startswith("h"):
+                continue
+            if not body or body[-1] != text:
+                body.append(text)
+        return body
+
+    title = (parser.meta.get("og:title") or parser.meta.get("twitter:title")
+             or (_clean("".join(parser.h1[2])) if parser.h1 else "") or _clean(parser.title))
+    body = collect(best)
+    # A winner this small usually means the story isn't in one container; keep every non-boilerplate block
+    if best is not None and sum(len(text) for text in body) < ARTICLE_MIN_CHARS:
+        body = collect(None)
+    if body and title and body[0] == title:
+        body = body[1:]
+
+    canonical = parser.meta.get("canonical") or parser.meta.get("og:url")
+    return {
+        "title": title,
+        "text": "\n\n".join(body),
+        "canonical": urljoin(url, canonical) if canonical and url else canonical,
+        "lang": parser.meta.get("lang"),
+        "published": parser.meta.get("article:published_time"),
+    }
+
+
+# FETCHING
+_META_CHARSET = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.I)
+
+
+def decode_html(body, content_type):
+    """Decode with the header charset, else the <meta charset> in the first 4 KB, else UTF-8"""
+    match = re.search(r"charset=([\w-]+)", content_type or "", re.I)
+    charset = match.group(1) if match else None
+    if charset is None:
+        meta = _META_CHARSET.search(body[:4096])
+        charset = meta.group(1).decode("ascii") if meta else "utf-8"
+    try:
+        return body.decode(charset, errors="replace")
+    except LookupError:
+        return body.decode("utf-8", errors="replace")
+
+
+async def public_addresses(host, port):
+    """Resolve a host, refusing it if any address is internal, so /detect/url can't probe the server's network"""
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except socket.gaierror:
+        raise FetchError(502, f"Could not resolve {host}") from None
+    addresses = []
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%")[0])
+        if not address.is_global:
+            raise FetchError(400, "URL points to a private or reserved address")
+        addresses.append(str(address))
+    return list(dict.fromkeys(addresses))
+
+
+class PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """Network backend that connects only to the addresses it has just checked.
+
+    Checking a host before handing the URL to httpx would resolve it twice, and a host
+    whose DNS answer changes in between (rebinding) could pass the check and then
+    connect to an internal address. TLS and the Host header still use the hostname.
+    """
+
+    def __init__(self):
+        self.inner = httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        if URL_ALLOW_PRIVATE:
+            return await self.inner.connect_tcp(host, port, timeout, local_address, socket_options)
+        error = None
+        for address in await public_addresses(host, port):
+            try:
+                return await self.inner.connect_tcp(address, port, timeout, local_address, socket_options)
+            except httpcore.ConnectError as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("Unix sockets are not fetched")
+
+    async def sleep(self, seconds):
+        await self.inner.sleep(seconds)
+
+
+# httpcore errors surface as the httpx ones _fetch handles; most specific first
+_HTTPCORE_ERRORS = (
+    (httpcore.ConnectTimeout, httpx.ConnectTimeout),
+    (httpcore.ReadTimeout, httpx.ReadTimeout),
+    (httpcore.WriteTimeout, httpx.WriteTimeout),
+    (httpcore.PoolTimeout, httpx.PoolTimeout),
+    (httpcore.TimeoutException, httpx.TimeoutException),
+    (httpcore.ConnectError, httpx.ConnectError),
+    (httpcore.ReadError, httpx.ReadError),
+    (httpcore.WriteError, httpx.WriteError),
+    (httpcore.NetworkError, httpx.NetworkError),
+    (httpcore.UnsupportedProtocol, httpx.UnsupportedProtocol),
+    (httpcore.RemoteProtocolError, httpx.RemoteProtocolError),
+    (httpcore.LocalProtocolError, httpx.LocalProtocolError),
+    (httpcore.ProtocolError, httpx.ProtocolError),
+)
+
+
+@contextlib.contextmanager
+def _httpx_errors():
+    try:
+        yield
+    except Exception as e:
+        for source, target in _HTTPCORE_ERRORS:
+            if isinstance(e, source):
+                raise target(str(e)) from e
+        raise
+
+
+class _ResponseStream(httpx.AsyncByteStream):
+    def __init__(self, stream):
+        self.stream = stream
+
+    async def __aiter__(self):
+        with _httpx_errors():
+            async for part in self.stream:
+                yield part
+
+    async def aclose(self):
+        await self.stream.aclose()
+
+
+class PublicAddressTransport(httpx.AsyncBaseTransport):
+    """httpx transport over an httpcore pool built with PublicAddressBackend.
+
+    httpx.AsyncHTTPTransport can't be given a network backend, and setting one on its
+    private pool would silently stop guarding if httpx renamed the attribute.
+    """
+
+    def __init__(self, limits):
+        self.pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=PublicAddressBackend(),
+        )
+
+    async def handle_async_request(self, request):
+        core_request = httpcore.Request(
+            method=request.method,
+            url=httpcore.URL(
+                scheme=request.url.raw_scheme,
+                host=request.url.raw_host,
+                port=request.url.port,
+                target=request.url.raw_path,
+            ),
+            headers=request.headers.raw,
+            content=request.stream,
+            extensions=request.extensions,
+        )
+        with _httpx_errors():
+            response = await self.pool.handle_async_request(core_request)
+        return httpx.Response(
+            status_code=response.status,
+            headers=response.headers,
+            stream=_ResponseStream(response.stream),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.pool.aclose()
+
+
+class ArticleFetcher:
+    """Pooled page fetcher with a per-host concurrency cap and a revalidating article cache"""
+
+    def __init__(self, article_cache):
+        self.cache = article_cache
+        self.flights = singleflight.SingleFlight("article")
+        self._client = None
+        self._host_limits = {}
+        self.fresh = 0
+        self.revalidated = 0
+        self.downloaded = 0
+        self.errors = 0
+
+    def client(self):
+        if self._client is None or self._client.is_closed:
+            transport = PublicAddressTransport(
+                httpx.Limits(max_connections=URL_MAX_CONNECTIONS, max_keepalive_connections=URL_MAX_CONNECTIONS // 2)
+            )
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                timeout=URL_FETCH_TIMEOUT,
+                headers={"User-Agent": URL_USER_AGENT, "Accept": "text/html,application/xhtml+xml;q=0.9,text/plain;q=0.5"},
+                follow_redirects=False,
+            )
+        return self._client
+
+    @contextlib.asynccontextmanager
+    async def _host_limit(self, host):
+        """Per-host concurrency cap; a host's semaphore is dropped once nobody holds or waits on it"""
+        entry = self._host_limits.get(host)
+        if entry is None:
+            entry = self._host_limits[host] = {"semaphore": asyncio.Semaphore(URL_PER_HOST_CONCURRENCY), "users": 0}
+        entry["users"] += 1
+        try:
+            async with entry["semaphore"]:
+                yield
+        finally:
+            entry["users"] -= 1
+            if entry["users"] == 0:
+                del self._host_limits[host]
+
+    async def get(self, url):
+        """Article for a URL: from cache, revalidated, or freshly fetched and extracted.
+
+        Adds "cache": "fresh" | "revalidated" | "miss" to the returned article; raises FetchError.
+        """
+        key = canonical_url(url)
+        article = await self.flights.do(key, lambda: self._load(key))
+        return dict(article)
+
+    async def _load(self, key):
+        cached = await self.cache.get(cache.url_key(key))
+        if cached is not None and time.time() - cached["fetched_at"] < ARTICLE_FRESH_SECONDS:
+            self.fresh += 1
+            metrics.ARTICLE_FETCHES.inc(outcome="fresh")
+            return {**cached, "cache": "fresh"}
+
+        validators = {}
+        if cached is not None:
+            if cached.get("etag"):
+                validators["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                validators["If-Modified-Since"] = cached["last_modified"]
+        try:
+            response, body, final_url = await self._fetch(key, validators)
+        except FetchError:
+            self.errors += 1
+            metrics.ARTICLE_FETCHES.inc(outcome="error")
+            raise
+
+        if response.status_code == 304 and cached is not None:
+            self.revalidated += 1
+            metrics.ARTICLE_FETCHES.inc(outcome="revalidated")
+            article = {**cached, "fetched_at": time.time()}
+            await self.cache.set(cache.url_key(key), article)
+            return {**article, "cache": "revalidated"}
+
+        content_type = response.headers.get("content-type", "")
+        if content_type.split(";")[0].strip().lower() == "text/plain":
+            extracted = {"title": "", "text": _clean(decode_html(body, content_type)), "canonical": None,
+                         "lang": None, "published": None}
+        else:
+            with metrics.STAGE_SECONDS.time(stage="article_extract"):
+                extracted = await asyncio.to_thread(extract_article, decode_html(body, content_type), final_url)
+        self.downloaded += 1
+        metrics.ARTICLE_FETCHES.inc(outcome="downloaded")
+
+        article = {
+            "url": canonical_url(final_url),
+            **extracted,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+            "fetched_at": time.time(),
+        }
+        await self.cache.set(cache.url_key(key), article)
+        # Other links to the same story (redirects, rel=canonical) hit the same entry next time.
+        # A page only speaks for its own host: a canonical pointing at another site is ignored,
+        # or any page could overwrite the cached article for someone else's URL.
+        host = urlsplit(final_url).hostname
+        for alias in {article["url"], article["canonical"]} - {key, None}:
+            try:
+                alias = canonical_url(alias)
+            except FetchError:
+                continue
+            if urlsplit(alias).hostname == host:
+                await self.cache.set(cache.url_key(alias), article)
+        return {**article, "cache": "miss"}
+
+    @metrics.timed("article_fetch")
+    async def _fetch(self, url, headers):
+        """GET with manual redirects (each connection's address is checked), the per-host limit and the size cap"""
+        for _ in range(URL_MAX_REDIRECTS + 1):
+            host = urlsplit(url).hostname
+            async with self._host_limit(host):
+                try:
+                    async with self.client().stream("GET", url, headers=headers) as response:
+                        if response.status_code == 304:
+                            return response, b"", url
+                        if response.has_redirect_location:
+                            url = urljoin(url, response.headers["location"])
+                            if urlsplit(url).scheme not in ("http", "https"):
+                                raise FetchError(502, "Page redirected to a non-http(s) URL")
+                            continue
+                        if response.status_code != 200:
+                            raise FetchError(502, f"Page returned HTTP {response.status_code}")
+                        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+                        if content_type not in HTML_TYPES + ("text/plain",):
+                            raise FetchError(415, f"Unsupported page type {content_type or 'unknown'}")
+                        declared = response.headers.get("content-length", "")
+                        if declared.isdigit() and int(declared) > URL_MAX_BYTES:
+                            raise FetchError(502, f"Page exceeds {URL_MAX_BYTES // (1024 * 1024)} MB")
+                        body = bytearray()
+                        async for chunk in response.aiter_bytes():
+                            body.extend(chunk)
+                            if len(body) > URL_MAX_BYTES:
+                                raise FetchError(502, f"Page exceeds {URL_MAX_BYTES // (1024 * 1024)} MB")
+                        return response, bytes(body), url
+                except httpx.TimeoutException:
+                    raise FetchError(504, f"Timed out fetching {host}") from None
+                except httpx.HTTPError as e:
+                    raise FetchError(502, f"Could not fetch page: {type(e).__name__}") from None
+        raise FetchError(502, "Too many redirects")
+
+    def stats(self):
+        return {
+            **self.cache.stats(),
+            "fresh": self.fresh,
+            "revalidated": self.revalidated,
+            "downloaded": self.downloaded,
+            "errors": self.errors,
+            "fresh_seconds": ARTICLE_FRESH_SECONDS,
+        }
+
+    async def close(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        await self.cache.close()
+
+
+article_fetcher = ArticleFetcher(cache.article_cache)
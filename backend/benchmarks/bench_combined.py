@@ -0,0 +1,97 @@
+"""Compare the two-call analysis path against the single combined call.
+
+Sends the same sample texts through both paths and reports latency and the
+token counts Gemini returns in usageMetadata.
+
+Usage (from the backend directory):
+    python benchmarks/bench_combined.py [--runs 3] [--text "..."]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+import prompts
+import upstream
+
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+MODEL_NAME = "gemini-2.5-flash"
+
+SAMPLE_TEXTS = [
+    "SHOCKING: Scientists confirm drinking hot water every morning cures cancer in 7 days! Doctors don't want you to know this one trick.",
+    "The Ministry of Health reported 1,204 new dengue cases in the week ending 12 October, a 9% decrease from the previous week, according to its weekly bulletin.",
+    "Kerajaan akan memberi RM5,000 kepada semua rakyat yang kongsi mesej ini kepada 10 orang sebelum tengah malam!",
+]
+
+
+async def generate(analysis, text):
+    """Send one analysis (instructions inline) and return (latency seconds, usageMetadata)"""
+    url = f"{upstream.GEMINI_BASE_URL}/models/{MODEL_NAME}:generateContent?key={GEMINI_API_KEY}"
+    payload = {
+        "systemInstruction": {"parts": [{"text": prompts.SYSTEM_INSTRUCTIONS[analysis]}]},
+        "contents": [{"role": "user", "parts": [{"text": prompts.article(text)}]}],
+    }
+    started = time.perf_counter()
+    response = await upstream.post_json(url, payload)
+    latency = time.perf_counter() - started
+    response.raise_for_status()
+    return latency, response.json().get("usageMetadata", {})
+
+
+async def two_call_path(text):
+    (fn_latency, fn_usage), (cb_latency, cb_usage) = await asyncio.gather(
+        generate("fakenews", text),
+        generate("clickbait", text),
+    )
+    return max(fn_latency, cb_latency), [fn_usage, cb_usage]
+
+
+async def combined_path(text):
+    latency, usage = await generate("combined", text)
+    return latency, [usage]
+
+
+def summarize(name, samples):
+    latencies = [latency for latency, _ in samples]
+    prompt_tokens = [sum(u.get("promptTokenCount", 0) for u in usages) for _, usages in samples]
+    output_tokens = [sum(u.get("candidatesTokenCount", 0) + u.get("thoughtsTokenCount", 0) for u in usages) for _, usages in samples]
+    calls = sum(len(usages) for _, usages in samples)
+    print(f"{name:<10} calls={calls:<4} "
+          f"latency p50={statistics.median(latencies):.2f}s max={max(latencies):.2f}s  "
+          f"prompt_tokens avg={statistics.mean(prompt_tokens):.0f}  "
+          f"output_tokens avg={statistics.mean(output_tokens):.0f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="repetitions per sample text")
+    parser.add_argument("--text", action="append", help="text to analyze (repeatable, defaults to built-in samples)")
+    args = parser.parse_args()
+
+    if not GEMINI_API_KEY:
+        sys.exit("GEMINI_API_KEY is not set")
+
+    texts = args.text or SAMPLE_TEXTS
+    two_call, combined = [], []
+    try:
+        for _ in range(args.runs):
+            for text in texts:
+                two_call.append(await two_call_path(text))
+                combined.append(await combined_path(text))
+    finally:
+        await upstream.close_client()
+
+    summarize("two-call", two_call)
+    summarize("combined", combined)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,73 @@
+"""Compare the base64-in-JSON image path with the binary upload path.
+
+Generates phone-sized screenshots, posts each one to /detect/image/fakenews as
+base64 JSON and to /detect/image/fakenews/upload as raw bytes, and reports request
+payload size, bytes forwarded to Vision and end-to-end latency.
+
+Run the API first (pointing it at benchmarks/mock_upstream.py keeps it offline), then:
+    python benchmarks/bench_upload.py --api http://127.0.0.1:8000 --runs 5
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import statistics
+import time
+
+import httpx
+from PIL import Image, ImageDraw
+
+
+def make_screenshot(width, height, seed):
+    """A noisy, photo-like background with lines of text, saved as PNG"""
+    rng = random.Random(seed)
+    image = Image.effect_noise((width, height), 40).convert("RGB")
+    draw = ImageDraw.Draw(image)
+    for line in range(0, height, 48):
+        draw.text((40, line + 10), f"BREAKING {seed}-{line}: Government to give RM5000 to everyone who shares this!",
+                  fill=(rng.randrange(256), 0, 0))
+    output = io.BytesIO()
+    image.save(output, format="PNG")
+    return output.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", default="http://127.0.0.1:8000")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--width", type=int, default=1440)
+    parser.add_argument("--height", type=int, default=3200)
+    args = parser.parse_args()
+
+    rows = {"json": [], "upload": []}
+    with httpx.Client(base_url=args.api, timeout=120) as client:
+        for run in range(args.runs):
+            # A fresh image per path and run so the OCR cache never answers
+            png = make_screenshot(args.width, args.height, seed=run * 2)
+            encoded = base64.b64encode(png).decode("ascii")
+            body = json.dumps({"image": encoded}).encode("utf-8")
+            started = time.perf_counter()
+            response = client.post("/detect/image/fakenews", content=body, headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+            rows["json"].append((len(body), len(encoded), time.perf_counter() - started))
+
+            png = make_screenshot(args.width, args.height, seed=run * 2 + 1)
+            started = time.perf_counter()
+            response = client.post("/detect/image/fakenews/upload", content=png, headers={"Content-Type": "image/png"})
+            response.raise_for_status()
+            # Vision takes base64 inside JSON either way, so compare encoded sizes
+            sent = (response.json()["upload"]["sent_bytes"] + 2) // 3 * 4
+            rows["upload"].append((len(png), sent, time.perf_counter() - started))
+
+    print(f"{args.runs} runs, {args.width}x{args.height} PNG screenshots")
+    for name, samples in rows.items():
+        request_bytes = statistics.mean(s[0] for s in samples)
+        vision_bytes = statistics.mean(s[1] for s in samples)
+        latencies = [s[2] for s in samples]
+        print(f"{name:<7} request={request_bytes / 1024:8.0f} KiB  to_vision={vision_bytes / 1024:8.0f} KiB  "
+              f"latency p50={statistics.median(latencies) * 1000:7.0f} ms  max={max(latencies) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
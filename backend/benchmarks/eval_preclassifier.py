@@ -0,0 +1,86 @@
+"""Evaluate the local clickbait pre-classifier against a labelled sample.
+
+For each threshold, reports how many texts would be answered locally (coverage: at or
+above the threshold and with a curiosity-gap or numbered-list hook), how
+many of those local "Clickbait" verdicts were right (precision) and the share of real
+clickbait caught without Gemini (recall), per split and per language. Also times the scorer.
+
+The weights in preclassifier.py were tuned on the "tune" rows only, so the "holdout"
+rows are the honest estimate of precision on texts the scorer has not been fitted to.
+
+Usage (from the backend directory):
+    python benchmarks/eval_preclassifier.py
+    python benchmarks/eval_preclassifier.py --sample my_labels.jsonl --thresholds 0.8 0.9 0.95
+
+Sample lines are JSON objects:
+    {"language": "en", "label": "Clickbait" | "Not Clickbait", "split": "tune" | "holdout", "text": "..."}
+(rows without a split count as "tune")
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import preclassifier
+
+DEFAULT_SAMPLE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "clickbait_sample.jsonl")
+
+
+def load_sample(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def report(name, rows, threshold):
+    local = [row for row in rows if row["hooked"] and row["probability"] >= threshold]
+    correct = sum(1 for row in local if row["label"] == "Clickbait")
+    positives = sum(1 for row in rows if row["label"] == "Clickbait")
+    precision = correct / len(local) if local else 1.0
+    recall = correct / positives if positives else 0.0
+    print(f"  {name:<4} n={len(rows):<4} local={len(local):<4} coverage={len(local) / len(rows):6.1%}  "
+          f"precision={precision:6.1%}  recall={recall:6.1%}")
+    return [row for row in local if row["label"] != "Clickbait"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sample", default=DEFAULT_SAMPLE)
+    parser.add_argument("--thresholds", type=float, nargs="+", default=[0.8, 0.85, 0.9, 0.95])
+    parser.add_argument("--show-errors", action="store_true", help="list texts wrongly answered locally")
+    args = parser.parse_args()
+
+    rows = load_sample(args.sample)
+    started = time.perf_counter()
+    for row in rows:
+        row["probability"], _, row["hooked"] = preclassifier.score(row["text"])
+    per_text_us = (time.perf_counter() - started) / len(rows) * 1e6
+    print(f"{len(rows)} labelled texts, {per_text_us:.0f} us per text\n")
+
+    languages = sorted({row["language"] for row in rows})
+    splits = sorted({row.get("split", "tune") for row in rows}, reverse=True)
+    for threshold in args.thresholds:
+        print(f"threshold {threshold}")
+        errors = []
+        for split in splits:
+            split_rows = [row for row in rows if row.get("split", "tune") == split]
+            print(f" {split}")
+            errors += report("all", split_rows, threshold)
+            for lang in languages:
+                report(lang, [row for row in split_rows if row["language"] == lang], threshold)
+        if args.show_errors:
+            for row in errors:
+                print(f"    false positive ({row.get('split', 'tune')}) p={row['probability']:.3f}: {row['text']}")
+
+    # Texts that still go to Gemini are fine; these are the ones that should be near the boundary
+    if args.show_errors:
+        print("\nclickbait left for Gemini at the highest threshold:")
+        for row in rows:
+            if row["label"] == "Clickbait" and (row["probability"] < max(args.thresholds) or not row["hooked"]):
+                print(f"  p={row['probability']:.3f}: {row['text']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""Exercise the upstream governor against the local mock server.
+
+Runs four scenarios and prints governor stats after each:
+  throttled  - 40% of calls get 429 with Retry-After: 0; retries should absorb them
+  outage     - every call gets 503; the circuit should open and shed load quickly
+  recovered  - upstream healthy again; after the cool-down a probe closes the circuit
+  cancelled  - half-open probes (plain and streaming) cancelled by wait_for must free
+               the probe slot, so the next call probes instead of being shed forever
+
+Usage (from the backend directory):
+    python benchmarks/governor_check.py
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+PORT = 8901
+os.environ["GEMINI_BASE_URL"] = f"http://127.0.0.1:{PORT}/v1beta"
+os.environ.setdefault("BREAKER_RESET_TIMEOUT", "2")
+os.environ.setdefault("UPSTREAM_BACKOFF_BASE", "0.05")
+
+import governor
+import upstream
+from benchmarks.mock_upstream import MockConfig, make_server
+
+URL = f"{upstream.GEMINI_BASE_URL}/models/gemini-2.5-flash:generateContent?key=test"
+PAYLOAD = {"contents": [{"parts": [{"text": "TEXT TO ANALYZE"}]}]}
+
+
+async def fire(count):
+    outcomes = {}
+    started = time.perf_counter()
+
+    async def one():
+        try:
+            response = await upstream.post_json(URL, PAYLOAD, service="gemini")
+            outcome = str(response.status_code)
+        except governor.CircuitOpenError:
+            outcome = "shed"
+        except Exception as e:
+            outcome = type(e).__name__
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    await asyncio.gather(*(one() for _ in range(count)))
+    return outcomes, time.perf_counter() - started
+
+
+async def probe(kind):
+    if kind == "post":
+        await upstream.post_json(URL, PAYLOAD, service="gemini")
+        return
+    async with upstream.stream_post(URL.replace(":generateContent", ":streamGenerateContent"), PAYLOAD,
+                                    service="gemini") as response:
+        await response.aread()
+
+
+async def main():
+    config = MockConfig()
+    server = make_server(port=PORT, config=config)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    gov = governor.governors["gemini"]
+
+    try:
+        config.rate_429, config.retry_after = 0.4, 0
+        outcomes, elapsed = await fire(50)
+        print(f"throttled: {outcomes} in {elapsed:.2f}s\n  {gov.stats()}")
+
+        config.rate_429, config.outage = 0.0, True
+        outcomes, elapsed = await fire(50)
+        print(f"outage:    {outcomes} in {elapsed:.2f}s\n  {gov.stats()}")
+
+        config.outage = False
+        await asyncio.sleep(governor.BREAKER_RESET_TIMEOUT)
+        outcomes, elapsed = await fire(1)
+        outcomes_after, _ = await fire(20)
+        print(f"recovered: probe {outcomes}, then {outcomes_after}\n  {gov.stats()}")
+
+        for kind in ("post", "stream"):
+            config.outage = True
+            await fire(10)
+            assert gov.breaker.state == "open", gov.breaker.state
+            config.outage = False
+            await asyncio.sleep(governor.BREAKER_RESET_TIMEOUT)
+            config.gemini_latency = lambda: 1.0
+            try:
+                await asyncio.wait_for(probe(kind), 0.2)
+            except asyncio.TimeoutError:
+                pass
+            config.gemini_latency = lambda: 0.0
+            outcomes, _ = await fire(1)
+            print(f"cancelled {kind} probe: next call {outcomes}, circuit {gov.breaker.state}")
+            assert outcomes == {"200": 1} and gov.breaker.state == "closed", (outcomes, gov.breaker.state)
+        print(f"mock request counts: {config.counts}")
+    finally:
+        await upstream.close_client()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,248 @@
+"""Offline load test: mixed detect traffic against one API instance backed by the mock upstream.
+
+By default this starts benchmarks/mock_upstream.py in-process and main.py under uvicorn
+(pointed at the mock through GEMINI_BASE_URL/VISION_BASE_URL), then runs closed-loop
+workers for each concurrency level and prints throughput, p50/p95/p99 latency, failures
+and upstream calls per request. Stepping concurrency up shows where latency collapses.
+
+Usage (from the backend directory):
+    python benchmarks/load_test.py --concurrency 8,32,128 --duration 20
+    python benchmarks/load_test.py --mix text=1 --gemini-latency lognormal:1500:0.6 --malformed-rate 0.05
+    python benchmarks/load_test.py --burst-every 20 --burst-length 2 --app-env GEMINI_RPM=3000
+
+    # against an API you started yourself (upstream counts come from --mock-url if given)
+    python benchmarks/load_test.py --api http://127.0.0.1:8000 --mock-url http://127.0.0.1:8900
+"""
+import argparse
+import asyncio
+import base64
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.mock_upstream import MockConfig, make_server
+
+SUBJECTS = ["Government", "Ministry of Health", "Bank Negara", "A viral video", "Scientists", "Police"]
+CLAIMS = [
+    "will give RM5000 to everyone who shares this message before midnight",
+    "reported 1,204 new dengue cases in the week ending 12 October",
+    "confirmed that drinking hot water every morning cures cancer in 7 days",
+    "announced the overnight policy rate will stay at 3 per cent",
+    "warned that a new scam is spreading through WhatsApp groups",
+]
+PNG_MAGIC = b"\x89PNG\r\n\x1a\n"
+
+
+VOCABULARY = (
+    "residents said officials statement village district budget hospital school minister flood "
+    "highway election scam message video doctors students farmers prices petrol subsidy rain "
+    "festival market border police court report survey online viral community mosque temple "
+    "bridge railway airport clinic vaccine water electricity tariff salary pension teachers"
+).split()
+
+
+def make_text(rng, serial):
+    # A random tail keeps texts apart for the near-duplicate index too, not just the exact cache
+    tail = " ".join(rng.choices(VOCABULARY, k=14))
+    return f"{rng.choice(SUBJECTS)} {rng.choice(CLAIMS)}; {tail} (ref {serial})."
+
+
+def make_image(rng, serial):
+    # Vision is mocked, so the bytes only need to be unique (to miss the OCR cache)
+    return base64.b64encode(PNG_MAGIC + serial.to_bytes(8, "big") + rng.randbytes(2048)).decode("ascii")
+
+
+# Request kind -> (path, body builder)
+REQUEST_KINDS = {
+    "text": ("/detect/text", lambda text, image: {"text": text}),
+    "image": ("/detect/image", lambda text, image: {"image": image}),
+    "fakenews": ("/detect/text/fakenews", lambda text, image: {"text": text}),
+    "clickbait": ("/detect/text/clickbait", lambda text, image: {"text": text}),
+}
+
+
+def parse_mix(spec):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        if name not in REQUEST_KINDS:
+            raise SystemExit(f"unknown request kind {name!r}; use {', '.join(REQUEST_KINDS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, min(len(sorted_values), round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[rank - 1]
+
+
+def failed(response):
+    """Non-200 or an Error/Unknown verdict (quota, upstream or parsing trouble) counts as a failure"""
+    if response.status_code != 200:
+        return True
+    body = response.json()
+    verdicts = [body.get("fake_news"), body.get("clickbait")]
+    return any(isinstance(v, dict) and v.get("prediction") in ("Error", "Unknown") for v in verdicts)
+
+
+async def run_level(api, concurrency, duration, mix, repeat_ratio, seed):
+    rng = random.Random(seed)
+    kinds, weights = list(mix), list(mix.values())
+    samples = []
+    seen = []
+    serial = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker(client):
+        nonlocal serial
+        while time.perf_counter() < deadline:
+            kind = rng.choices(kinds, weights)[0]
+            if seen and rng.random() < repeat_ratio:
+                text, image = rng.choice(seen)
+            else:
+                serial += 1
+                text, image = make_text(rng, serial), make_image(rng, serial)
+                seen.append((text, image))
+            path, build = REQUEST_KINDS[kind]
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=build(text, image))
+                ok = not failed(response)
+            except httpx.HTTPError:
+                ok = False
+            samples.append((kind, time.perf_counter() - started, ok))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=api, timeout=120, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return samples, elapsed
+
+
+def report(concurrency, samples, elapsed, upstream_counts):
+    print(f"\nconcurrency {concurrency}: {len(samples)} requests in {elapsed:.1f}s")
+    print(f"  {'kind':<10} {'count':>6} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'failed':>7}")
+    for kind in sorted({s[0] for s in samples}) + ["all"]:
+        rows = [s for s in samples if kind == "all" or s[0] == kind]
+        latencies = sorted(s[1] * 1000 for s in rows)
+        failures = sum(1 for s in rows if not s[2])
+        print(f"  {kind:<10} {len(rows):>6} {len(rows) / elapsed:>7.1f} {percentile(latencies, 0.5):>8.0f} "
+              f"{percentile(latencies, 0.95):>8.0f} {percentile(latencies, 0.99):>8.0f} {failures:>7}")
+    if upstream_counts is not None:
+        calls = sum(upstream_counts.get(name, 0) for name in ("generateContent", "streamGenerateContent", "annotate"))
+        per_request = calls / len(samples) if samples else 0.0
+        print(f"  upstream calls: {calls} ({per_request:.2f} per request) {dict(sorted(upstream_counts.items()))}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_api(mock_url, app_env, log_path):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "GEMINI_BASE_URL": f"{mock_url}/v1beta",
+        "VISION_BASE_URL": f"{mock_url}/v1",
+        "GEMINI_API_KEY": "load-test",
+        "GOOGLE_VISION_KEY": "load-test",
+    })
+    env.update(app_env)
+    log = open(log_path, "ab")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+    api = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            if httpx.get(f"{api}/health", timeout=1).status_code == 200:
+                return process, api
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise SystemExit("API did not start; run it manually and pass --api")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--api", help="use a running API instead of starting one")
+    parser.add_argument("--mock-url", help="mock server of a running setup, for upstream call counts")
+    parser.add_argument("--concurrency", default="8,32,64", help="comma-separated worker counts, one run each")
+    parser.add_argument("--duration", type=float, default=15.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", default="text=4,image=2,fakenews=2,clickbait=2", help="request kinds and weights")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0, help="share of requests that resend an earlier input")
+    parser.add_argument("--seed", type=int, default=1116)
+    parser.add_argument("--app-env", action="append", default=[], metavar="KEY=VALUE", help="extra env for the API")
+    parser.add_argument("--api-log", default=os.devnull, help="where the started API's log output goes")
+    mock = parser.add_argument_group("mock upstream (when the API is started here)")
+    mock.add_argument("--gemini-latency", default="lognormal:1200:0.5")
+    mock.add_argument("--vision-latency", default="uniform:150:450")
+    mock.add_argument("--rate-429", type=float, default=0.0)
+    mock.add_argument("--retry-after", type=int)
+    mock.add_argument("--rate-503", type=float, default=0.0)
+    mock.add_argument("--burst-every", type=float, default=0.0)
+    mock.add_argument("--burst-length", type=float, default=0.0)
+    mock.add_argument("--malformed-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    levels = [int(level) for level in args.concurrency.split(",")]
+    app_env = dict(item.split("=", 1) for item in args.app_env)
+
+    config = server = process = None
+    api, mock_url = args.api, args.mock_url
+    if api is None:
+        config = MockConfig(rate_429=args.rate_429, retry_after=args.retry_after, rate_503=args.rate_503,
+                            gemini_latency=args.gemini_latency, vision_latency=args.vision_latency,
+                            burst_every=args.burst_every, burst_length=args.burst_length,
+                            malformed_rate=args.malformed_rate)
+        mock_port = free_port()
+        server = make_server(port=mock_port, config=config)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        process, api = start_api(f"http://127.0.0.1:{mock_port}", app_env, args.api_log)
+        print(f"API {api} -> mock upstream on port {mock_port} "
+              f"(gemini {args.gemini_latency}, vision {args.vision_latency})")
+
+    try:
+        for index, concurrency in enumerate(levels):
+            before = httpx.get(f"{mock_url}/mock/stats").json() if mock_url else None
+            if config is not None:
+                config.reset_counts()
+            samples, elapsed = await run_level(api, concurrency, args.duration, mix, args.repeat_ratio, args.seed + index)
+            if config is not None:
+                counts = config.reset_counts()
+            elif mock_url:
+                after = httpx.get(f"{mock_url}/mock/stats").json()
+                counts = {name: after[name] - before.get(name, 0) for name in after}
+            else:
+                counts = None
+            report(concurrency, samples, elapsed, counts)
+        print(f"\ngovernor: {httpx.get(f'{api}/upstream/status').json()}")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+        if server is not None:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,344 @@
+"""Local stand-in for the Gemini and Vision APIs.
+
+Serves canned replies for generateContent, streamGenerateContent, models,
+cachedContents and images:annotate, with knobs for latency distributions and failure injection:
+random 429s/503s, periodic 429 bursts, full outages, malformed JSON replies and
+low-confidence replies from the cheaper model tier (to exercise escalation).
+GET /mock/stats returns the request counts.
+
+Latency specs (milliseconds): "300", "uniform:200:900" or "lognormal:800:0.5"
+(median 800 ms, sigma 0.5 - a long right tail like real LLM calls).
+
+Usage (from the backend directory):
+    python benchmarks/mock_upstream.py --port 8900 --rate-429 0.2 --retry-after 1
+    python benchmarks/mock_upstream.py --gemini-latency lognormal:1500:0.6 --vision-latency uniform:150:400 \
+        --burst-every 30 --burst-length 3 --malformed-rate 0.02
+    python benchmarks/mock_upstream.py --unsure-rate 0.3 --unsure-models lite
+
+then start the API against it:
+    GEMINI_BASE_URL=http://127.0.0.1:8900/v1beta VISION_BASE_URL=http://127.0.0.1:8900/v1 \
+        python -m uvicorn main:app --port 8000
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_NEWS_REPLY = {
+    "prediction": "Fake",
+    "confidence": 87,
+    "explanation": "The text promises a cash reward for forwarding a message, cites no source and uses urgency cues such as 'before midnight'.",
+    "key_points": ["No verifiable source", "Reward for sharing", "Artificial urgency"],
+}
+
+CLICKBAIT_REPLY = {
+    "score": 78,
+    "prediction": "Clickbait",
+    "confidence": 82,
+    "explanation": "Uses 'SHOCKING' in capitals and withholds the key detail to drive clicks.",
+    "clickbait_elements": ["'SHOCKING'", "'you won't believe'", "'before midnight'"],
+}
+
+# Models listed by GET /models; generate calls naming any other model get a 404 like the real API
+MODELS = ("gemini-2.5-flash", "gemini-2.5-flash-lite", "gemini-2.5-pro")
+
+OCR_TEXT = "BREAKING: Government to give RM5000 to everyone who shares this message before midnight!"
+
+
+def latency_sampler(spec):
+    """Turn a latency spec into a function returning seconds"""
+    if spec is None or spec == "":
+        return lambda: 0.0
+    kind, _, params = str(spec).partition(":")
+    if not params:
+        fixed = float(kind) / 1000.0
+        return lambda: fixed
+    values = [float(value) for value in params.split(":")]
+    if kind == "fixed":
+        return lambda: values[0] / 1000.0
+    if kind == "uniform":
+        low, high = values
+        return lambda: random.uniform(low, high) / 1000.0
+    if kind == "lognormal":
+        median, sigma = values
+        return lambda: random.lognormvariate(math.log(median), sigma) / 1000.0
+    raise ValueError(f"unknown latency distribution {kind!r} (use fixed, uniform or lognormal)")
+
+
+class MockConfig:
+    def __init__(self, latency_ms=0.0, rate_429=0.0, retry_after=None, rate_503=0.0, outage=False,
+                 gemini_latency=None, vision_latency=None, burst_every=0.0, burst_length=0.0, malformed_rate=0.0,
+                 cache_min_tokens=0, unsure_rate=0.0, unsure_models="lite"):
+        self.latency_ms = latency_ms
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.rate_503 = rate_503
+        self.outage = outage
+        # Per-service distributions override the fixed latency_ms
+        self.gemini_latency = latency_sampler(gemini_latency if gemini_latency is not None else latency_ms)
+        self.vision_latency = latency_sampler(vision_latency if vision_latency is not None else latency_ms)
+        # Every burst_every seconds, answer everything with 429 for burst_length seconds
+        self.burst_every = burst_every
+        self.burst_length = burst_length
+        # Share of Gemini replies cut off mid-JSON
+        self.malformed_rate = malformed_rate
+        # cachedContents smaller than this (estimated tokens) are refused with 400, like the real minimum
+        self.cache_min_tokens = cache_min_tokens
+        # Share of replies from models whose name contains unsure_models that come back with low confidence
+        self.unsure_rate = unsure_rate
+        self.unsure_models = unsure_models
+        self.cached_contents = {}
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.counts = {}
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def reset_counts(self):
+        with self.lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def in_burst(self):
+        if not self.burst_every or not self.burst_length:
+            return False
+        return (time.monotonic() - self.started) % self.burst_every < self.burst_length
+
+
+def gemini_reply_text(prompt, schema=None):
+    """Pick the reply shape the response schema (or, without one, the prompt) asks for"""
+    properties = (schema or {}).get("properties", {})
+    if "results" in properties or (not schema and '"results": [' in prompt):
+        count = max(1, len(re.findall(r'^\[\d+\] "', prompt, flags=re.MULTILINE)))
+        item_properties = properties.get("results", {}).get("items", {}).get("properties", {})
+        packed_clickbait = "score" in item_properties if schema else "fact-checker" not in prompt
+        body = CLICKBAIT_REPLY if packed_clickbait else FAKE_NEWS_REPLY
+        return json.dumps({"results": [{"id": number, **body} for number in range(1, count + 1)]})
+    if "fake_news" in properties or (not schema and '"fake_news": {' in prompt):
+        return json.dumps({"fake_news": FAKE_NEWS_REPLY, "clickbait": CLICKBAIT_REPLY})
+    if "score" in properties or (not schema and "clickbait detection" in prompt):
+        return json.dumps(CLICKBAIT_REPLY)
+    return json.dumps(FAKE_NEWS_REPLY)
+
+
+def lower_confidence(value, confidence=40):
+    """Replace every "confidence" in a parsed reply, as an unsure model would answer"""
+    if isinstance(value, dict):
+        return {key: confidence if key == "confidence" else lower_confidence(item, confidence) for key, item in value.items()}
+    if isinstance(value, list):
+        return [lower_confidence(item, confidence) for item in value]
+    return value
+
+
+def generate_response(reply_text, prompt, cached_tokens=0):
+    usage = {
+        "promptTokenCount": len(prompt) // 4 + cached_tokens,
+        "candidatesTokenCount": len(reply_text) // 4,
+        "totalTokenCount": (len(prompt) + len(reply_text)) // 4 + cached_tokens,
+    }
+    if cached_tokens:
+        usage["cachedContentTokenCount"] = cached_tokens
+    return {
+        "candidates": [{"content": {"parts": [{"text": reply_text}], "role": "model"}, "finishReason": "STOP"}],
+        "usageMetadata": usage,
+    }
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    config = MockConfig()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _inject_failure(self, service):
+        """Apply latency and maybe answer with an error; returns True if a failure was sent"""
+        config = self.config
+        delay = config.gemini_latency() if service == "gemini" else config.vision_latency()
+        if delay:
+            time.sleep(delay)
+        if config.outage or random.random() < config.rate_503:
+            config.count("503")
+            self._send_json(503, {"error": {"code": 503, "message": "The service is currently unavailable."}})
+            return True
+        if config.in_burst() or random.random() < config.rate_429:
+            config.count("429")
+            headers = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else None
+            self._send_json(429, {"error": {"code": 429, "message": "Resource has been exhausted (e.g. check quota)."}}, headers)
+            return True
+        return False
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def _cached_tokens(self, body):
+        """Tokens served from the referenced cache; None if it doesn't exist (or expired)"""
+        name = body.get("cachedContent")
+        if not name:
+            return 0
+        with self.config.lock:
+            entry = self.config.cached_contents.get(name)
+        if entry is None or entry["expires_at"] <= time.time():
+            return None
+        return entry["tokens"]
+
+    def _unknown_model(self):
+        model = self.path.split("?")[0].rsplit("/models/", 1)[-1].split(":")[0]
+        if model in MODELS:
+            return False
+        self.config.count("404")
+        self._send_json(404, {"error": {"code": 404, "message": f"models/{model} is not found for API version v1beta"}})
+        return True
+
+    def _reply_text(self, body):
+        prompt = body["contents"][0]["parts"][0]["text"]
+        reply_text = gemini_reply_text(prompt, body.get("generationConfig", {}).get("responseSchema"))
+        model = self.path.split("?")[0].rsplit("/models/", 1)[-1].split(":")[0]
+        if self.config.unsure_models in model and random.random() < self.config.unsure_rate:
+            self.config.count(f"unsure.{model}")
+            reply_text = json.dumps(lower_confidence(json.loads(reply_text)))
+        if random.random() < self.config.malformed_rate:
+            self.config.count("malformed")
+            reply_text = reply_text[:len(reply_text) // 2]
+        return prompt, reply_text
+
+    def do_PATCH(self):
+        name = self.path.split("?")[0].split("/v1beta/", 1)[-1]
+        body = self._read_json()
+        self.config.count("cachedContents.patch")
+        ttl = float(body.get("ttl", "3600s").rstrip("s"))
+        with self.config.lock:
+            entry = self.config.cached_contents.get(name)
+            if entry is not None:
+                entry["expires_at"] = time.time() + ttl
+        if entry is None:
+            self._send_json(404, {"error": {"code": 404, "message": "CachedContent not found."}})
+        else:
+            self._send_json(200, {"name": name, "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(entry["expires_at"]))})
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/mock/stats":
+            with self.config.lock:
+                counts = dict(self.config.counts)
+            self._send_json(200, counts)
+        elif self.path.split("?")[0].endswith("/models"):
+            self.config.count("models")
+            self._send_json(200, {"models": [{"name": f"models/{name}"} for name in MODELS]})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        body = self._read_json()
+
+        if path.endswith(":generateContent"):
+            self.config.count("generateContent")
+            if self._inject_failure("gemini") or self._unknown_model():
+                return
+            cached_tokens = self._cached_tokens(body)
+            if cached_tokens is None:
+                self._send_json(404, {"error": {"code": 404, "message": "CachedContent not found (or expired)."}})
+                return
+            prompt, reply_text = self._reply_text(body)
+            self._send_json(200, generate_response(reply_text, prompt, cached_tokens))
+        elif path.endswith(":streamGenerateContent"):
+            self.config.count("streamGenerateContent")
+            if self._inject_failure("gemini") or self._unknown_model():
+                return
+            cached_tokens = self._cached_tokens(body)
+            if cached_tokens is None:
+                self._send_json(404, {"error": {"code": 404, "message": "CachedContent not found (or expired)."}})
+                return
+            prompt, reply_text = self._reply_text(body)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for start in range(0, len(reply_text), 40):
+                chunk = generate_response(reply_text[start:start + 40], prompt, cached_tokens)
+                self.wfile.write(f"data: {json.dumps(chunk)}\r\n\r\n".encode("utf-8"))
+                self.wfile.flush()
+        elif path.endswith("/cachedContents"):
+            self.config.count("cachedContents")
+            text = "".join(part.get("text", "") for part in body.get("systemInstruction", {}).get("parts", []))
+            tokens = len(text) // 4
+            if tokens < self.config.cache_min_tokens:
+                self._send_json(400, {"error": {"code": 400, "message": f"Cached content is too small. total_token_count={tokens}, min_total_token_count={self.config.cache_min_tokens}"}})
+                return
+            ttl = float(body.get("ttl", "3600s").rstrip("s"))
+            with self.config.lock:
+                name = f"cachedContents/mock{len(self.config.cached_contents) + 1}"
+                self.config.cached_contents[name] = {"tokens": tokens, "expires_at": time.time() + ttl}
+            self._send_json(200, {"name": name, "model": body.get("model"), "usageMetadata": {"totalTokenCount": tokens},
+                                  "expireTime": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() + ttl))})
+        elif path.endswith("images:annotate"):
+            self.config.count("annotate")
+            if self._inject_failure("vision"):
+                return
+            # Tag the text with a digest of the image so distinct images don't share analysis cache entries
+            responses = []
+            for entry in body.get("requests", []):
+                digest = zlib.crc32(entry.get("image", {}).get("content", "").encode("ascii"))
+                responses.append({"textAnnotations": [{"description": f"{OCR_TEXT} #{digest:08x}", "locale": "en"}]})
+            self._send_json(200, {"responses": responses})
+        else:
+            self._send_json(404, {"error": {"code": 404, "message": "Not found"}})
+
+
+def make_server(host="127.0.0.1", port=8900, config=None):
+    """Build a mock server (call serve_forever() on it, e.g. from a thread)"""
+    handler = type("ConfiguredMockHandler", (MockHandler,), {"config": config or MockConfig()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed delay before every reply")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="probability of a 429 reply")
+    parser.add_argument("--retry-after", type=int, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="probability of a 503 reply")
+    parser.add_argument("--outage", action="store_true", help="answer every call with 503")
+    parser.add_argument("--gemini-latency", help="latency spec for Gemini calls (overrides --latency-ms)")
+    parser.add_argument("--vision-latency", help="latency spec for Vision calls (overrides --latency-ms)")
+    parser.add_argument("--burst-every", type=float, default=0.0, help="seconds between 429 bursts")
+    parser.add_argument("--burst-length", type=float, default=0.0, help="length of each 429 burst in seconds")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="probability of a truncated JSON reply")
+    parser.add_argument("--cache-min-tokens", type=int, default=0, help="refuse cachedContents smaller than this")
+    parser.add_argument("--unsure-rate", type=float, default=0.0,
+                        help="probability of a low-confidence reply from the models matched by --unsure-models")
+    parser.add_argument("--unsure-models", default="lite", help="substring of the model names that answer unsure")
+    args = parser.parse_args()
+
+    config = MockConfig(args.latency_ms, args.rate_429, args.retry_after, args.rate_503, args.outage,
+                        args.gemini_latency, args.vision_latency, args.burst_every, args.burst_length,
+                        args.malformed_rate, args.cache_min_tokens, args.unsure_rate, args.unsure_models)
+    server = make_server(args.host, args.port, config)
+    print(f"Mock Gemini/Vision listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Request counts: {config.counts}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Local HTTP server with news-page fixtures for trying /detect/url offline.
+
+Pages carry ETag and Last-Modified headers and answer conditional requests with
+304, so the article cache's revalidation can be watched in /mock/stats-style counts
+at GET /fixtures/stats.
+
+Paths:
+    /news/rm5000-viral          article with nav, share bar, ads, related links and comments
+    /news/dengue-bulletin?utm_source=wa   same story under tracking parameters (same cache entry)
+    /news/dengue-bulletin       plain <article> page, declares a rel=canonical
+    /bm/kongsi-mesej            Malay article in <div class="story-body"> without <article>
+    /redirect                   302 to /news/rm5000-viral
+    /video                      page with a headline but no article text
+    /feed.xml                   unsupported content type
+    /missing                    404
+    /slow                       answers after 3 s (per-host concurrency / timeouts)
+
+Usage (from the backend directory):
+    python benchmarks/page_fixtures.py --port 8901
+
+then, with the API started with URL_ALLOW_PRIVATE=true:
+    curl -s localhost:8000/detect/url -H 'content-type: application/json' \\
+        -d '{"url": "http://127.0.0.1:8901/news/rm5000-viral"}'
+"""
+import argparse
+import hashlib
+import json
+import threading
+import time
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHROME_TOP = """
+<header class="site-header"><div class="logo">Berita Harian Palsu</div>
+<nav><ul><li><a href="/">Home</a></li><li><a href="/politik">Politik</a></li><li><a href="/sukan">Sukan</a></li></ul></nav>
+</header>
+<div class="cookie-consent">We use cookies to improve your experience. <button>Accept all</button></div>
+"""
+
+CHROME_BOTTOM = """
+<aside class="sidebar"><h3>Trending now</h3><ul><li>Celebrity wedding photos leaked</li><li>10 foods you must never eat</li></ul></aside>
+<div class="ad-slot advert">Sponsored: Get rich quick with this one weird trick</div>
+<footer><p>Copyright 2025 Berita Harian Palsu. All rights reserved. Privacy policy. Terms of use.</p></footer>
+"""
+
+PAGES = {
+    "/news/rm5000-viral": ("text/html; charset=utf-8", f"""<!doctype html>
+<html lang="en"><head><meta charset="utf-8">
+<title>SHOCKING: Government to give RM5000 to everyone who shares this | Berita Harian Palsu</title>
+<meta property="og:title" content="SHOCKING: Government to give RM5000 to everyone who shares this message">
+<meta property="article:published_time" content="2025-10-12T08:00:00+08:00">
+<script>window.dataLayer = window.dataLayer || []; function track() {{ return 1; }}</script>
+<style>.ad-slot {{ display: block; }}</style>
+</head><body>{CHROME_TOP}
+<main><article>
+<h1>SHOCKING: Government to give RM5000 to everyone who shares this message</h1>
+<div class="byline">By Staff Reporter</div>
+<div class="share-bar"><a>Share on Facebook</a><a>Share on WhatsApp</a><a>Tweet this story</a></div>
+<p>A message circulating on WhatsApp claims that the government will give RM5000 to every citizen who forwards it to ten contacts before midnight tonight.</p>
+<p>The message, which uses the logo of a ministry, urges readers to act quickly because "the offer closes at 12am and will not be repeated".
+It does not name any official, programme or application channel.</p>
+<p>No such programme appears on the ministry's website or in any official statement, and similar messages in past years were confirmed to be scams that collected personal details.</p>
+<div class="related-articles"><h3>Related</h3><ul><li>Scam alert: fake bank SMS</li><li>How to spot fake news</li></ul></div>
+<p>Readers are advised not to share the message and to check claims with official sources before forwarding them.</p>
+</article>
+<section id="comments"><h3>Comments (213)</h3><p>Wow I already shared it to everyone in my family group!!!</p></section>
+</main>{CHROME_BOTTOM}</body></html>"""),
+    "/news/dengue-bulletin": ("text/html; charset=utf-8", """<!doctype html>
+<html lang="en"><head><title>Dengue cases fall 9% in latest weekly bulletin</title>
+<link rel="canonical" href="/news/dengue-bulletin">
+</head><body><nav><a href="/">Home</a> | <a href="/health">Health</a></nav>
+<article><h1>Dengue cases fall 9% in latest weekly bulletin</h1>
+<p>The Ministry of Health reported 1,204 new dengue cases in the week ending 12 October, a 9% decrease from the 1,323 cases recorded the previous week, according to its weekly bulletin.</p>
+<p>No deaths were reported during the week. The ministry said cumulative cases for the year stood at 98,210, compared with 104,562 over the same period last year.</p>
+<p>Hotspot localities fell from 54 to 47, most of them in Selangor. The ministry urged residents to destroy mosquito breeding sites around their homes at least once a week.</p>
+</article><footer>Health Desk</footer></body></html>"""),
+    "/bm/kongsi-mesej": ("text/html", """<html lang="ms"><head><meta charset="iso-8859-1">
+<title>Kerajaan beri RM5,000? Ini faktanya</title></head><body>
+<div class="menu"><a>Utama</a> <a>Semasa</a> <a>Hiburan</a></div>
+<div class="story-body">
+<h1>Kerajaan beri RM5,000 kepada yang kongsi mesej? Ini faktanya</h1>
+<p>Satu mesej tular di aplikasi WhatsApp mendakwa kerajaan akan memberi RM5,000 kepada semua rakyat yang berkongsi mesej itu kepada 10 orang sebelum tengah malam.</p>
+<p>Semakan mendapati tiada sebarang kenyataan rasmi mengenai program tersebut. Orang ramai dinasihatkan supaya tidak menyebarkan mesej yang belum disahkan.</p>
+</div>
+<div class="newsletter-signup">Langgan surat berita kami hari ini!</div>
+</body></html>"""),
+    "/video": ("text/html; charset=utf-8", """<html><head><title>WATCH: What happened next will shock you</title></head>
+<body><nav>Home</nav><div class="player"><video src="/v.mp4"></video></div></body></html>"""),
+    "/feed.xml": ("application/rss+xml", "<rss><channel><title>Feed</title></channel></rss>"),
+}
+
+# Fixed modification time so Last-Modified stays stable across restarts
+LAST_MODIFIED = formatdate(time.mktime((2025, 10, 12, 8, 0, 0, 0, 0, -1)), usegmt=True)
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    lock = threading.Lock()
+    counts = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _count(self, name):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+
+    def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+        self.send_response(status)
+        if status != 304:
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if status != 304:
+            self.wfile.write(body)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/fixtures/stats":
+            with self.lock:
+                self._send(200, json.dumps(self.counts).encode("utf-8"), "application/json")
+            return
+        if path == "/redirect":
+            self._count("redirect")
+            self._send(302, headers={"Location": "/news/rm5000-viral"})
+            return
+        if path == "/slow":
+            self._count("slow")
+            time.sleep(3)
+            path = "/news/dengue-bulletin"
+        if path not in PAGES:
+            self._count("404")
+            self._send(404, b"<html><body>Not found</body></html>")
+            return
+
+        content_type, html = PAGES[path]
+        encoding = "iso-8859-1" if "charset" not in content_type and "iso-8859-1" in html else "utf-8"
+        body = html.encode(encoding)
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        validators = {"ETag": etag, "Last-Modified": LAST_MODIFIED, "Cache-Control": "max-age=60"}
+        if self.headers.get("If-None-Match") == etag or self.headers.get("If-Modified-Since") == LAST_MODIFIED:
+            self._count("304")
+            self._send(304, headers=validators)
+            return
+        self._count("200")
+        self._send(200, body, content_type, validators)
+
+
+def make_server(host="127.0.0.1", port=8901):
+    """Build a fixture server (call serve_forever() on it, e.g. from a thread)"""
+    handler = type("CountingFixtureHandler", (FixtureHandler,), {"counts": {}, "lock": threading.Lock()})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port)
+    print(f"Page fixtures on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL = int(os.getenv("CACHE_TTL", "86400"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "10000"))
+CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "karipap_cache.db")
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+OCR_CACHE_TTL = int(os.getenv("OCR_CACHE_TTL", str(7 * 86400)))
+OCR_CACHE_MAX_ENTRIES = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "2000"))
+# Extracted articles are kept this long; articles.py decides when they need revalidating
+ARTICLE_CACHE_TTL = int(os.getenv("ARTICLE_CACHE_TTL", str(7 * 86400)))
+ARTICLE_CACHE_MAX_ENTRIES = int(os.getenv("ARTICLE_CACHE_MAX_ENTRIES", "5000"))
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Canonical form used for cache keys: NFKC, collapsed whitespace, trimmed"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def hash_key(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8") if isinstance(part, str) else part)
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+# BACKENDS - all store serialized strings so every backend hands back a fresh copy
+class MemoryBackend:
+    """In-process LRU with per-entry expiry"""
+    name = "memory"
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+
+    async def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key, value, ttl):
+        self._entries[key] = (time.time() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def size(self):
+        return len(self._entries)
+
+    async def close(self):
+        pass
+
+
+class SQLiteBackend:
+    """Local SQLite file, shared by every worker process on the same host"""
+    name = "sqlite"
+
+    def __init__(self, path, max_entries, table="cache"):
+        self.max_entries = max_entries
+        self.table = table
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_last_access ON {table} (last_access)")
+
+    def _get(self, key):
+        now = time.time()
+        row = self._conn.execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] < now:
+            self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+            return None
+        self._conn.execute(f"UPDATE {self.table} SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def _set(self, key, value, ttl):
+        now = time.time()
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now),
+        )
+        self._conn.execute(f"DELETE FROM {self.table} WHERE expires_at < ?", (now,))
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key IN (SELECT key FROM {self.table} "
+            "ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    async def get(self, key):
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key, value, ttl):
+        await asyncio.to_thread(self._set, key, value, ttl)
+
+    def size(self):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+    async def close(self):
+        self._conn.close()
+
+
+class RedisBackend:
+    """Redis-compatible server; size bounding is left to the server's maxmemory LRU policy"""
+    name = "redis"
+
+    def __init__(self, url, prefix):
+        import redis.asyncio as redis_asyncio  # optional dependency
+
+        self.prefix = prefix
+        self._redis = redis_asyncio.from_url(url, decode_responses=True)
+
+    async def get(self, key):
+        return await self._redis.get(self.prefix + key)
+
+    async def set(self, key, value, ttl):
+        await self._redis.set(self.prefix + key, value, ex=ttl)
+
+    def size(self):
+        return None
+
+    async def close(self):
+        await self._redis.aclose()
+
+
+def make_backend(namespace, max_entries):
+    """Build the configured backend, falling back to memory if it can't be opened"""
+    try:
+        if CACHE_BACKEND == "sqlite":
+            return SQLiteBackend(CACHE_SQLITE_PATH, max_entries, table=f"{namespace}_cache")
+        if CACHE_BACKEND == "redis":
+            return RedisBackend(CACHE_REDIS_URL, prefix=f"karipap:{namespace}:")
+    except Exception as e:
+        logger.warning(f"Cache backend '{CACHE_BACKEND}' unavailable ({e}), using in-process cache")
+    return MemoryBackend(max_entries)
+
+
+class ResultCache:
+    """JSON result cache with hit/miss accounting"""
+
+    def __init__(self, namespace, backend, ttl):
+        self.namespace = namespace
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, key):
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"{self.namespace} cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return json.loads(value)
+
+    async def set(self, key, result):
+        try:
+            await self.backend.set(key, json.dumps(result), self.ttl)
+        except Exception as e:
+            logger.warning(f"{self.namespace} cache write failed: {e}")
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": self.backend.size(),
+            "ttl": self.ttl,
+        }
+
+    async def close(self):
+        await self.backend.close()
+
+
+analysis_cache = ResultCache("analysis", make_backend("analysis", CACHE_MAX_ENTRIES), CACHE_TTL)
+ocr_cache = ResultCache("ocr", make_backend("ocr", OCR_CACHE_MAX_ENTRIES), OCR_CACHE_TTL)
+article_cache = ResultCache("article", make_backend("article", ARTICLE_CACHE_MAX_ENTRIES), ARTICLE_CACHE_TTL)
+
+
+def analysis_key(analysis_type, text):
+    return hash_key(analysis_type, normalize_text(text))
+
+
+def image_key(image_base64):
+    return hash_key("ocr", image_base64.strip())
+
+
+def url_key(canonical_url):
+    return hash_key("article", canonical_url)
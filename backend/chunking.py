@@ -0,0 +1,102 @@
+import os
+import re
+
+# Long-document mode: texts estimated above LONG_TEXT_THRESHOLD tokens are split into chunks
+# of at most CHUNK_TOKEN_BUDGET tokens at paragraph/sentence boundaries and analysed in
+# parallel. MAX_CHUNKS caps the fan-out; longer texts get proportionally bigger chunks.
+LONG_TEXT_THRESHOLD = int(os.getenv("LONG_TEXT_THRESHOLD", "3000"))
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "1500"))
+MAX_CHUNKS = int(os.getenv("MAX_CHUNKS", "8"))
+# Hard cap on the text analysed at all, so chunks can't grow without bound (6000 tokens
+# each at the defaults). Pasted text over it is rejected with a 413; text extracted by
+# OCR or from an article is cut to it and the response says so.
+MAX_TEXT_TOKENS = int(os.getenv("MAX_TEXT_TOKENS", "48000"))
+
+_CJK = re.compile(r"[㐀-䶿一-鿿豈-﫿぀-ヿ가-힯]")
+_PARAGRAPHS = re.compile(r"\n\s*\n")
+# Sentence ends: Latin punctuation followed by whitespace, or CJK full stops (no space follows them)
+_SENTENCES = re.compile(r"(?<=[.!?])\s+|(?<=[。！？；])")
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count: ~4 characters per token for Latin script, ~1 per CJK character"""
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def is_long(text):
+    return estimate_tokens(text) > LONG_TEXT_THRESHOLD
+
+
+def is_too_long(text):
+    return estimate_tokens(text) > MAX_TEXT_TOKENS
+
+
+def truncate(text):
+    """(text cut to MAX_TEXT_TOKENS at a whitespace, whether anything was cut)"""
+    if not is_too_long(text):
+        return text, False
+    cut = len(text) * MAX_TEXT_TOKENS // estimate_tokens(text)
+    while estimate_tokens(text[:cut]) > MAX_TEXT_TOKENS:
+        cut = cut * 9 // 10
+    space = text.rfind(" ", cut // 2, cut)
+    return text[:space if space > 0 else cut].rstrip(), True
+
+
+def _hard_split(text, budget):
+    """Last resort for a single sentence over budget: cut at whitespace near the limit"""
+    pieces = []
+    while estimate_tokens(text) > budget:
+        # Scale the cut by this text's own character/token ratio
+        cut = max(1, len(text) * budget // estimate_tokens(text))
+        space = text.rfind(" ", cut // 2, cut)
+        cut = space if space > 0 else cut
+        pieces.append(text[:cut].strip())
+        text = text[cut:].strip()
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def _units(text, budget):
+    """Paragraphs that fit the budget, otherwise their sentences (split further if needed)"""
+    for paragraph in _PARAGRAPHS.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if estimate_tokens(paragraph) <= budget:
+            yield paragraph
+            continue
+        for sentence in _SENTENCES.split(paragraph):
+            sentence = sentence.strip()
+            if sentence:
+                yield from _hard_split(sentence, budget)
+
+
+def split_text(text, budget=None, max_chunks=None):
+    """Pack paragraphs/sentences into at most max_chunks chunks of about `budget` tokens each.
+    Callers keep text within MAX_TEXT_TOKENS, which bounds how far the budget grows."""
+    budget = budget or CHUNK_TOKEN_BUDGET
+    max_chunks = max_chunks or MAX_CHUNKS
+    # Grow the budget rather than exceed the fan-out cap
+    budget = max(budget, -(-estimate_tokens(text) // max_chunks))
+    while True:
+        chunks = _pack(text, budget)
+        if len(chunks) <= max_chunks:
+            return chunks
+        budget = budget * 5 // 4
+
+
+def _pack(text, budget):
+    """Greedy packing of paragraphs/sentences into chunks of at most `budget` tokens"""
+    chunks, current, current_tokens = [], [], 0
+    for unit in _units(text, budget):
+        tokens = estimate_tokens(unit)
+        if current and current_tokens + tokens > budget:
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
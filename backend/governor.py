@@ -0,0 +1,242 @@
+import asyncio
+import email.utils
+import logging
+import os
+import random
+import time
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# Quota sizing per upstream (requests per minute) and how much burst we allow on top
+GEMINI_RPM = float(os.getenv("GEMINI_RPM", "600"))
+GEMINI_BURST = int(os.getenv("GEMINI_BURST", "20"))
+VISION_RPM = float(os.getenv("VISION_RPM", "1800"))
+VISION_BURST = int(os.getenv("VISION_BURST", "30"))
+
+# Retry policy: jittered exponential backoff, Retry-After honoured up to UPSTREAM_MAX_RETRY_DELAY
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "3"))
+UPSTREAM_BACKOFF_BASE = float(os.getenv("UPSTREAM_BACKOFF_BASE", "0.5"))
+UPSTREAM_MAX_RETRY_DELAY = float(os.getenv("UPSTREAM_MAX_RETRY_DELAY", "8"))
+
+# Circuit breaker: open after this many consecutive failures, probe again after the cool-down
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# When throttled the limiter halves its rate (at most once per THROTTLE_WINDOW seconds and
+# never below MIN_RATE_FRACTION of the quota), then climbs back a step per successful call
+MIN_RATE_FRACTION = 0.1
+RECOVERY_STEP = 0.05
+THROTTLE_WINDOW = 1.0
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, service, retry_in):
+        super().__init__(f"{service} API temporarily unavailable, retry in {retry_in:.0f}s")
+        self.service = service
+        self.retry_in = retry_in
+
+
+class TokenBucket:
+    """Token bucket whose refill rate backs off on 429s and recovers on success (AIMD)"""
+
+    def __init__(self, rate_per_minute, burst):
+        self.max_rate = rate_per_minute / 60.0
+        self.rate = self.max_rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.throttled_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, check=None):
+        """Wait for a token; check() runs before every wait and may raise to abandon the queue"""
+        async with self._lock:
+            while True:
+                if check is not None:
+                    check()
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def throttle(self):
+        # A burst of 429s from calls that were already in flight counts as one signal
+        now = time.monotonic()
+        if now - self.throttled_at < THROTTLE_WINDOW:
+            return
+        self.throttled_at = now
+        self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+
+    def recover(self):
+        self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+
+class CircuitBreaker:
+    """closed -> open after repeated failures -> half_open single probe -> closed/open"""
+
+    def __init__(self, service, failure_threshold, reset_timeout):
+        self.service = service
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._probe_token = 0
+
+    def check(self):
+        """Raise while the circuit is open and still cooling down (no state change)"""
+        if self.state == "open":
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                raise CircuitOpenError(self.service, self.reset_timeout - waited)
+
+    def before_call(self):
+        """Admit a call; returns a probe token when this call is the half-open probe, else None"""
+        if self.state == "open":
+            waited = time.monotonic() - self.opened_at
+            if waited < self.reset_timeout:
+                raise CircuitOpenError(self.service, self.reset_timeout - waited)
+            self.state = "half_open"
+        if self.state == "half_open":
+            if self._probing:
+                raise CircuitOpenError(self.service, self.reset_timeout)
+            self._probing = True
+            self._probe_token += 1
+            return self._probe_token
+        return None
+
+    def release_probe(self, token):
+        """Free the probe slot when a probe ends without an outcome (cancelled, or an error that
+        says nothing about upstream health), so the next call probes instead of being shed forever"""
+        if token is not None and self._probing and token == self._probe_token:
+            self._probing = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probing = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                logger.warning(f"{self.service} circuit opened after {self.failures} consecutive failures")
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+
+def retry_after_seconds(response):
+    """Parse a Retry-After header (delta-seconds or HTTP date)"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        if parsed is None:
+            return None
+        return max(0.0, parsed.timestamp() - time.time())
+
+
+class Governor:
+    """Rate limiting, retries and circuit breaking for one upstream service"""
+
+    def __init__(self, service, rate_per_minute, burst):
+        self.service = service
+        self.bucket = TokenBucket(rate_per_minute, burst)
+        self.breaker = CircuitBreaker(service, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT)
+        self.calls = 0
+        self.retries = 0
+        self.throttled = 0
+        self.shed = 0
+
+    def backoff(self, attempt):
+        return random.uniform(0, min(UPSTREAM_MAX_RETRY_DELAY, UPSTREAM_BACKOFF_BASE * 2 ** attempt))
+
+    async def admit(self):
+        """Fail fast if the circuit is open, otherwise wait for a token. Returns the probe token, if any"""
+        try:
+            await self.bucket.acquire(check=self.breaker.check)
+            # The circuit may have opened while we were queued for a token
+            probe = self.breaker.before_call()
+        except CircuitOpenError:
+            self.shed += 1
+            raise
+        self.calls += 1
+        return probe
+
+    def record(self, status_code):
+        """Feed an upstream status code back into the limiter and breaker"""
+        if status_code == 429:
+            self.throttled += 1
+            self.bucket.throttle()
+            # Throttling means upstream is alive, so it doesn't count towards opening the circuit
+            self.breaker.record_success()
+        elif status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.bucket.recover()
+            self.breaker.record_success()
+
+    async def call(self, send):
+        """Run send() (an upstream request) with admission control and retries"""
+        for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+            probe = await self.admit()
+            try:
+                response = await send()
+            except (httpx.TransportError, asyncio.TimeoutError) as e:
+                self.breaker.record_failure()
+                if attempt == UPSTREAM_MAX_RETRIES:
+                    raise
+                delay = self.backoff(attempt)
+                logger.warning(f"{self.service} request failed ({e!r}), retrying in {delay:.2f}s")
+            except BaseException:
+                self.breaker.release_probe(probe)
+                raise
+            else:
+                self.record(response.status_code)
+                if response.status_code not in RETRYABLE_STATUS or attempt == UPSTREAM_MAX_RETRIES:
+                    return response
+                delay = retry_after_seconds(response)
+                if delay is None:
+                    delay = self.backoff(attempt)
+                elif delay > UPSTREAM_MAX_RETRY_DELAY:
+                    # Upstream wants us gone for longer than a request can wait
+                    return response
+                logger.warning(f"{self.service} returned {response.status_code}, retrying in {delay:.2f}s")
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+    def stats(self):
+        self.bucket._refill()
+        return {
+            "circuit": self.breaker.state,
+            "consecutive_failures": self.breaker.failures,
+            "rate_per_minute": round(self.bucket.rate * 60, 1),
+            "quota_per_minute": round(self.bucket.max_rate * 60, 1),
+            "tokens_available": round(self.bucket.tokens, 2),
+            "burst": self.bucket.burst,
+            "calls": self.calls,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "shed": self.shed,
+        }
+
+
+governors = {
+    "gemini": Governor("gemini", GEMINI_RPM, GEMINI_BURST),
+    "vision": Governor("vision", VISION_RPM, VISION_BURST),
+}
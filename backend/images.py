@@ -0,0 +1,90 @@
+import io
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it uploads are forwarded unchanged
+    Image = None
+
+# Upload limits and the resolution OCR actually needs. Phone screenshots are often
+# 1440x3200 or larger; Vision reads text fine well below that.
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(15 * 1024 * 1024)))
+OCR_MAX_DIMENSION = int(os.getenv("OCR_MAX_DIMENSION", "2048"))
+OCR_RECOMPRESS_BYTES = int(os.getenv("OCR_RECOMPRESS_BYTES", str(1024 * 1024)))
+OCR_JPEG_QUALITY = int(os.getenv("OCR_JPEG_QUALITY", "85"))
+
+# (format, magic bytes at offset 0); WEBP also needs "WEBP" at offset 8
+_SIGNATURES = (
+    ("png", b"\x89PNG\r\n\x1a\n"),
+    ("jpeg", b"\xff\xd8\xff"),
+    ("gif", b"GIF87a"),
+    ("gif", b"GIF89a"),
+    ("bmp", b"BM"),
+    ("tiff", b"II*\x00"),
+    ("tiff", b"MM\x00*"),
+    ("webp", b"RIFF"),
+)
+
+
+class ImageTooLarge(Exception):
+    pass
+
+
+def sniff_format(header):
+    """Identify the image format from its first bytes, or None if it isn't one Vision accepts"""
+    for image_format, magic in _SIGNATURES:
+        if header.startswith(magic):
+            if image_format == "webp" and header[8:12] != b"WEBP":
+                continue
+            return image_format
+    return None
+
+
+async def read_limited(chunks, limit=UPLOAD_MAX_BYTES):
+    """Collect an async byte stream, stopping as soon as it exceeds the limit"""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer.extend(chunk)
+        if len(buffer) > limit:
+            raise ImageTooLarge(f"Image exceeds {limit // (1024 * 1024)} MB")
+    return bytes(buffer)
+
+
+def preload():
+    """Load Pillow's format plugins now instead of during the first upload"""
+    if Image is not None:
+        Image.init()
+
+
+def prepare_for_ocr(data, image_format):
+    """Downscale/recompress images larger than OCR needs; returns (bytes, info)"""
+    info = {"format": image_format, "original_bytes": len(data), "sent_bytes": len(data), "resized": False}
+    if Image is None:
+        return data, info
+
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            info["original_size"] = list(image.size)
+            oversized = max(image.size) > OCR_MAX_DIMENSION
+            if not oversized and len(data) <= OCR_RECOMPRESS_BYTES:
+                return data, info
+
+            image = ImageOps.exif_transpose(image)
+            if oversized:
+                image.thumbnail((OCR_MAX_DIMENSION, OCR_MAX_DIMENSION), Image.LANCZOS)
+            if image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            output = io.BytesIO()
+            image.save(output, format="JPEG", quality=OCR_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        logger.warning(f"Could not downscale {image_format} upload, sending original: {e}")
+        return data, info
+
+    prepared = output.getvalue()
+    if len(prepared) >= len(data) and not oversized:
+        return data, info
+    info.update({"sent_bytes": len(prepared), "resized": oversized, "sent_size": list(image.size), "sent_format": "jpeg"})
+    return prepared, info
@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# Durable job queue for /jobs/detect. Jobs live in a local SQLite file so queued work
+# survives a restart, and several worker processes on one host can share it. Each
+# process runs JOB_WORKERS workers; a job claimed by a worker that stops sending
+# progress for JOB_LEASE seconds is handed to another one (up to JOB_MAX_ATTEMPTS runs).
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", "karipap_jobs.db")
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_MAX = int(os.getenv("JOB_QUEUE_MAX", "1000"))
+JOB_RESULT_TTL = int(os.getenv("JOB_RESULT_TTL", "3600"))
+JOB_LEASE = int(os.getenv("JOB_LEASE", "300"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))
+JOB_MAINTENANCE_INTERVAL = float(os.getenv("JOB_MAINTENANCE_INTERVAL", "60"))
+
+# Priority lanes, drained in this order: a queued interactive job always starts before bulk ones
+LANES = {"interactive": 0, "bulk": 1}
+LANE_NAMES = {rank: name for name, rank in LANES.items()}
+
+
+class QueueFull(Exception):
+    pass
+
+
+class JobQueue:
+    """SQLite-backed queue of detection jobs and their results"""
+
+    def __init__(self, path, max_queued=JOB_QUEUE_MAX):
+        self.max_queued = max_queued
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, kind TEXT NOT NULL, payload TEXT NOT NULL, lane INTEGER NOT NULL, "
+            "status TEXT NOT NULL, stage TEXT, result TEXT, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, heartbeat_at REAL, finished_at REAL, expires_at REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queued ON jobs (status, lane, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at)")
+
+    def _submit(self, kind, payload, lane):
+        with self._lock:
+            queued = self._conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+            if queued >= self.max_queued:
+                raise QueueFull(f"{queued} jobs already queued")
+            job_id = uuid.uuid4().hex
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, payload, lane, status, stage, created_at) "
+                "VALUES (?, ?, ?, ?, 'queued', 'queued', ?)",
+                (job_id, kind, json.dumps(payload), LANES[lane], time.time()),
+            )
+            return job_id
+
+    def _claim(self):
+        """Atomically move the oldest job of the highest lane to running"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, kind, payload, lane, attempts, created_at FROM jobs WHERE status = 'queued' "
+                    "ORDER BY lane, created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE jobs SET status = 'running', stage = 'started', attempts = attempts + 1, "
+                        "started_at = ?, heartbeat_at = ? WHERE id = ?",
+                        (now, now, row["id"]),
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return None
+        return {
+            "id": row["id"], "kind": row["kind"], "payload": json.loads(row["payload"]),
+            "lane": LANE_NAMES[row["lane"]], "attempt": row["attempts"] + 1, "waited": now - row["created_at"],
+        }
+
+    def _progress(self, job_id, stage):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET stage = ?, heartbeat_at = ? WHERE id = ? AND status = 'running'",
+                (stage, time.time(), job_id),
+            )
+
+    def _finish(self, job_id, result=None, error=None):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, stage = 'done', result = ?, error = ?, finished_at = ?, expires_at = ? "
+                "WHERE id = ?",
+                ("failed" if error else "done", json.dumps(result) if result is not None else None,
+                 error, now, now + JOB_RESULT_TTL, job_id),
+            )
+
+    def _release(self, job_ids):
+        """Put jobs this process was running back in the queue (on shutdown)"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET status = 'queued', stage = 'queued', attempts = attempts - 1 "
+                "WHERE id = ? AND status = 'running'",
+                [(job_id,) for job_id in job_ids],
+            )
+
+    def _maintain(self):
+        """Requeue jobs whose worker went silent, fail those out of attempts, drop expired results"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'failed', stage = 'done', error = 'Worker lost too many times', "
+                "finished_at = ?, expires_at = ? WHERE status = 'running' AND heartbeat_at < ? AND attempts >= ?",
+                (now, now + JOB_RESULT_TTL, now - JOB_LEASE, JOB_MAX_ATTEMPTS),
+            )
+            requeued = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', stage = 'queued' WHERE status = 'running' AND heartbeat_at < ?",
+                (now - JOB_LEASE,),
+            ).rowcount
+            expired = self._conn.execute("DELETE FROM jobs WHERE expires_at < ?", (now,)).rowcount
+        return requeued, expired
+
+    def _get(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None or (row["expires_at"] is not None and row["expires_at"] < time.time()):
+                return None
+            position = None
+            if row["status"] == "queued":
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND (lane < ? OR (lane = ? AND created_at < ?))",
+                    (row["lane"], row["lane"], row["created_at"]),
+                ).fetchone()[0]
+        return {
+            "job_id": row["id"],
+            "kind": row["kind"],
+            "lane": LANE_NAMES[row["lane"]],
+            "status": row["status"],
+            "stage": row["stage"],
+            "queue_position": position,
+            "attempts": row["attempts"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+            "expires_at": row["expires_at"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+        }
+
+    async def submit(self, kind, payload, lane="interactive"):
+        return await asyncio.to_thread(self._submit, kind, payload, lane)
+
+    async def claim(self):
+        return await asyncio.to_thread(self._claim)
+
+    async def progress(self, job_id, stage):
+        await asyncio.to_thread(self._progress, job_id, stage)
+
+    async def finish(self, job_id, result=None, error=None):
+        await asyncio.to_thread(self._finish, job_id, result, error)
+
+    async def release(self, job_ids):
+        await asyncio.to_thread(self._release, job_ids)
+
+    async def maintain(self):
+        return await asyncio.to_thread(self._maintain)
+
+    async def get(self, job_id):
+        return await asyncio.to_thread(self._get, job_id)
+
+    def counts(self):
+        """Jobs per status and lane"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, lane, COUNT(*) FROM jobs GROUP BY status, lane").fetchall()
+        return {(status, LANE_NAMES[lane]): count for status, lane, count in rows}
+
+    async def close(self):
+        self._conn.close()
+
+
+class WorkerPool:
+    """Runs queued jobs through a handler, `size` at a time.
+
+    handler(job, progress) returns the job's result; `await progress(stage)` records the
+    current stage and renews the job's lease. An exception marks the job failed.
+    """
+
+    def __init__(self, queue, handler, size=JOB_WORKERS):
+        self.queue = queue
+        self.handler = handler
+        self.size = size
+        self.wakeup = asyncio.Event()
+        self.tasks = []
+        self.running = set()
+        self.completed = 0
+        self.failed = 0
+
+    def start(self):
+        if self.tasks:
+            return
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(self.size)]
+        self.tasks.append(asyncio.create_task(self._maintenance()))
+        logger.info(f"Started {self.size} job workers")
+
+    def notify(self):
+        """A job was just submitted: wake idle workers instead of waiting for the next poll"""
+        self.wakeup.set()
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.queue.claim()
+            except Exception as e:
+                logger.error(f"Could not claim a job: {e}")
+                job = None
+            if job is None:
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except Exception as e:
+                # A worker that dies here shrinks the pool for good
+                logger.error(f"Job worker error on job {job['id']}: {e}")
+
+    async def _run(self, job):
+        job_id = job["id"]
+        self.running.add(job_id)
+        logger.info(f"Job {job_id} ({job['kind']}, {job['lane']}) started after {job['waited']:.2f}s in queue")
+        metrics.JOB_WAIT_SECONDS.observe(job["waited"], lane=job["lane"])
+        try:
+            with metrics.JOB_RUN_SECONDS.time(kind=job["kind"]):
+                result = await self.handler(job, lambda stage: self.queue.progress(job_id, stage))
+        except asyncio.CancelledError:
+            # Left in self.running so stop() hands it back to the queue
+            raise
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}")
+            self.failed += 1
+            outcome = {"error": str(e)}
+        else:
+            self.completed += 1
+            outcome = {"result": result}
+        try:
+            await self._finish(job_id, outcome)
+        finally:
+            self.running.discard(job_id)
+
+    async def _finish(self, job_id, outcome):
+        """Store the outcome. A result that can't be stored (not JSON serialisable, say) marks
+        the job failed; if even that fails the job is run again once its lease expires."""
+        try:
+            await self.queue.finish(job_id, **outcome)
+            return
+        except Exception as e:
+            logger.error(f"Could not store the outcome of job {job_id}: {e}")
+            if "error" in outcome:
+                return
+            error = f"Could not store the result: {e}"
+        try:
+            await self.queue.finish(job_id, error=error)
+        except Exception as e:
+            logger.error(f"Could not mark job {job_id} failed: {e}")
+
+    async def _maintenance(self):
+        while True:
+            try:
+                requeued, expired = await self.queue.maintain()
+                if requeued or expired:
+                    logger.info(f"Job maintenance: {requeued} requeued, {expired} expired")
+                if requeued:
+                    self.notify()
+            except Exception as e:
+                logger.error(f"Job maintenance failed: {e}")
+            await asyncio.sleep(JOB_MAINTENANCE_INTERVAL)
+
+    def stats(self):
+        queue = self.queue.counts()
+        return {
+            "workers": self.size,
+            "busy": len(self.running),
+            "completed": self.completed,
+            "failed": self.failed,
+            "queued": {lane: queue.get(("queued", lane), 0) for lane in LANES},
+            "running": sum(count for (status, _), count in queue.items() if status == "running"),
+            "stored_results": sum(count for (status, _), count in queue.items() if status in ("done", "failed")),
+            "result_ttl": JOB_RESULT_TTL,
+        }
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        # Whatever was mid-flight runs again on the next start instead of waiting out its lease
+        if self.running:
+            await self.queue.release(list(self.running))
+            self.running.clear()
+
+
+job_queue = JobQueue(JOB_DB_PATH)
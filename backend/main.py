@@ -1,16 +1,45 @@
+import time
+
+# Everything from here until the end of this module counts as import time
+IMPORT_STARTED = time.perf_counter()
+
 from fastapi import FastAPI, HTTPException
+from fastapi import Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
+from typing import List, Optional
 from dotenv import load_dotenv
+import asyncio
+import contextlib
+import functools
+import httpx
 import logging
-import time
 import base64
-import requests
 import json
 import os
 
 load_dotenv()
 
+# Local modules read their settings from the environment, so import them after load_dotenv
+import articles
+import cache
+import chunking
+import governor
+import images
+import jobs
+import metrics
+import pipeline
+import prefix_cache
+import preclassifier
+import prompts
+import routing
+import schemas
+import similarity
+import singleflight
+import upstream
+import warmup
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -37,198 +66,600 @@ if not GOOGLE_VISION_KEY:
 if not GEMINI_API_KEY:
     logger.warning("GEMINI_API_KEY not found in environment variables")
 
+# Per-analysis time budget for the combined endpoints; a slow analysis is cut off
+# and reported on its own instead of holding back the other verdict
+ANALYSIS_TIMEOUT = float(os.getenv("ANALYSIS_TIMEOUT", "35"))
+
+# "separate" sends one Gemini call per analysis, "combined" merges both into a single call
+ANALYSIS_MODES = ("separate", "combined")
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "separate")
+
+# Gemini replies in JSON mode against a response schema; a reply that still fails validation
+# gets at most this many repair calls (0 disables repair)
+GEMINI_REPAIR_ATTEMPTS = int(os.getenv("GEMINI_REPAIR_ATTEMPTS", "1"))
+
+# Bulk scoring limits for /detect/batch. Texts up to BATCH_PACK_MAX_CHARS are packed
+# BATCH_PACK_SIZE at a time into one Gemini prompt; images are sent to Vision in groups
+# of VISION_BATCH_SIZE (Vision accepts at most 16 per request) whose base64 payloads add
+# up to at most VISION_BATCH_MAX_BYTES (Vision rejects JSON requests over 10 MB)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_PACK_SIZE = int(os.getenv("BATCH_PACK_SIZE", "10"))
+BATCH_PACK_MAX_CHARS = int(os.getenv("BATCH_PACK_MAX_CHARS", "600"))
+VISION_BATCH_SIZE = min(int(os.getenv("VISION_BATCH_SIZE", "16")), 16)
+VISION_BATCH_MAX_BYTES = int(os.getenv("VISION_BATCH_MAX_BYTES", str(8 * 1024 * 1024)))
+
 # Pydantic models
 class TextNewsRequest(BaseModel):
     text: str
+    mode: Optional[str] = None
 
 class ImageNewsRequest(BaseModel):
     image: str
+    mode: Optional[str] = None
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    text: Optional[str] = None
+    image: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    analyses: List[str] = ["fakenews", "clickbait"]
+
+class UrlNewsRequest(BaseModel):
+    url: str
+    mode: Optional[str] = None
+
+class JobRequest(BaseModel):
+    text: Optional[str] = None
+    image: Optional[str] = None
+    url: Optional[str] = None
+    mode: Optional[str] = None
+    priority: str = "interactive"
+
+def check_analysis_mode(mode):
+    if mode is not None and mode not in ANALYSIS_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of: {', '.join(ANALYSIS_MODES)}")
+
+# Key checks, connection warm-up and start-up timings (see warmup.py)
+startup = warmup.StartupState(IMPORT_STARTED)
 
 # SYSTEM STEP - 1:  DIAGNOSTIC ENDPOINTS 
 @app.get("/diagnose/gemini")
 async def diagnose_gemini():
-    """Check available Gemini models"""
-    url = f"https://generativelanguage.googleapis.com/v1beta/models?key={GEMINI_API_KEY}"
-    
+    """Check available Gemini models (listed at start-up, refreshed after MODEL_LIST_TTL)"""
     try:
-        response = requests.get(url, timeout=10)
-        if response.status_code == 200:
-            models = response.json().get('models', [])
-            model_names = [m['name'].replace('models/', '') for m in models]
+        model_names = await warmup.model_list(startup, GEMINI_API_KEY)
+        if model_names is not None:
             return {
                 "status": "success",
                 "available_models": model_names,
-                "recommended_model": "gemini-2.5-flash",
-                "message": "Use 'gemini-2.5-flash' in your API calls"
+                "fetched_at": startup.models_fetched_at,
+                "configured_models": routing.all_models(),
+                # Configured tiers Gemini doesn't offer to this key would fail every call routed to them
+                "missing_models": [name for name in routing.all_models() if name not in model_names]
             }
         else:
-            return {"status": "error", "message": response.text}
+            return {"status": "error", "message": startup.checks["gemini"].get("error")}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+# RESULT CACHING
+# Error/Unknown verdicts come from quota, network or parsing trouble, so they are never cached
+UNCACHEABLE_PREDICTIONS = ("Error", "Unknown")
+
+async def store_analysis(key, result):
+    if result.get("prediction") not in UNCACHEABLE_PREDICTIONS:
+        await cache.analysis_cache.set(key, result)
+
+# Identical requests that miss the cache while a call for them is already running
+# wait for that call instead of starting their own
+analysis_flights = singleflight.SingleFlight("analysis")
+ocr_flights = singleflight.SingleFlight("ocr")
+
+def cached_analysis(analysis_type):
+    """Serve repeat submissions of the same (normalized) text from the analysis cache"""
+    def decorator(analyze):
+        @functools.wraps(analyze)
+        async def wrapper(text):
+            key = cache.analysis_key(analysis_type, text)
+            cached = await cache.analysis_cache.get(key)
+            if cached is not None:
+                return cached
+            
+            async def analyze_and_store():
+                result = await analyze(text)
+                await store_analysis(key, result)
+                return result
+            
+            return dict(await analysis_flights.do(key, analyze_and_store))
+        return wrapper
+    return decorator
+
+def cached_ocr(ocr):
+    """Let repeated screenshots skip the Vision call entirely"""
+    @functools.wraps(ocr)
+    async def wrapper(image_base64):
+        key = cache.image_key(image_base64)
+        cached = await cache.ocr_cache.get(key)
+        if cached is not None:
+            return cached
+        
+        async def ocr_and_store():
+            result = await ocr(image_base64)
+            if result["success"]:
+                await cache.ocr_cache.set(key, result)
+            return result
+        
+        return dict(await ocr_flights.do(key, ocr_and_store))
+    return wrapper
+
+# NEAR-DUPLICATE MATCHING
+async def near_duplicate_lookup(index, text):
+    """(fingerprint, reused verdict or None) for an earlier text this one is a reworded or noisy
+    copy of; the fingerprint is None for texts too short to match"""
+    # MinHash is CPU-bound, keep it off the event loop
+    fingerprint = await asyncio.to_thread(index.fingerprint, text)
+    if fingerprint is None:
+        return None, None
+    match = index.lookup(*fingerprint)
+    if match is None:
+        return fingerprint, None
+    entry_id, similarity_score, entry = match
+    result = dict(entry["result"])
+    result["near_duplicate"] = {
+        "matched_id": entry_id,
+        "similarity": round(similarity_score, 3),
+        "matched_text": entry["preview"]
+    }
+    return fingerprint, result
+
+async def near_duplicate_store(index, analysis_type, text, result, fingerprint=None):
+    """Index a fresh verdict so later copies of the text can reuse it"""
+    if result.get("prediction") in UNCACHEABLE_PREDICTIONS or "near_duplicate" in result:
+        return
+    fingerprint = fingerprint or await asyncio.to_thread(index.fingerprint, text)
+    if fingerprint is not None:
+        index.add(cache.analysis_key(analysis_type, text), fingerprint, text, dict(result))
+
+def near_duplicate_analysis(index, analysis_type):
+    """Reuse the verdict of an earlier text that this one is a reworded or noisy copy of"""
+    def decorator(analyze):
+        @functools.wraps(analyze)
+        async def wrapper(text):
+            fingerprint, result = await near_duplicate_lookup(index, text)
+            if result is not None:
+                return result
+            
+            result = await analyze(text)
+            if fingerprint is not None:
+                await near_duplicate_store(index, analysis_type, text, result, fingerprint)
+            return result
+        return wrapper
+    return decorator
+
+# LOCAL CLICKBAIT PRE-CLASSIFIER
+def local_clickbait_verdict(text):
+    """Clickbait verdict from the in-process scorer, or None when Gemini should decide"""
+    with metrics.STAGE_SECONDS.time(stage="preclassifier"):
+        return preclassifier.clickbait_preclassifier.verdict(text)
+
+def preclassified_clickbait(analyze):
+    """Answer obvious clickbait locally and only call Gemini for the rest"""
+    @functools.wraps(analyze)
+    async def wrapper(text):
+        verdict = local_clickbait_verdict(text)
+        if verdict is not None:
+            return verdict
+        return await analyze(text)
+    return wrapper
+
 # SCANNING METHODS: OCR FUNCTION (Only accept google vision currently for better accuracy and language support)
-def ocr_with_google_vision(image_base64):
+@cached_ocr
+@metrics.timed("ocr")
+async def ocr_with_google_vision(image_base64):
     """Use Google Vision API for OCR"""
-    url = f"https://vision.googleapis.com/v1/images:annotate?key={GOOGLE_VISION_KEY}"
-    
-    headers = {'Content-Type': 'application/json'}
+    url = f"{upstream.VISION_BASE_URL}/images:annotate?key={GOOGLE_VISION_KEY}"
     
     request_body = {
-        "requests": [
-            {
-                "image": {"content": image_base64},
-                "features": [{"type": "TEXT_DETECTION"}],
-                "imageContext": {"languageHints": ["zh", "en"]}
-            }
-        ]
+        "requests": [vision_image_request(image_base64)]
     }
     
     try:
         logger.info("Calling Google Vision API...")
-        response = requests.post(url, json=request_body, headers=headers, timeout=30)
+        response = await upstream.post_json(url, request_body, timeout=30, service="vision")
         result = response.json()
         
         if response.status_code != 200:
             error_msg = result.get('error', {}).get('message', 'Unknown error')
             return {"success": False, "error": error_msg, "text": ""}
         
-        if 'responses' in result and result['responses'][0]:
-            text_annotation = result['responses'][0].get('textAnnotations', [])
-            if text_annotation:
-                extracted_text = text_annotation[0].get('description', '')
-                return {"success": True, "text": extracted_text, "error": ""}
+        if 'responses' in result and result['responses']:
+            return parse_vision_response(result['responses'][0])
         
         return {"success": True, "text": "", "error": "No text detected"}
     
     except Exception as e:
         return {"success": False, "error": str(e), "text": ""}
 
-# GEMINI FAKE NEWS DETECTION
-def detect_fake_news_with_gemini(text):
-    """Use Gemini to detect fake news - Using gemini-2.5-flash model"""
-    # Use the correct model name from diagnostic (Tried many models but only 2.5 works, not sure my issue or what?)
-    model_name = "gemini-2.5-flash"
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
-    
-    prompt = f"""You are a professional fact-checker and fake news detection expert with years of experience. Analyze this news text using a systematic verification framework.
-
-TEXT TO ANALYZE:
-"{text}"
-
-ANALYSIS FRAMEWORK (apply each step):
-
-1. SOURCE EVALUATION:
-   - Does the text cite specific, verifiable sources?
-   - Are there authoritative references (experts, institutions, studies)?
-   - Is there attribution for claims made?
-
-2. LANGUAGE ANALYSIS:
-   - Check for emotional manipulation (outrage, fear, sensationalism)
-   - Identify loaded language or exaggerated terms
-   - Look for absolute statements ("always," "never," "everyone")
-   - Detect clickbait patterns or hyperbolic phrasing
-
-3. FACTUAL CONSISTENCY:
-   - Are claims specific and verifiable?
-   - Does the text make impossible or highly unlikely claims?
-   - Are there internal contradictions?
-   - Is the timeline logical and consistent?
-
-4. CONTEXT ASSESSMENT:
-   - Does the text provide balanced information?
-   - Are there missing key details that would change interpretation?
-   - Is it presenting opinion as fact?
-   - Does it acknowledge complexity or nuance?
-
-5. RED FLAG IDENTIFICATION:
-   - Unsubstantiated conspiracy theories
-   - Misrepresentation of scientific consensus
-   - False equivalency or false balance
-   - Cherry-picked data or statistics
-   - Ad hominem attacks or straw man arguments
-
-Now, based on this systematic analysis, provide your verdict in the exact JSON format below. Be specific and reference actual content from the text in your explanation.
-
-{{
-    "prediction": "Fake" or "Not Fake" or "Uncertain",
-    "confidence": (number 0-100, based on strength of evidence),
-    "explanation": "A comprehensive explanation that references specific elements from the text and explains why it's fake/real",
-    "key_points": [
-        "Specific concerning element or verification point 1",
-        "Specific concerning element or verification point 2", 
-        "Specific concerning element or verification point 3"
-    ]
-}}
+def vision_image_request(image_base64):
+    return {
+        "image": {"content": image_base64},
+        "features": [{"type": "TEXT_DETECTION"}],
+        "imageContext": {"languageHints": ["zh", "en"]}
+    }
 
-Important guidelines:
-- Use "Uncertain" if the text lacks enough information for a definitive judgment
-- Base confidence on: clarity of evidence, presence of verifiable claims, and strength of red flags
-- In explanation, explicitly reference words/phrases from the text
-- For "Not Fake" predictions, highlight what makes it credible
-- For "Fake" predictions, explain exactly what makes it unreliable
+def parse_vision_response(entry):
+    """Turn one element of the Vision 'responses' array into our OCR result shape"""
+    if entry and entry.get('error'):
+        return {"success": False, "error": entry['error'].get('message', 'Unknown error'), "text": ""}
+    
+    text_annotation = entry.get('textAnnotations', []) if entry else []
+    if text_annotation:
+        extracted_text = text_annotation[0].get('description', '')
+        return {"success": True, "text": extracted_text, "error": ""}
+    
+    return {"success": True, "text": "", "error": "No text detected"}
 
-Return ONLY the JSON, no additional text."""
+def vision_groups(images):
+    """Split (state, image_base64) pairs into Vision requests bounded by count and payload size;
+    an image over the size cap on its own still gets its own request"""
+    groups, group, size = [], [], 0
+    for entry in images:
+        image_size = len(entry[1])
+        if group and (len(group) == VISION_BATCH_SIZE or size + image_size > VISION_BATCH_MAX_BYTES):
+            groups.append(group)
+            group, size = [], 0
+        group.append(entry)
+        size += image_size
+    if group:
+        groups.append(group)
+    return groups
 
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}]
+@metrics.timed("ocr_batch")
+async def ocr_batch_with_google_vision(images):
+    """OCR several images with one Vision request - results line up with the input list"""
+    keys = [cache.image_key(image) for image in images]
+    results = [await cache.ocr_cache.get(key) for key in keys]
+    missing = [index for index, result in enumerate(results) if result is None]
+    if not missing:
+        return results
+    
+    url = f"{upstream.VISION_BASE_URL}/images:annotate?key={GOOGLE_VISION_KEY}"
+    request_body = {
+        "requests": [vision_image_request(images[index]) for index in missing]
     }
     
-    headers = {'Content-Type': 'application/json'}
+    try:
+        logger.info(f"Calling Google Vision API for {len(missing)} images...")
+        response = await upstream.post_json(url, request_body, timeout=60, service="vision")
+        result = response.json()
+        
+        if response.status_code != 200:
+            error_msg = result.get('error', {}).get('message', 'Unknown error')
+            for index in missing:
+                results[index] = {"success": False, "error": error_msg, "text": ""}
+            return results
+        
+        responses = result.get('responses', [])
+        for position, index in enumerate(missing):
+            results[index] = parse_vision_response(responses[position] if position < len(responses) else {})
+            if results[index]["success"]:
+                await cache.ocr_cache.set(keys[index], results[index])
     
+    except Exception as e:
+        for index in missing:
+            results[index] = {"success": False, "error": str(e), "text": ""}
+    
+    return results
+
+# GEMINI RESPONSE PARSING
+class GeminiStatusError(Exception):
+    def __init__(self, status_code, body):
+        super().__init__(f"Gemini API error: {status_code} - {body}")
+        self.status_code = status_code
+
+# Failures of one model tier that the next tier may not share (an unknown model, that
+# model's own quota, a dropped connection); an open circuit covers every tier alike
+ESCALATABLE_ERRORS = (GeminiStatusError, httpx.TransportError, asyncio.TimeoutError)
+
+def gemini_payload(content, schema, system=None, cached_content=None):
+    """Request body in JSON response mode, so the reply is generated against the schema.
+    The static instructions travel as a cachedContents reference when one is live, else inline."""
+    payload = {
+        "contents": [{"role": "user", "parts": [{"text": content}]}],
+        "generationConfig": schemas.generation_config(schema)
+    }
+    if cached_content:
+        payload["cachedContent"] = cached_content
+    elif system:
+        payload["systemInstruction"] = {"parts": [{"text": system}]}
+    return payload
+
+async def post_gemini_generate(analysis, model_name, content, schema, timeout=30):
+    """generateContent with the analysis's system instruction; returns (payload, response)"""
+    url = f"{upstream.GEMINI_BASE_URL}/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
+    system = prompts.SYSTEM_INSTRUCTIONS.get(analysis)
+    cached_content = prefix_cache.gemini_prefixes.lookup(model_name, analysis, system)
+    while True:
+        payload = gemini_payload(content, schema, system, cached_content)
+        with metrics.GEMINI_GENERATE_SECONDS.time(analysis=analysis, prefix="cached" if cached_content else "inline"):
+            response = await upstream.post_json(url, payload, timeout=timeout, service="gemini")
+        if cached_content and response.status_code in prefix_cache.STALE_CACHE_STATUS:
+            # The cache expired or was deleted upstream: forget it and resend with the prefix inline
+            logger.warning(f"Cached prompt prefix {cached_content} rejected ({response.status_code}), sending it inline")
+            prefix_cache.gemini_prefixes.invalidate(model_name, analysis)
+            cached_content = None
+            continue
+        return payload, response
+
+def response_text(result):
+    candidates = result.get("candidates") or [{}]
+    parts = candidates[0].get("content", {}).get("parts", [])
+    return "".join(part.get("text", "") for part in parts)
+
+def observe_gemini_response(analysis, payload, result, usage=None):
+    """Record prompt/response sizes and the token usage Gemini reports"""
+    # Characters actually sent: the user message plus the instructions when they went inline
+    prompt_chars = sum(len(part["text"]) for part in payload["contents"][0]["parts"])
+    prompt_chars += sum(len(part["text"]) for part in payload.get("systemInstruction", {}).get("parts", []))
+    metrics.GEMINI_PROMPT_CHARS.observe(prompt_chars, analysis=analysis)
+    metrics.GEMINI_RESPONSE_CHARS.observe(len(response_text(result)), analysis=analysis)
+    # "cached" is the part of the prompt served from a cachedContents prefix (billed at the cached rate)
+    for kind, field in (("prompt", "promptTokenCount"), ("cached", "cachedContentTokenCount"),
+                        ("candidates", "candidatesTokenCount"), ("thoughts", "thoughtsTokenCount"),
+                        ("total", "totalTokenCount")):
+        count = (usage or result.get("usageMetadata", {})).get(field)
+        if count:
+            metrics.GEMINI_TOKENS.inc(count, analysis=analysis, kind=kind)
+
+def extract_json_object(text_response):
+    """Pull the JSON object out of a Gemini reply (it might be wrapped in markdown code blocks)"""
     try:
-        logger.info(f"Calling Gemini API with model {model_name}...")
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
+        if '```json' in text_response:
+            text_response = text_response.split('```json')[1].split('```')[0]
+        elif '```' in text_response:
+            text_response = text_response.split('```')[1].split('```')[0]
         
-        if response.status_code == 200:
-            result = response.json()
+        start = text_response.find('{')
+        end = text_response.rfind('}') + 1
+        if start != -1 and end > start:
+            parsed = json.loads(text_response[start:end])
+            if isinstance(parsed, dict):
+                return parsed
+    except json.JSONDecodeError as e:
+        logger.error(f"JSON parsing error: {e}")
+    return None
+
+@metrics.timed("json_extract")
+def parse_gemini_json(text_response, validate):
+    """Validated result from a Gemini reply, or None if it is not JSON of the expected shape"""
+    try:
+        parsed = json.loads(text_response)
+    except ValueError:
+        # JSON mode replies are bare JSON; this only runs if a model still wraps it in prose or fences
+        parsed = extract_json_object(text_response)
+    if parsed is None:
+        return None
+    try:
+        return validate(parsed)
+    except schemas.SchemaError as e:
+        logger.error(f"Gemini reply does not match the schema: {e}")
+        return None
+
+async def repair_gemini_json(analysis, model_name, text_response, schema, validate, timeout=30):
+    """Ask Gemini to fix a malformed reply, at most GEMINI_REPAIR_ATTEMPTS times.
+    The repair prompt carries only the broken output, not the article or the framework."""
+    for attempt in range(GEMINI_REPAIR_ATTEMPTS):
+        logger.warning(f"Malformed {analysis} reply from Gemini, asking for a repair ({attempt + 1}/{GEMINI_REPAIR_ATTEMPTS})")
+        payload, response = await post_gemini_generate(
+            f"{analysis}_repair", model_name, prompts.repair_prompt(text_response), schema, timeout
+        )
+        if response.status_code != 200:
+            logger.error(f"Gemini repair call failed: {response.status_code} - {response.text}")
+            return None
+        result = response.json()
+        observe_gemini_response(f"{analysis}_repair", payload, result)
+        text_response = response_text(result)
+        parsed = parse_gemini_json(text_response, validate)
+        if parsed is not None:
+            return parsed
+    return None
+
+async def finish_gemini_json(analysis, model_name, text_response, schema, validate, timeout=30):
+    """Parse a complete reply, repairing it only if it came back malformed"""
+    parsed = parse_gemini_json(text_response, validate)
+    if parsed is not None:
+        metrics.GEMINI_STRUCTURED_REPLIES.inc(analysis=analysis, outcome="valid")
+        return parsed
+    # An empty reply (e.g. blocked by safety filters) has nothing to repair
+    if text_response.strip():
+        parsed = await repair_gemini_json(analysis, model_name, text_response, schema, validate, timeout)
+    metrics.GEMINI_STRUCTURED_REPLIES.inc(analysis=analysis, outcome="repaired" if parsed is not None else "invalid")
+    return parsed
+
+async def generate_gemini_json(analysis, model_name, content, schema, validate=None, timeout=30):
+    """One generateContent call in JSON mode. Returns (validated result or None, raw reply text);
+    raises GeminiStatusError on a non-200 response"""
+    validate = validate or functools.partial(schemas.conform, schema=schema)
+    payload, response = await post_gemini_generate(analysis, model_name, content, schema, timeout)
+    if response.status_code != 200:
+        raise GeminiStatusError(response.status_code, response.text)
+    
+    result = response.json()
+    observe_gemini_response(analysis, payload, result)
+    text_response = response_text(result)
+    parsed = await finish_gemini_json(analysis, model_name, text_response, schema, validate, timeout)
+    return parsed, text_response
+
+async def generate_cascaded_json(analysis, content, schema, verdicts, validate=None, timeout=30):
+    """generate_gemini_json down the analysis's model tiers (see routing.py), cheapest first.
+
+    verdicts(parsed) lists the shaped verdicts whose confidence decides whether to escalate.
+    A tier that fails with an ESCALATABLE_ERRORS error escalates too; if the last tier tried
+    fails, the best earlier reply is kept, or the error is raised when there is none. Returns
+    (validated result or None, raw reply text, model name, tier number from 1).
+    """
+    route = routing.route(analysis)
+    tiers = route.tiers(startup.models)
+    answer = None
+    for position, (tier, model_name) in enumerate(tiers, 1):
+        last = position == len(tiers)
+        try:
+            logger.info(f"Calling Gemini API for {analysis} with model {model_name} (tier {tier})...")
+            parsed, text_response = await generate_gemini_json(analysis, model_name, content, schema, validate, timeout)
+        except ESCALATABLE_ERRORS as e:
+            if last:
+                if answer is None:
+                    raise
+                logger.error(f"Escalated {analysis} call to {model_name} failed, keeping the {answer[2]} reply: {e}")
+                break
+            route.escalated(model_name, "error")
+            logger.warning(f"Escalating {analysis} from {model_name} after an error: {e}")
+            continue
+        answer = (parsed, text_response, model_name, tier)
+        if last:
+            break
+        reason = route.escalation_reason(None if parsed is None else verdicts(parsed))
+        if reason is None:
+            break
+        route.escalated(model_name, reason)
+        logger.info(f"Escalating {analysis} from {model_name} ({reason})")
+    route.answered(answer[2], answer[3])
+    return answer
+
+def answered_by(result, model_name, tier):
+    """Record on a verdict which model tier produced it"""
+    return {**result, "model": model_name, "model_tier": tier}
+
+def shape_fake_news(parsed):
+    return {
+        "prediction": parsed.get("prediction", "Unknown"),
+        "confidence": parsed.get("confidence", 0),
+        "explanation": parsed.get("explanation", "No explanation provided"),
+        "key_points": parsed.get("key_points", [])
+    }
+
+def shape_clickbait(parsed):
+    return {
+        "score": parsed.get("score", 0),
+        "prediction": parsed.get("prediction", "Unknown"),
+        "confidence": parsed.get("confidence", 0),
+        "explanation": parsed.get("explanation", ""),
+        "clickbait_elements": parsed.get("clickbait_elements", [])
+    }
+
+# LONG TEXT ANALYSIS (chunked map-reduce)
+# Chunk verdicts that came back as Error/Unknown are left out of the merged result
+CHUNK_KEY_POINTS = 8
+
+def merge_lists(results, field):
+    merged = []
+    for result in results:
+        for item in result.get(field, []):
+            if item not in merged:
+                merged.append(item)
+    return merged[:CHUNK_KEY_POINTS]
+
+def reduce_fake_news(results):
+    """One verdict for the whole text: any Fake part makes it Fake, a Not Fake majority makes it Not Fake"""
+    parts = [(number, result) for number, result in enumerate(results, 1)
+             if result.get("prediction") not in UNCACHEABLE_PREDICTIONS]
+    if not parts:
+        return {**results[0], "chunks": {"count": len(results), "analyzed": 0}}
+    
+    by_prediction = {}
+    for number, result in parts:
+        by_prediction.setdefault(result["prediction"], []).append((number, result))
+    if "Fake" in by_prediction:
+        prediction = "Fake"
+    elif len(by_prediction.get("Not Fake", [])) * 2 > len(parts):
+        prediction = "Not Fake"
+    else:
+        prediction = "Uncertain"
+    # Parts that agree with the overall verdict explain it; the rest only add key points
+    decisive = by_prediction.get(prediction) or parts
+    
+    return {
+        "prediction": prediction,
+        "confidence": round(sum(result.get("confidence", 0) for _, result in decisive) / len(decisive)),
+        "explanation": " ".join(f"[Part {number}/{len(results)}] {result.get('explanation', '')}" for number, result in decisive),
+        "key_points": merge_lists([result for _, result in decisive] + [result for _, result in parts], "key_points"),
+        "chunks": {"count": len(results), "analyzed": len(parts)}
+    }
+
+def reduce_clickbait(results):
+    """One verdict for the whole text: the most clickbait-like part decides"""
+    parts = [(number, result) for number, result in enumerate(results, 1)
+             if result.get("prediction") not in UNCACHEABLE_PREDICTIONS]
+    if not parts:
+        return {**results[0], "chunks": {"count": len(results), "analyzed": 0}}
+    
+    number, strongest = max(parts, key=lambda part: part[1].get("score", 0))
+    return {
+        "score": strongest.get("score", 0),
+        "prediction": strongest["prediction"],
+        "confidence": strongest.get("confidence", 0),
+        "explanation": f"[Part {number}/{len(results)}] {strongest.get('explanation', '')}",
+        "clickbait_elements": merge_lists([strongest] + [result for _, result in parts], "clickbait_elements"),
+        "chunks": {"count": len(results), "analyzed": len(parts)}
+    }
+
+def chunked_analysis(reduce):
+    """Split texts over LONG_TEXT_THRESHOLD tokens into chunks, analyse them in parallel and
+    reduce the chunk verdicts into one. Shorter texts keep the single-call path."""
+    def decorator(analyze):
+        @functools.wraps(analyze)
+        async def wrapper(text):
+            if not chunking.is_long(text):
+                return await analyze(text)
             
-            if 'candidates' in result and len(result['candidates']) > 0:
-                text_response = result['candidates'][0]['content']['parts'][0]['text']
-                
-                # Extract JSON from response
-                try:
-                    # Find JSON in the response (it might be wrapped in markdown code blocks)
-                    if '```json' in text_response:
-                        text_response = text_response.split('```json')[1].split('```')[0]
-                    elif '```' in text_response:
-                        text_response = text_response.split('```')[1].split('```')[0]
-                    
-                    start = text_response.find('{')
-                    end = text_response.rfind('}') + 1
-                    if start != -1 and end > start:
-                        json_str = text_response[start:end]
-                        parsed = json.loads(json_str)
-                        return {
-                            "prediction": parsed.get("prediction", "Unknown"),
-                            "confidence": parsed.get("confidence", 0),
-                            "explanation": parsed.get("explanation", "No explanation provided"),
-                            "key_points": parsed.get("key_points", [])
-                        }
-                except json.JSONDecodeError as e:
-                    logger.error(f"JSON parsing error: {e}")
-                
-                # Fallback - return raw response
-                return {
-                    "prediction": "Unknown",
-                    "confidence": 0,
-                    "explanation": text_response[:500],
-                    "key_points": []
-                }
-        elif response.status_code == 429:
+            chunks = chunking.split_text(text)
+            logger.info(f"Long text (~{chunking.estimate_tokens(text)} tokens) split into {len(chunks)} chunks")
+            with metrics.STAGE_SECONDS.time(stage="chunked_analysis"):
+                results = await asyncio.gather(*(analyze(chunk) for chunk in chunks))
+            return reduce(results)
+        return wrapper
+    return decorator
+
+# GEMINI FAKE NEWS DETECTION
+@chunked_analysis(reduce_fake_news)
+@cached_analysis("fakenews")
+@near_duplicate_analysis(similarity.fake_news_index, "fakenews")
+@metrics.timed("fake_news")
+async def detect_fake_news_with_gemini(text):
+    """Use Gemini to detect fake news - cheapest model tier first, escalating when unsure"""
+    try:
+        parsed, text_response, model_name, tier = await generate_cascaded_json(
+            "fakenews", prompts.article(text), schemas.FAKE_NEWS, lambda parsed: [shape_fake_news(parsed)]
+        )
+        if parsed is not None:
+            return answered_by(shape_fake_news(parsed), model_name, tier)
+        
+        # Fallback - return raw response
+        return {
+            "prediction": "Unknown",
+            "confidence": 0,
+            "explanation": text_response[:500],
+            "key_points": []
+        }
+    
+    except GeminiStatusError as e:
+        if e.status_code == 429:
             return {
                 "prediction": "Unknown",
                 "confidence": 0,
                 "explanation": "API quota exceeded. Please try again later.",
                 "key_points": ["Quota exceeded"]
             }
-        else:
-            logger.error(f"Gemini API error: {response.status_code} - {response.text}")
-            return {
-                "prediction": "Error",
-                "confidence": 0,
-                "explanation": f"API Error: {response.status_code}",
-                "key_points": ["Please check the diagnostic endpoint"]
-            }
+        logger.error(str(e))
+        return {
+            "prediction": "Error",
+            "confidence": 0,
+            "explanation": f"API Error: {e.status_code}",
+            "key_points": ["Please check the diagnostic endpoint"]
+        }
                 
     except Exception as e:
         logger.error(f"Error with Gemini API: {e}")
@@ -240,123 +671,789 @@ Return ONLY the JSON, no additional text."""
         }
 
 # GEMINI CLICKBAIT DETECTION
-def detect_clickbait_with_gemini(text):
-    """Use Gemini to detect clickbait - Using gemini-2.5-flash model"""
-    model_name = "gemini-2.5-flash"
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={GEMINI_API_KEY}"
-    
-    prompt = f"""You are an expert in digital media analysis specializing in clickbait detection. Analyze this headline/text using a comprehensive clickbait assessment framework.
-
-TEXT TO ANALYZE:
-"{text}"
-
-CLICKBAIT ASSESSMENT FRAMEWORK:
-
-1. EMOTIONAL MANIPULATION CHECK:
-   - Does it provoke strong emotions (shock, anger, curiosity)?
-   - Are there emotional trigger words (unbelievable, shocking, mind-blowing)?
-   - Does it exploit fear, outrage, or FOMO (fear of missing out)?
-
-2. INFORMATION-PROMISE GAP:
-   - Does it promise more information than it delivers?
-   - Are there vague but enticing claims?
-   - Is the headline misleading relative to what you'd expect?
-
-3. CURIOSITY EXPLOITATION:
-   - Does it create curiosity without satisfying it?
-   - Uses patterns like "X will make you Y" or "This is what happens when..."
-   - Numbered lists that seem arbitrary ("10 reasons why...")
-
-4. LINGUISTIC PATTERNS:
-   - All caps or excessive punctuation
-   - Superlatives and exaggerations ("the most," "ever," "in history")
-   - Direct address to reader ("you won't believe," "you need to see")
-   - Absolute statements ("everyone is talking about")
-
-5. MANIPULATIVE TECHNIQUES:
-   - Creating false urgency
-   - Using mystery without substance
-   - Exploiting social proof ("going viral," "everyone's sharing")
-   - Making extraordinary claims without evidence
-
-Now analyze the text and provide your assessment in the exact JSON format below. Be specific about what elements contribute to clickbait score.
-
-{{
-    "score": (0-100 number, where 0 = legitimate headline, 100 = extreme clickbait),
-    "prediction": "Clickbait" or "Not Clickbait",
-    "confidence": (0-100 number based on strength of indicators),
-    "explanation": "Detailed explanation referencing specific words/phrases that influenced the score",
-    "clickbait_elements": [
-        "Specific clickbait element identified 1 (quote the text)",
-        "Specific clickbait element identified 2 (quote the text)",
-        "Specific clickbait element identified 3 (quote the text)"
-    ]
-}}
-
-Guidelines:
-- Score 0-30: Legitimate, informative headline
-- Score 31-60: Mild clickbait tendencies
-- Score 61-100: Strong clickbait
-- In explanation, quote specific words/phrases that are problematic
-- Clickbait elements should be concrete, quoted examples from the text
-
-Return ONLY the JSON, no additional text."""
-
-    payload = {
-        "contents": [{"parts": [{"text": prompt}]}]
-    }
+@chunked_analysis(reduce_clickbait)
+@preclassified_clickbait
+@cached_analysis("clickbait")
+@metrics.timed("clickbait")
+async def detect_clickbait_with_gemini(text):
+    """Use Gemini to detect clickbait - cheapest model tier first, escalating when unsure"""
+    try:
+        parsed, _, model_name, tier = await generate_cascaded_json(
+            "clickbait", prompts.article(text), schemas.CLICKBAIT, lambda parsed: [shape_clickbait(parsed)]
+        )
+        if parsed is not None:
+            return answered_by(shape_clickbait(parsed), model_name, tier)
     
-    headers = {'Content-Type': 'application/json'}
+    except GeminiStatusError as e:
+        logger.error(str(e))
     
-    try:
-        logger.info(f"Calling Gemini API for clickbait with model {model_name}...")
-        response = requests.post(url, json=payload, headers=headers, timeout=30)
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            if 'candidates' in result and len(result['candidates']) > 0:
-                text_response = result['candidates'][0]['content']['parts'][0]['text']
-                
-                try:
-                    # Extract JSON from response
-                    if '```json' in text_response:
-                        text_response = text_response.split('```json')[1].split('```')[0]
-                    elif '```' in text_response:
-                        text_response = text_response.split('```')[1].split('```')[0]
-                    
-                    start = text_response.find('{')
-                    end = text_response.rfind('}') + 1
-                    if start != -1 and end > start:
-                        json_str = text_response[start:end]
-                        parsed = json.loads(json_str)
-                        return {
-                            "score": parsed.get("score", 0),
-                            "prediction": parsed.get("prediction", "Unknown"),
-                            "confidence": parsed.get("confidence", 0),
-                            "explanation": parsed.get("explanation", ""),
-                            "clickbait_elements": parsed.get("clickbait_elements", [])
-                        }
-                except json.JSONDecodeError:
-                    pass
-                    
+    except Exception as e:
+        logger.error(f"Clickbait detection failed: {e}")
         return {
             "score": 0,
-            "prediction": "Unknown",
+            "prediction": "Error",
             "confidence": 0,
-            "explanation": "Could not analyze clickbait",
+            "explanation": str(e),
             "clickbait_elements": []
         }
+    
+    return {
+        "score": 0,
+        "prediction": "Unknown",
+        "confidence": 0,
+        "explanation": "Could not analyze clickbait",
+        "clickbait_elements": []
+    }
+
+# GEMINI COMBINED DETECTION (one call, merged prompt)
+@metrics.timed("combined")
+async def detect_combined_with_gemini(text):
+    """Use one Gemini call for both analyses - returns (fake_news, clickbait) in the usual shapes.
+    Escalates to the next model tier when either verdict is unsure."""
+    try:
+        parsed, text_response, model_name, tier = await generate_cascaded_json(
+            "combined", prompts.article(text), schemas.COMBINED,
+            lambda parsed: [shape_fake_news(parsed["fake_news"]), shape_clickbait(parsed["clickbait"])]
+        )
+        if parsed is not None:
+            return (answered_by(shape_fake_news(parsed["fake_news"]), model_name, tier),
+                    answered_by(shape_clickbait(parsed["clickbait"]), model_name, tier))
         
-    except Exception as e:
-        logger.error(f"Clickbait detection failed: {e}")
         return {
+            "prediction": "Unknown",
+            "confidence": 0,
+            "explanation": text_response[:500],
+            "key_points": []
+        }, {
             "score": 0,
-            "prediction": "Error",
+            "prediction": "Unknown",
             "confidence": 0,
-            "explanation": str(e),
+            "explanation": "Could not analyze clickbait",
             "clickbait_elements": []
         }
+    
+    except GeminiStatusError as e:
+        if e.status_code == 429:
+            return {
+                "prediction": "Unknown",
+                "confidence": 0,
+                "explanation": "API quota exceeded. Please try again later.",
+                "key_points": ["Quota exceeded"]
+            }, {
+                "score": 0,
+                "prediction": "Unknown",
+                "confidence": 0,
+                "explanation": "API quota exceeded. Please try again later.",
+                "clickbait_elements": []
+            }
+        logger.error(str(e))
+        return fake_news_failure(f"API Error: {e.status_code}"), clickbait_failure(f"API Error: {e.status_code}")
+    
+    except Exception as e:
+        logger.error(f"Error with Gemini API: {e}")
+        return fake_news_failure(f"Error: {str(e)}"), clickbait_failure(str(e))
+
+# GEMINI PACKED DETECTION (several short texts per call, used by /detect/batch)
+@metrics.timed("packed_analysis")
+async def detect_batch_with_gemini(analysis_type, texts):
+    """Analyse several short texts in one Gemini call per model tier - results line up with texts.
+    Only the texts a tier was unsure about are re-packed for the next tier. None marks a text the
+    (valid) packed reply left out, to be retried on its own; when the packed call itself fails,
+    its texts get the error verdict instead, so a throttled upstream isn't hit once per text."""
+    route = routing.route(analysis_type)
+    tiers = route.tiers(startup.models)
+    shape = shape_fake_news if analysis_type == "fakenews" else shape_clickbait
+    failure = fake_news_failure if analysis_type == "fakenews" else clickbait_failure
+    results = [None] * len(texts)
+    pending = list(range(len(texts)))
+    error = None
+    
+    for position, (tier, model_name) in enumerate(tiers, 1):
+        last = position == len(tiers)
+        error, reason = None, "error"
+        try:
+            logger.info(f"Calling Gemini API for {len(pending)} packed {analysis_type} texts with model {model_name}...")
+            by_id, _ = await generate_gemini_json(
+                f"packed_{analysis_type}", model_name, prompts.numbered_texts([texts[index] for index in pending]),
+                schemas.batch(analysis_type), validate=functools.partial(schemas.conform_batch, analysis_type=analysis_type),
+                timeout=60
+            )
+        except GeminiStatusError as e:
+            logger.error(f"Packed {analysis_type} call to {model_name} failed: {e}")
+            if e.status_code == 429:
+                error = {**failure("API quota exceeded. Please try again later."), "prediction": "Unknown"}
+            else:
+                error = failure(f"API Error: {e.status_code}")
+        except ESCALATABLE_ERRORS as e:
+            logger.error(f"Packed {analysis_type} call to {model_name} failed: {e}")
+            error = failure(f"Error: {str(e)}")
+        except Exception as e:
+            logger.error(f"Packed {analysis_type} detection failed: {e}")
+            error = failure(f"Error: {str(e)}")
+            break
+        else:
+            if by_id is None:
+                error, reason = {**failure("Could not analyze the packed reply"), "prediction": "Unknown"}, "invalid"
+        
+        if error is not None:
+            if last:
+                break
+            for _ in pending:
+                route.escalated(model_name, reason)
+            continue
+        
+        # A text the stronger tier left out keeps the weaker tier's verdict
+        escalate = []
+        for number, index in enumerate(pending, 1):
+            if number not in by_id:
+                continue
+            results[index] = answered_by(shape(by_id[number]), model_name, tier)
+            reason = None if last else route.escalation_reason([results[index]])
+            if reason is not None:
+                route.escalated(model_name, reason)
+                escalate.append(index)
+        pending = escalate
+        if not pending:
+            break
+    
+    for index, result in enumerate(results):
+        if result is not None:
+            route.answered(result["model"], result["model_tier"])
+        elif error is not None:
+            results[index] = error
+    return results
+
+# CONCURRENT ANALYSIS
+def fake_news_failure(explanation, prediction="Error"):
+    return {
+        "prediction": prediction,
+        "confidence": 0,
+        "explanation": explanation,
+        "key_points": []
+    }
+
+def clickbait_failure(explanation, prediction="Error"):
+    return {
+        "score": 0,
+        "prediction": prediction,
+        "confidence": 0,
+        "explanation": explanation,
+        "clickbait_elements": []
+    }
+
+async def detect_combined_cached(text):
+    """Combined analysis that only calls Gemini when either verdict is missing from the cache"""
+    if chunking.is_long(text):
+        # Long texts are chunked per analysis, which the merged prompt can't do
+        return await asyncio.gather(detect_fake_news_with_gemini(text), detect_clickbait_with_gemini(text))
+    
+    clickbait_verdict = local_clickbait_verdict(text)
+    if clickbait_verdict is not None:
+        return await detect_fake_news_with_gemini(text), clickbait_verdict
+    
+    fake_news_key = cache.analysis_key("fakenews", text)
+    clickbait_key = cache.analysis_key("clickbait", text)
+    fake_news_result = await cache.analysis_cache.get(fake_news_key)
+    clickbait_result = await cache.analysis_cache.get(clickbait_key)
+    fingerprint = None
+    if fake_news_result is None:
+        fingerprint, fake_news_result = await near_duplicate_lookup(similarity.fake_news_index, text)
+    if fake_news_result is not None:
+        # Only clickbait is missing, which the single-analysis path answers more cheaply
+        return fake_news_result, clickbait_result or await detect_clickbait_with_gemini(text)
+    
+    async def analyze_and_store():
+        results = await detect_combined_with_gemini(text)
+        await store_analysis(fake_news_key, results[0])
+        await store_analysis(clickbait_key, results[1])
+        await near_duplicate_store(similarity.fake_news_index, "fakenews", text, results[0], fingerprint)
+        return results
+    
+    fake_news_result, clickbait_result = await analysis_flights.do(
+        cache.hash_key("combined", fake_news_key, clickbait_key), analyze_and_store
+    )
+    return dict(fake_news_result), dict(clickbait_result)
+
+# DETECTION PIPELINE
+# Every detect endpoint, the job workers and the image stream run these stages; an
+# endpoint seeds its input ("text", "image", an already validated "decode", or "url")
+# and asks for the analyses it returns. See pipeline.py.
+def check_text_length(text, item=None):
+    """Reject pasted text over chunking.MAX_TEXT_TOKENS with a 413"""
+    if chunking.is_too_long(text):
+        subject = "Text" if item is None else f"Item {item} text"
+        raise HTTPException(status_code=413, detail=f"{subject} exceeds {chunking.MAX_TEXT_TOKENS} tokens "
+                                                    f"(about {chunking.MAX_TEXT_TOKENS * 4} characters)")
+
+def article_text(article):
+    return "\n\n".join(part for part in (article["title"], article["text"]) if part)
+
+def decode_image(image_base64):
+    """Reject an image that isn't valid base64 with a 400"""
+    try:
+        with metrics.STAGE_SECONDS.time(stage="base64_decode"):
+            base64.b64decode(image_base64)
+    except:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    return image_base64
+
+async def decode_stage(run, image_base64):
+    return decode_image(image_base64)
+
+async def ocr_stage(run, image_base64):
+    ocr_result = await ocr_with_google_vision(image_base64)
+    if not ocr_result["success"]:
+        raise pipeline.Halt(f"OCR failed: {ocr_result['error']}")
+    return ocr_result["text"]
+
+async def article_stage(run, url):
+    try:
+        return await articles.article_fetcher.get(url)
+    except articles.FetchError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def text_source(options):
+    return ("article",) if options.get("input") == "url" else ("ocr",)
+
+async def normalise_stage(run, source):
+    """OCR output, or an article's headline and body, becomes the text to analyse unless there is none.
+    It is cut to chunking.MAX_TEXT_TOKENS; run_detection reports when that happened."""
+    if run.options.get("input") == "url":
+        extracted_text = article_text(source)
+        if not extracted_text.strip():
+            raise pipeline.Halt("No article text found at this URL", prediction="Unknown")
+        return chunking.truncate(extracted_text)[0]
+    if not source.strip():
+        raise pipeline.Halt("No text detected in image", prediction="Unknown")
+    return chunking.truncate(source)[0]
+
+def analysis_source(options):
+    """Each analysis reads the merged reply in combined mode, the text otherwise"""
+    return ("combined",) if (options.get("mode") or ANALYSIS_MODE) == "combined" else ("text",)
+
+async def combined_stage(run, text):
+    return await detect_combined_cached(text)
+
+async def fake_news_stage(run, source):
+    if analysis_source(run.options) == ("combined",):
+        return source[0]
+    return await detect_fake_news_with_gemini(source)
+
+async def clickbait_stage(run, source):
+    if analysis_source(run.options) == ("combined",):
+        return source[1]
+    return await detect_clickbait_with_gemini(source)
+
+DETECTION = pipeline.Pipeline(
+    pipeline.Stage("decode", decode_stage, needs=("image",)),
+    pipeline.Stage("ocr", ocr_stage, needs=("decode",)),
+    pipeline.Stage("article", article_stage, needs=("url",)),
+    pipeline.Stage("text", normalise_stage, needs=text_source),
+    pipeline.Stage("combined", combined_stage, needs=("text",), timeout=ANALYSIS_TIMEOUT,
+                   fallback=lambda explanation, prediction: (fake_news_failure(explanation, prediction),
+                                                             clickbait_failure(explanation, prediction))),
+    pipeline.Stage("fake_news", fake_news_stage, needs=analysis_source, timeout=ANALYSIS_TIMEOUT, fallback=fake_news_failure),
+    pipeline.Stage("clickbait", clickbait_stage, needs=analysis_source, timeout=ANALYSIS_TIMEOUT, fallback=clickbait_failure),
+)
+
+async def run_detection(inputs, analyses, start_time, mode=None, stage_times=None, on_stage=None):
+    """Run the requested analyses ("fake_news", "clickbait") through the pipeline and build the response"""
+    input_type = "text" if "text" in inputs else "url" if "url" in inputs else "image"
+    run = DETECTION.run(inputs, {"mode": mode, "input": input_type}, stage_times, on_stage)
+    response = {"input_type": input_type}
+    response.update(await run.results(*analyses))
+    
+    if input_type == "url":
+        article = await run.get("article")
+        response["url"] = article["url"]
+        response["title"] = article["title"]
+        response["article_text"] = article["text"][:500] + "..." if len(article["text"]) > 500 else article["text"]
+        response["article_length"] = len(article["text"])
+        response["article_cache"] = article["cache"]
+        if chunking.is_too_long(article_text(article)):
+            response["text_truncated"] = True
+    elif input_type == "image":
+        halt = run.halted("text")
+        if halt is None:
+            extracted_text = await run.get("ocr")
+            response["ocr_text"] = extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text
+            response["ocr_length"] = len(extracted_text)
+            if chunking.is_too_long(extracted_text):
+                response["text_truncated"] = True
+        else:
+            response["ocr_text"] = "No text detected" if halt.prediction == "Unknown" else ""
+    
+    response["processing_time"] = round(time.time() - start_time, 2)
+    response["stage_times"] = run.stage_times
+    return response
+
+# STREAMING DETECTION (server-sent events)
+async def stream_gemini_text(analysis, model_name, content, schema):
+    """Yield text chunks from Gemini's streaming endpoint as they are generated"""
+    url = f"{upstream.GEMINI_BASE_URL}/models/{model_name}:streamGenerateContent?alt=sse&key={GEMINI_API_KEY}"
+    system = prompts.SYSTEM_INSTRUCTIONS.get(analysis)
+    cached_content = prefix_cache.gemini_prefixes.lookup(model_name, analysis, system)
+    
+    logger.info(f"Streaming from Gemini API with model {model_name}...")
+    async with contextlib.AsyncExitStack() as stack:
+        while True:
+            payload = gemini_payload(content, schema, system, cached_content)
+            response = await stack.enter_async_context(
+                upstream.stream_post(url, payload, timeout=30, service="gemini")
+            )
+            if response.status_code == 200:
+                break
+            await response.aread()
+            if cached_content and response.status_code in prefix_cache.STALE_CACHE_STATUS:
+                logger.warning(f"Cached prompt prefix {cached_content} rejected ({response.status_code}), sending it inline")
+                prefix_cache.gemini_prefixes.invalidate(model_name, analysis)
+                cached_content = None
+                continue
+            raise GeminiStatusError(response.status_code, response.text)
+        
+        generated, usage = [], {}
+        async for line in response.aiter_lines():
+            if not line.startswith("data:"):
+                continue
+            chunk = json.loads(line[5:])
+            # Each chunk carries the running usage totals, so the last one wins
+            usage = chunk.get("usageMetadata", usage)
+            for candidate in chunk.get("candidates", [])[:1]:
+                for part in candidate.get("content", {}).get("parts", []):
+                    if part.get("text"):
+                        generated.append(part["text"])
+                        yield part["text"]
+        
+        observe_gemini_response(analysis, payload, {"candidates": [{"content": {"parts": [{"text": "".join(generated)}]}}]}, usage)
+
+STREAM_ANALYSES = {
+    "fakenews": ("fake_news", schemas.FAKE_NEWS, shape_fake_news, fake_news_failure),
+    "clickbait": ("clickbait", schemas.CLICKBAIT, shape_clickbait, clickbait_failure),
+}
+
+async def stream_analysis(analysis_type, text, events, stage_times):
+    """Forward generation deltas as '<field>.delta' events, then the parsed verdict as '<field>'.
+    When an unsure verdict is escalated, '<field>.escalated' tells the client to discard the deltas so far."""
+    field, schema, shape, failure = STREAM_ANALYSES[analysis_type]
+    route = routing.route(analysis_type)
+    stage_start = time.time()
+    key = cache.analysis_key(analysis_type, text)
+    
+    if analysis_type == "clickbait":
+        result = local_clickbait_verdict(text)
+        if result is not None:
+            stage_times[field] = round(time.time() - stage_start, 2)
+            await events.put((field, result))
+            return
+    
+    async def generate():
+        if chunking.is_long(text):
+            # Chunks are analysed in parallel without streaming; the merged verdict is sent as one event
+            analyze = detect_fake_news_with_gemini if analysis_type == "fakenews" else detect_clickbait_with_gemini
+            return await analyze(text)
+        
+        tiers = route.tiers(startup.models)
+        answer = None
+        for position, (tier, model_name) in enumerate(tiers, 1):
+            last = position == len(tiers)
+            chunks = []
+            try:
+                async for chunk in stream_gemini_text(analysis_type, model_name, prompts.article(text), schema):
+                    chunks.append(chunk)
+                    await events.put((f"{field}.delta", {"text": chunk}))
+                text_response = "".join(chunks)
+                parsed = await finish_gemini_json(
+                    analysis_type, model_name, text_response, schema, functools.partial(schemas.conform, schema=schema)
+                )
+            except ESCALATABLE_ERRORS as e:
+                if last:
+                    if answer is None:
+                        raise
+                    logger.error(f"Escalated {analysis_type} stream from {model_name} failed, keeping the earlier reply: {e}")
+                    break
+                logger.warning(f"Escalating {analysis_type} stream from {model_name} after an error: {e}")
+                reason = "error"
+            else:
+                answer = (parsed, text_response, model_name, tier)
+                reason = None if last else route.escalation_reason(None if parsed is None else [shape(parsed)])
+                if reason is None:
+                    break
+            route.escalated(model_name, reason)
+            await events.put((f"{field}.escalated", {"from": model_name, "to": tiers[position][1], "reason": reason}))
+        
+        parsed, text_response, model_name, tier = answer
+        route.answered(model_name, tier)
+        if parsed is None:
+            return {**failure(text_response[:500]), "prediction": "Unknown"}
+        result = answered_by(shape(parsed), model_name, tier)
+        await store_analysis(key, result)
+        if analysis_type == "fakenews":
+            await near_duplicate_store(similarity.fake_news_index, "fakenews", text, result)
+        return result
+    
+    result = await cache.analysis_cache.get(key)
+    if result is None and analysis_type == "fakenews" and not chunking.is_long(text):
+        # Long texts are matched per chunk inside detect_fake_news_with_gemini
+        _, result = await near_duplicate_lookup(similarity.fake_news_index, text)
+    if result is None:
+        try:
+            result = await asyncio.wait_for(generate(), ANALYSIS_TIMEOUT)
+        except asyncio.TimeoutError:
+            result = failure(f"Analysis timed out after {ANALYSIS_TIMEOUT:g} seconds")
+        except GeminiStatusError as e:
+            logger.error(str(e))
+            if e.status_code == 429:
+                result = {**failure("API quota exceeded. Please try again later."), "prediction": "Unknown"}
+            else:
+                result = failure(f"API Error: {e.status_code}")
+        except Exception as e:
+            logger.error(f"Streaming {analysis_type} detection failed: {e}")
+            result = failure(f"Error: {str(e)}")
+    
+    stage_times[field] = round(time.time() - stage_start, 2)
+    await events.put((field, result))
+
+def sse_event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def stream_detection(input_type, text=None, image=None):
+    """Emit events as each stage finishes: ocr, then deltas and verdicts for both analyses, then done"""
+    start_time = time.time()
+    stage_times = {}
+    
+    def done_event():
+        return sse_event("done", {
+            "input_type": input_type,
+            "processing_time": round(time.time() - start_time, 2),
+            "stage_times": stage_times
+        })
+    
+    if image is not None:
+        # The image was validated by the endpoint, so the pipeline starts at OCR
+        run = DETECTION.run({"decode": image}, stage_times=stage_times)
+        try:
+            text = await run.get("text")
+        except pipeline.Halt as halt:
+            if halt.prediction == "Unknown":
+                yield sse_event("ocr", {"ocr_text": "No text detected", "ocr_length": 0})
+            else:
+                yield sse_event("ocr", {"ocr_text": "", "error": halt.explanation})
+            yield sse_event("fake_news", fake_news_failure(halt.explanation, halt.prediction))
+            yield sse_event("clickbait", clickbait_failure(halt.explanation, halt.prediction))
+            yield done_event()
+            return
+        
+        extracted_text = await run.get("ocr")
+        ocr_event = {
+            "ocr_text": extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text,
+            "ocr_length": len(extracted_text)
+        }
+        if chunking.is_too_long(extracted_text):
+            ocr_event["text_truncated"] = True
+        yield sse_event("ocr", ocr_event)
+    
+    events = asyncio.Queue()
+    tasks = [
+        asyncio.create_task(stream_analysis(analysis_type, text, events, stage_times))
+        for analysis_type in ("clickbait", "fakenews")
+    ]
+    remaining = len(tasks)
+    try:
+        while remaining:
+            name, data = await events.get()
+            # Only the verdict events end a stage; ".delta" and ".escalated" are progress
+            if "." not in name:
+                remaining -= 1
+            yield sse_event(name, data)
+        yield done_event()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+# BATCH DETECTION
+BATCH_ANALYSES = {
+    "fakenews": ("fake_news", detect_fake_news_with_gemini, fake_news_failure),
+    "clickbait": ("clickbait", detect_clickbait_with_gemini, clickbait_failure),
+}
+
+class BatchRun:
+    """Fans a batch out over packed Gemini calls and multi-image Vision calls, emitting items as they finish"""
+    
+    def __init__(self, items, analyses):
+        self.analyses = analyses
+        self.semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        self.queue = asyncio.Queue()
+        self.states = [
+            {"item": item, "pending": len(analyses), "result": {"id": item.id or str(index), "input_type": "image" if item.image else "text"}}
+            for index, item in enumerate(items)
+        ]
+    
+    def finish(self, state, field, result):
+        state["result"][field] = result
+        state["pending"] -= 1
+        if state["pending"] == 0:
+            self.queue.put_nowait(state["result"])
+    
+    def fail(self, state, explanation, prediction="Error"):
+        for analysis_type in self.analyses:
+            field, _, failure = BATCH_ANALYSES[analysis_type]
+            self.finish(state, field, failure(explanation, prediction))
+    
+    async def run(self):
+        texts, images = [], []
+        for state in self.states:
+            item = state["item"]
+            if item.image:
+                try:
+                    with metrics.STAGE_SECONDS.time(stage="base64_decode"):
+                        base64.b64decode(item.image)
+                    images.append((state, item.image))
+                except Exception:
+                    self.fail(state, "Invalid image data")
+            else:
+                texts.append((state, item.text))
+        
+        jobs = [self.analyze_texts(texts)]
+        for group in vision_groups(images):
+            jobs.append(self.ocr_chunk(group))
+        await asyncio.gather(*jobs)
+    
+    async def ocr_chunk(self, chunk):
+        async with self.semaphore:
+            ocr_results = await ocr_batch_with_google_vision([image for _, image in chunk])
+        
+        ready = []
+        for (state, _), ocr_result in zip(chunk, ocr_results):
+            extracted_text = ocr_result["text"]
+            state["result"]["ocr_text"] = extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text
+            if not ocr_result["success"]:
+                self.fail(state, f"OCR failed: {ocr_result['error']}")
+            elif not extracted_text.strip():
+                self.fail(state, "No text detected in image", prediction="Unknown")
+            else:
+                extracted_text, truncated = chunking.truncate(extracted_text)
+                if truncated:
+                    state["result"]["text_truncated"] = True
+                ready.append((state, extracted_text))
+        await self.analyze_texts(ready)
+    
+    async def analyze_texts(self, entries):
+        jobs = []
+        for analysis_type in self.analyses:
+            packable = []
+            for state, text in entries:
+                if len(text) > BATCH_PACK_MAX_CHARS:
+                    jobs.append(self.analyze_single(analysis_type, state, text))
+                    continue
+                # Long texts get this check inside detect_clickbait_with_gemini
+                if analysis_type == "clickbait":
+                    verdict = local_clickbait_verdict(text)
+                    if verdict is not None:
+                        self.finish(state, "clickbait", verdict)
+                        continue
+                cached = await cache.analysis_cache.get(cache.analysis_key(analysis_type, text))
+                if cached is None and analysis_type == "fakenews":
+                    _, cached = await near_duplicate_lookup(similarity.fake_news_index, text)
+                if cached is not None:
+                    self.finish(state, BATCH_ANALYSES[analysis_type][0], cached)
+                else:
+                    packable.append((state, text))
+            for start in range(0, len(packable), BATCH_PACK_SIZE):
+                jobs.append(self.analyze_pack(analysis_type, packable[start:start + BATCH_PACK_SIZE]))
+        await asyncio.gather(*jobs)
+    
+    async def analyze_single(self, analysis_type, state, text):
+        field, analyze, failure = BATCH_ANALYSES[analysis_type]
+        async with self.semaphore:
+            try:
+                result = await analyze(text)
+            except Exception as e:
+                result = failure(f"Error: {str(e)}")
+        self.finish(state, field, result)
+    
+    async def analyze_pack(self, analysis_type, pack):
+        if len(pack) == 1:
+            return await self.analyze_single(analysis_type, *pack[0])
+        
+        async with self.semaphore:
+            results = await detect_batch_with_gemini(analysis_type, [text for _, text in pack])
+        
+        # Anything the packed reply left out is retried on the single-text path
+        retries = []
+        for (state, text), result in zip(pack, results):
+            if result is None:
+                retries.append(self.analyze_single(analysis_type, state, text))
+            else:
+                await store_analysis(cache.analysis_key(analysis_type, text), result)
+                if analysis_type == "fakenews":
+                    await near_duplicate_store(similarity.fake_news_index, "fakenews", text, result)
+                self.finish(state, BATCH_ANALYSES[analysis_type][0], result)
+        await asyncio.gather(*retries)
+
+async def stream_batch(batch):
+    """NDJSON stream: one line per item as soon as all of its analyses are done, then a summary line"""
+    start_time = time.time()
+    runner = asyncio.create_task(batch.run())
+    runner.add_done_callback(lambda _: batch.queue.put_nowait(None))
+    emitted = 0
+    try:
+        while True:
+            line = await batch.queue.get()
+            if line is None:
+                break
+            emitted += 1
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        
+        if not runner.cancelled() and runner.exception() is not None:
+            logger.error(f"Batch run failed: {runner.exception()}")
+            for state in batch.states:
+                if state["pending"] > 0:
+                    emitted += 1
+                    state["pending"] = 0
+                    yield json.dumps({**state["result"], "error": "Batch processing failed"}, ensure_ascii=False) + "\n"
+        
+        yield json.dumps({"summary": {
+            "items": len(batch.states),
+            "emitted": emitted,
+            "processing_time": round(time.time() - start_time, 2)
+        }}) + "\n"
+    finally:
+        runner.cancel()
+
+# BINARY IMAGE UPLOADS
+async def read_image_upload(request, stage_times=None):
+    """Read a raw image body or multipart 'file' field, check its format and shrink it for OCR.
+    
+    Returns (base64 for Vision, info about what was received and what will be sent).
+    """
+    upload_start = time.time()
+    declared_length = request.headers.get("content-length")
+    if declared_length and declared_length.isdigit() and int(declared_length) > images.UPLOAD_MAX_BYTES + 64 * 1024:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {images.UPLOAD_MAX_BYTES // (1024 * 1024)} MB")
+    
+    try:
+        if request.headers.get("content-type", "").startswith("multipart/form-data"):
+            form = await request.form()
+            upload = form.get("file")
+            if upload is None or isinstance(upload, str):
+                raise HTTPException(status_code=400, detail="Expected the image in a 'file' form field")
+            
+            async def upload_chunks():
+                while chunk := await upload.read(64 * 1024):
+                    yield chunk
+            
+            data = await images.read_limited(upload_chunks())
+        else:
+            data = await images.read_limited(request.stream())
+    except images.ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    image_format = images.sniff_format(data[:16])
+    if image_format is None:
+        raise HTTPException(status_code=400, detail="Invalid image data")
+    
+    with metrics.STAGE_SECONDS.time(stage="image_prepare"):
+        data, upload_info = await asyncio.to_thread(images.prepare_for_ocr, data, image_format)
+    image_base64 = base64.b64encode(data).decode("ascii")
+    
+    if stage_times is not None:
+        stage_times["upload"] = round(time.time() - upload_start, 2)
+    return image_base64, upload_info
+
+# BACKGROUND JOBS
+async def run_detection_job(job, progress):
+    """Worker handler for /jobs/detect; the result matches /detect/text, /detect/image or /detect/url"""
+    payload = job["payload"]
+    # Images were validated on submission, so they enter the pipeline as decoded
+    inputs = {"decode": payload["image"]} if job["kind"] == "image" else {job["kind"]: payload[job["kind"]]}
+    return await run_detection(inputs, ("fake_news", "clickbait"), time.time(), payload.get("mode"), on_stage=progress)
+
+job_workers = jobs.WorkerPool(jobs.job_queue, run_detection_job)
+
+# METRICS
+@metrics.collector
+def collect_cache_metrics():
+    caches = {
+        "analysis": cache.analysis_cache.stats(),
+        "ocr": cache.ocr_cache.stats(),
+        "article": cache.article_cache.stats(),
+        "near_duplicate": similarity.fake_news_index.stats(),
+    }
+    flights = {"analysis": analysis_flights.stats(), "ocr": ocr_flights.stats()}
+    yield ("karipap_cache_hits_total", "counter", "Cache lookups that returned a stored result",
+           [({"cache": name}, stats["hits"]) for name, stats in caches.items()])
+    yield ("karipap_cache_misses_total", "counter", "Cache lookups that found nothing",
+           [({"cache": name}, stats["misses"]) for name, stats in caches.items()])
+    yield ("karipap_cache_hit_ratio", "gauge", "Hits over lookups since start-up",
+           [({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()])
+    yield ("karipap_coalesced_calls_total", "counter", "Requests that joined an identical in-flight upstream call",
+           [({"kind": name}, stats["coalesced"]) for name, stats in flights.items()])
+    yield ("karipap_governor_rate_per_minute", "gauge", "Current adaptive request rate per upstream",
+           [({"service": name}, gov.bucket.rate * 60) for name, gov in governor.governors.items()])
+    yield ("karipap_circuit_open", "gauge", "1 while the upstream circuit breaker is not closed",
+           [({"service": name}, int(gov.breaker.state != "closed")) for name, gov in governor.governors.items()])
+    local = preclassifier.clickbait_preclassifier.stats()
+    yield ("karipap_preclassifier_checked_total", "counter", "Texts scored by the local clickbait pre-classifier",
+           [({}, local["checked"])])
+    yield ("karipap_preclassifier_avoided_calls_total", "counter", "Clickbait analyses answered locally instead of by Gemini",
+           [({}, local["avoided_calls"])])
+    yield ("karipap_model_answers_total", "counter", "Final Gemini verdicts by the model tier that gave them",
+           [({"analysis": analysis, "model": model_name, "tier": tier}, count)
+            for analysis, route in routing.routes.items() for (model_name, tier), count in route.answers.items()])
+    yield ("karipap_model_escalations_total", "counter", "Verdicts re-run on the next model tier, by reason",
+           [({"analysis": analysis, "model": model_name, "reason": reason}, count)
+            for analysis, route in routing.routes.items() for (model_name, reason), count in route.escalations.items()])
+    yield ("karipap_model_escalation_rate", "gauge", "Escalations per final verdict since start-up",
+           [({"analysis": analysis}, stats["escalation_rate"]) for analysis, stats in routing.stats().items()])
+    prefixes = prefix_cache.gemini_prefixes.stats()
+    yield ("karipap_prefix_caches_active", "gauge", "Prompt prefixes currently held as Gemini cachedContents",
+           [({}, len(prefixes["active"]))])
+    job_stats = job_workers.stats()
+    yield ("karipap_jobs_queued", "gauge", "Jobs waiting for a worker, per priority lane",
+           [({"lane": lane}, count) for lane, count in job_stats["queued"].items()])
+    yield ("karipap_job_workers_busy", "gauge", "Job workers currently running a job", [({}, job_stats["busy"])])
+    timings = startup.timings()
+    yield ("karipap_startup_seconds", "gauge", "Start-up phases: module import, warm-up, and time until the first response",
+           [({"phase": phase.replace("_seconds", "")}, value) for phase, value in timings.items() if value is not None])
+    yield ("karipap_ready", "gauge", "1 once /health reports ready", [({}, int(warmup.readiness(startup)[0]))])
+
+@app.middleware("http")
+async def observe_http_requests(request: Request, call_next):
+    started = time.perf_counter()
+    with metrics.HTTP_INFLIGHT.track_inprogress():
+        response = await call_next(request)
+    startup.first_response()
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        time.perf_counter() - started,
+        route=route.path if route is not None else "unmatched",
+        method=request.method
+    )
+    return response
+
+# APP LIFECYCLE
+async def warm_prompt_prefixes():
+    """Register the cacheable system instructions before the first analysis needs them"""
+    for analysis, system in prompts.SYSTEM_INSTRUCTIONS.items():
+        for model_name in routing.route(analysis).models:
+            prefix_cache.gemini_prefixes.lookup(model_name, analysis, system)
+
+@app.on_event("startup")
+async def start_background_work():
+    warmup.start(startup, GEMINI_API_KEY, GOOGLE_VISION_KEY, extra=[warm_prompt_prefixes()])
+    job_workers.start()
+
+@app.on_event("shutdown")
+async def shutdown_upstream_client():
+    await job_workers.stop()
+    await jobs.job_queue.close()
+    await upstream.close_client()
+    await cache.analysis_cache.close()
+    await cache.ocr_cache.close()
+    await articles.article_fetcher.close()
+    await prefix_cache.gemini_prefixes.close()
 
 # API ENDPOINTS
 @app.get("/")
@@ -365,22 +1462,55 @@ async def root():
         "name": "ABANG KARIPAP API",
         "version": "1.0.0",
         "status": "running",
-        "model": "gemini-2.5-flash",
+        "models": {analysis: route.models for analysis, route in routing.routes.items()},
         "endpoints": [
             "/health",
             "/detect/text",
             "/detect/image",
+            "/detect/image/upload",
+            "/detect/url",
+            "/detect/text/stream",
+            "/detect/image/stream",
+            "/detect/batch",
+            "/jobs/detect",
+            "/jobs/{job_id}",
+            "/cache/stats",
+            "/upstream/status",
+            "/metrics",
             "/diagnose/gemini"
         ]
     }
 
 @app.get("/health")
 async def health_check():
+    """Readiness probe: 200 once warm-up is done and neither API key was rejected, 503 otherwise.
+    Quota, 5xx and network errors report "degraded" with a 200."""
+    await warmup.recheck(startup, GEMINI_API_KEY, GOOGLE_VISION_KEY)
+    ready, body = warmup.readiness(startup)
+    body["models"] = {analysis: route.models for analysis, route in routing.routes.items()}
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/upstream/status")
+async def upstream_status():
+    return {service: gov.stats() for service, gov in governor.governors.items()}
+
+@app.get("/cache/stats")
+async def cache_stats():
     return {
-        "status": "healthy",
-        "model": "gemini-2.5-flash",
-        "vision_api": "configured",
-        "gemini_api": "configured"
+        "analysis": cache.analysis_cache.stats(),
+        "ocr": cache.ocr_cache.stats(),
+        "article": articles.article_fetcher.stats(),
+        "near_duplicate": similarity.fake_news_index.stats(),
+        "preclassifier": preclassifier.clickbait_preclassifier.stats(),
+        "prefix_cache": prefix_cache.gemini_prefixes.stats(),
+        "coalescing": {
+            "analysis": analysis_flights.stats(),
+            "ocr": ocr_flights.stats()
+        }
     }
 
 @app.post("/detect/text")
@@ -389,81 +1519,111 @@ async def detect_from_text(request: TextNewsRequest):
     
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
+    check_text_length(request.text)
+    check_analysis_mode(request.mode)
     
-    fake_news_result = detect_fake_news_with_gemini(request.text)
-    clickbait_result = detect_clickbait_with_gemini(request.text)
-    
-    return {
-        "input_type": "text",
-        "fake_news": fake_news_result,
-        "clickbait": clickbait_result,
-        "processing_time": round(time.time() - start_time, 2)
-    }
+    return await run_detection({"text": request.text}, ("fake_news", "clickbait"), start_time, request.mode)
 
 @app.post("/detect/image")
 async def detect_from_image(request: ImageNewsRequest):
     start_time = time.time()
+    check_analysis_mode(request.mode)
     
-    try:
-        base64.b64decode(request.image)
-    except:
-        raise HTTPException(status_code=400, detail="Invalid image data")
+    return await run_detection({"image": request.image}, ("fake_news", "clickbait"), start_time, request.mode)
+
+@app.post("/detect/url")
+async def detect_from_url(request: UrlNewsRequest):
+    """Fetch a page, extract its main article and run both analyses on the headline and body"""
+    start_time = time.time()
+    check_analysis_mode(request.mode)
     
-    ocr_result = ocr_with_google_vision(request.image)
+    return await run_detection({"url": request.url}, ("fake_news", "clickbait"), start_time, request.mode)
+
+@app.post("/detect/image/upload")
+async def detect_from_image_upload(request: Request, mode: Optional[str] = None):
+    """Same as /detect/image, but takes the image as raw bytes or a multipart 'file' field"""
+    start_time = time.time()
+    stage_times = {}
+    check_analysis_mode(mode)
     
-    if not ocr_result["success"]:
-        return {
-            "input_type": "image",
-            "fake_news": {
-                "prediction": "Error",
-                "confidence": 0,
-                "explanation": f"OCR failed: {ocr_result['error']}",
-                "key_points": []
-            },
-            "clickbait": {
-                "score": 0,
-                "prediction": "Error",
-                "confidence": 0,
-                "explanation": "OCR failed",
-                "clickbait_elements": []
-            },
-            "ocr_text": "",
-            "processing_time": round(time.time() - start_time, 2)
-        }
+    image_base64, upload_info = await read_image_upload(request, stage_times)
+    response = await run_detection({"decode": image_base64}, ("fake_news", "clickbait"), start_time, mode, stage_times)
+    response["upload"] = upload_info
+    return response
+
+@app.post("/detect/text/stream")
+async def detect_from_text_stream(request: TextNewsRequest):
+    if not request.text.strip():
+        raise HTTPException(status_code=400, detail="Text cannot be empty")
+    check_text_length(request.text)
     
-    extracted_text = ocr_result["text"]
+    return StreamingResponse(stream_detection("text", text=request.text), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/detect/image/stream")
+async def detect_from_image_stream(request: ImageNewsRequest):
+    decode_image(request.image)
     
-    if not extracted_text.strip():
-        return {
-            "input_type": "image",
-            "fake_news": {
-                "prediction": "Unknown",
-                "confidence": 0,
-                "explanation": "No text detected in image",
-                "key_points": []
-            },
-            "clickbait": {
-                "score": 0,
-                "prediction": "Unknown",
-                "confidence": 0,
-                "explanation": "No text detected",
-                "clickbait_elements": []
-            },
-            "ocr_text": "No text detected",
-            "processing_time": round(time.time() - start_time, 2)
-        }
+    return StreamingResponse(stream_detection("image", image=request.image), media_type="text/event-stream", headers=SSE_HEADERS)
+
+@app.post("/detect/batch")
+async def detect_batch(request: BatchRequest):
+    if not request.items:
+        raise HTTPException(status_code=400, detail="Batch cannot be empty")
+    if len(request.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch is limited to {BATCH_MAX_ITEMS} items")
+    if not request.analyses or any(analysis not in BATCH_ANALYSES for analysis in request.analyses):
+        raise HTTPException(status_code=400, detail=f"analyses must be chosen from: {', '.join(BATCH_ANALYSES)}")
+    for index, item in enumerate(request.items):
+        if bool(item.text and item.text.strip()) == bool(item.image):
+            raise HTTPException(status_code=400, detail=f"Item {index} needs exactly one of non-empty text or image")
+        if item.text:
+            check_text_length(item.text, index)
     
-    fake_news_result = detect_fake_news_with_gemini(extracted_text)
-    clickbait_result = detect_clickbait_with_gemini(extracted_text)
+    batch = BatchRun(request.items, list(dict.fromkeys(request.analyses)))
+    return StreamingResponse(stream_batch(batch), media_type="application/x-ndjson")
+
+@app.post("/jobs/detect", status_code=202)
+async def submit_detection_job(request: JobRequest):
+    """Queue a text, image or URL detection and return its job ID straight away"""
+    if sum(bool(value and value.strip()) for value in (request.text, request.image, request.url)) != 1:
+        raise HTTPException(status_code=400, detail="Provide exactly one of non-empty text, image or url")
+    check_analysis_mode(request.mode)
+    if request.priority not in jobs.LANES:
+        raise HTTPException(status_code=400, detail=f"priority must be one of: {', '.join(jobs.LANES)}")
     
-    return {
-        "input_type": "image",
-        "fake_news": fake_news_result,
-        "clickbait": clickbait_result,
-        "ocr_text": extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text,
-        "ocr_length": len(extracted_text),
-        "processing_time": round(time.time() - start_time, 2)
-    }
+    if request.image:
+        decode_image(request.image)
+        kind, payload = "image", {"image": request.image, "mode": request.mode}
+    elif request.url:
+        try:
+            articles.canonical_url(request.url)
+        except articles.FetchError as e:
+            raise HTTPException(status_code=e.status_code, detail=str(e))
+        kind, payload = "url", {"url": request.url, "mode": request.mode}
+    else:
+        check_text_length(request.text)
+        kind, payload = "text", {"text": request.text, "mode": request.mode}
+    
+    try:
+        job_id = await jobs.job_queue.submit(kind, payload, request.priority)
+    except jobs.QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, try again later",
+                            headers={"Retry-After": "30"})
+    job_workers.notify()
+    
+    return {"job_id": job_id, "status": "queued", "lane": request.priority, "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs")
+async def job_stats():
+    return job_workers.stats()
+
+@app.get("/jobs/{job_id}")
+async def get_detection_job(job_id: str):
+    """Progress of a queued job, and its result once finished (kept for JOB_RESULT_TTL seconds)"""
+    job = await jobs.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or its result has expired")
+    return job
 
 # Add these new endpoints to your main.py
 @app.post("/detect/text/fakenews")
@@ -472,14 +1632,9 @@ async def detect_fake_news_from_text(request: TextNewsRequest):
     
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
+    check_text_length(request.text)
     
-    fake_news_result = detect_fake_news_with_gemini(request.text)
-    
-    return {
-        "input_type": "text",
-        "fake_news": fake_news_result,
-        "processing_time": round(time.time() - start_time, 2)
-    }
+    return await run_detection({"text": request.text}, ("fake_news",), start_time)
 
 @app.post("/detect/text/clickbait")
 async def detect_clickbait_from_text(request: TextNewsRequest):
@@ -487,60 +1642,23 @@ async def detect_clickbait_from_text(request: TextNewsRequest):
     
     if not request.text.strip():
         raise HTTPException(status_code=400, detail="Text cannot be empty")
+    check_text_length(request.text)
     
-    clickbait_result = detect_clickbait_with_gemini(request.text)
-    
-    return {
-        "input_type": "text",
-        "clickbait": clickbait_result,
-        "processing_time": round(time.time() - start_time, 2)
-    }
+    return await run_detection({"text": request.text}, ("clickbait",), start_time)
 
 @app.post("/detect/image/fakenews")
 async def detect_fake_news_from_image(request: ImageNewsRequest):
+    return await run_detection({"image": request.image}, ("fake_news",), time.time())
+
+@app.post("/detect/image/fakenews/upload")
+async def detect_fake_news_from_image_upload(request: Request):
+    """Same as /detect/image/fakenews, but takes the image as raw bytes or a multipart 'file' field"""
     start_time = time.time()
+    stage_times = {}
     
-    try:
-        base64.b64decode(request.image)
-    except:
-        raise HTTPException(status_code=400, detail="Invalid image data")
-    
-    ocr_result = ocr_with_google_vision(request.image)
-    
-    if not ocr_result["success"]:
-        return {
-            "input_type": "image",
-            "fake_news": {
-                "prediction": "Error",
-                "confidence": 0,
-                "explanation": f"OCR failed: {ocr_result['error']}",
-                "key_points": []
-            },
-            "ocr_text": "",
-            "processing_time": round(time.time() - start_time, 2)
-        }
-    
-    extracted_text = ocr_result["text"]
-    
-    if not extracted_text.strip():
-        return {
-            "input_type": "image",
-            "fake_news": {
-                "prediction": "Unknown",
-                "confidence": 0,
-                "explanation": "No text detected in image",
-                "key_points": []
-            },
-            "ocr_text": "No text detected",
-            "processing_time": round(time.time() - start_time, 2)
-        }
-    
-    fake_news_result = detect_fake_news_with_gemini(extracted_text)
-    
-    return {
-        "input_type": "image",
-        "fake_news": fake_news_result,
-        "ocr_text": extracted_text[:500] + "..." if len(extracted_text) > 500 else extracted_text,
-        "ocr_length": len(extracted_text),
-        "processing_time": round(time.time() - start_time, 2)
-    }
\ No newline at end of file
+    image_base64, upload_info = await read_image_upload(request, stage_times)
+    response = await run_detection({"decode": image_base64}, ("fake_news",), start_time, stage_times=stage_times)
+    response["upload"] = upload_info
+    return response
+
+startup.imported()
@@ -0,0 +1,214 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal Prometheus text-format metrics (no client library needed). Metrics register
+# themselves on creation; collectors add values computed at scrape time.
+_registry = []
+_collectors = []
+_lock = threading.Lock()
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+SIZE_BUCKETS = (256, 1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144)
+
+
+def _format_labels(label_names, label_values, extra=None):
+    pairs = list(zip(label_names, label_values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = "untyped"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values = {}
+        with _lock:
+            _registry.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with _lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = "gauge"
+
+    def set(self, value, **labels):
+        with _lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with _lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state["counts"][index] += 1
+                    break
+            state["sum"] += value
+            state["count"] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with _lock:
+            items = sorted((key, dict(state, counts=list(state["counts"]))) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, state["counts"]):
+                cumulative += count
+                labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state['sum'])}")
+            lines.append(f"{self.name}_count{labels} {state['count']}")
+        return lines
+
+
+def collector(fn):
+    """Register fn() -> iterable of (name, type, help, [(labels dict, value), ...]) evaluated per scrape"""
+    _collectors.append(fn)
+    return fn
+
+
+def render():
+    lines = []
+    for metric in list(_registry):
+        lines.extend(metric.render())
+    for fn in _collectors:
+        for name, type_name, documentation, samples in fn():
+            lines.append(f"# HELP {name} {documentation}")
+            lines.append(f"# TYPE {name} {type_name}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+# METRICS
+STAGE_SECONDS = Histogram(
+    "karipap_stage_duration_seconds", "Time spent in each processing stage", ["stage"]
+)
+HTTP_REQUEST_SECONDS = Histogram(
+    "karipap_http_request_duration_seconds", "Time until the response starts, per route", ["route", "method"]
+)
+HTTP_INFLIGHT = Gauge("karipap_http_inflight_requests", "HTTP requests currently being handled")
+UPSTREAM_RESPONSES = Counter(
+    "karipap_upstream_responses_total", "Upstream responses by service and HTTP status", ["service", "status"]
+)
+UPSTREAM_SECONDS = Histogram(
+    "karipap_upstream_request_duration_seconds", "Latency of individual upstream HTTP attempts", ["service"]
+)
+UPSTREAM_INFLIGHT = Gauge("karipap_upstream_inflight_requests", "Upstream requests currently in flight", ["service"])
+GEMINI_PROMPT_CHARS = Histogram(
+    "karipap_gemini_prompt_chars", "Size of prompts sent to Gemini", ["analysis"], buckets=SIZE_BUCKETS
+)
+GEMINI_RESPONSE_CHARS = Histogram(
+    "karipap_gemini_response_chars", "Size of text generated by Gemini", ["analysis"], buckets=SIZE_BUCKETS
+)
+GEMINI_TOKENS = Counter(
+    "karipap_gemini_tokens_total", "Gemini token usage reported in usageMetadata", ["analysis", "kind"]
+)
+GEMINI_GENERATE_SECONDS = Histogram(
+    "karipap_gemini_generate_duration_seconds", "Gemini generateContent latency by how the static prompt prefix was sent",
+    ["analysis", "prefix"]
+)
+GEMINI_STRUCTURED_REPLIES = Counter(
+    "karipap_gemini_structured_replies_total", "Gemini JSON replies by validation outcome (valid, repaired, invalid)",
+    ["analysis", "outcome"]
+)
+JOB_WAIT_SECONDS = Histogram(
+    "karipap_job_queue_wait_seconds", "Time jobs spent queued before a worker picked them up", ["lane"],
+    buckets=LATENCY_BUCKETS + (120, 300, 600)
+)
+JOB_RUN_SECONDS = Histogram("karipap_job_run_duration_seconds", "Time workers spent running each job", ["kind"])
+ARTICLE_FETCHES = Counter(
+    "karipap_article_fetches_total", "Article lookups for /detect/url (fresh, revalidated, downloaded, error)", ["outcome"]
+)
+
+
+def timed(stage):
+    """Decorator recording a coroutine's or function's duration under STAGE_SECONDS{stage=...}"""
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with STAGE_SECONDS.time(stage=stage):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with STAGE_SECONDS.time(stage=stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# A small stage graph for the detect endpoints. Stages are declared once with the
+# names of the stages they need; an endpoint asks a Run for the outputs it wants and
+# only those stages (and what they depend on) execute. Within a run every stage
+# executes at most once and its output is shared, stages that don't depend on each
+# other run concurrently, and each stage's own duration (excluding the time spent
+# waiting for its inputs) is recorded in run.stage_times.
+
+
+class Halt(Exception):
+    """Raised by a stage when there is nothing for downstream stages to work on.
+
+    Dependents with a fallback turn it into their result instead of running, using
+    the halt's explanation and prediction (e.g. "Unknown" when an image has no text).
+    """
+
+    def __init__(self, explanation, prediction="Error"):
+        super().__init__(explanation)
+        self.explanation = explanation
+        self.prediction = prediction
+
+
+class Stage:
+    """One step of the pipeline.
+
+    run(run, *outputs of needs) is a coroutine function. `needs` is a tuple of stage
+    names, or a function of the run options returning one. With a fallback, the stage's
+    own failures and timeouts (and a Halt from its inputs) become
+    fallback(explanation, prediction) instead of propagating.
+    """
+
+    def __init__(self, name, run, needs=(), timeout=None, fallback=None):
+        self.name = name
+        self.run = run
+        self.needs = needs
+        self.timeout = timeout
+        self.fallback = fallback
+
+    def dependencies(self, options):
+        return self.needs(options) if callable(self.needs) else self.needs
+
+
+class Pipeline:
+    def __init__(self, *stages):
+        self.stages = {stage.name: stage for stage in stages}
+
+    def run(self, inputs, options=None, stage_times=None, on_stage=None):
+        """Start a run. `inputs` seed stage outputs by name (e.g. {"text": ...}); seeded stages never execute"""
+        return Run(self, inputs, options or {}, stage_times, on_stage)
+
+
+class Run:
+    def __init__(self, pipeline, inputs, options, stage_times=None, on_stage=None):
+        self.pipeline = pipeline
+        self.options = options
+        self.stage_times = stage_times if stage_times is not None else {}
+        self.on_stage = on_stage
+        self._tasks = {}
+        for name, value in inputs.items():
+            seeded = asyncio.get_running_loop().create_future()
+            seeded.set_result(value)
+            self._tasks[name] = seeded
+
+    def get(self, name):
+        """Awaitable output of a stage, started on first request and shared afterwards"""
+        task = self._tasks.get(name)
+        if task is None:
+            if name not in self.pipeline.stages:
+                raise KeyError(f"no pipeline stage or input named {name!r}")
+            task = asyncio.ensure_future(self._execute(self.pipeline.stages[name]))
+            self._tasks[name] = task
+        return task
+
+    async def results(self, *names):
+        """Outputs of several stages at once, as a dict; unfinished stages are cancelled on error"""
+        try:
+            values = await asyncio.gather(*(asyncio.shield(self.get(name)) for name in names))
+        except BaseException:
+            self.cancel()
+            raise
+        return dict(zip(names, values))
+
+    def halted(self, name):
+        """The Halt a finished stage stopped with, if any"""
+        task = self._tasks.get(name)
+        if task is None or not task.done() or task.cancelled() or not isinstance(task.exception(), Halt):
+            return None
+        return task.exception()
+
+    def cancel(self):
+        for task in self._tasks.values():
+            if not task.done():
+                task.cancel()
+
+    async def _execute(self, stage):
+        # Inputs first; failures other than Halt propagate untouched
+        needs = stage.dependencies(self.options)
+        try:
+            inputs = await asyncio.gather(*(asyncio.shield(self.get(name)) for name in needs))
+        except Halt as halt:
+            if stage.fallback is None:
+                raise
+            return stage.fallback(halt.explanation, halt.prediction)
+
+        if self.on_stage is not None:
+            await self.on_stage(stage.name)
+        started = time.time()
+        try:
+            coro = stage.run(self, *inputs)
+            return await (coro if stage.timeout is None else asyncio.wait_for(coro, stage.timeout))
+        except Halt:
+            raise
+        except asyncio.TimeoutError:
+            logger.error(f"Stage '{stage.name}' timed out after {stage.timeout}s")
+            if stage.fallback is None:
+                raise
+            return stage.fallback(f"Analysis timed out after {stage.timeout:g} seconds", "Error")
+        except Exception as e:
+            if stage.fallback is None:
+                raise
+            logger.error(f"Stage '{stage.name}' failed: {e}")
+            return stage.fallback(f"Error: {str(e)}", "Error")
+        finally:
+            self.stage_times[stage.name] = round(time.time() - started, 2)
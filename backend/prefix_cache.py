@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import time
+
+import chunking
+import upstream
+
+logger = logging.getLogger(__name__)
+
+# Gemini context caching for the static system instructions. Each (model, analysis) prefix
+# is registered once as a cachedContents resource and its TTL extended before it runs out;
+# requests then reference it by name instead of re-sending the instructions. Until a cache
+# exists, or whenever it can't be used, the instructions are sent inline as before.
+PREFIX_CACHE_ENABLED = os.getenv("PREFIX_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+PREFIX_CACHE_TTL = int(os.getenv("PREFIX_CACHE_TTL", "3600"))
+PREFIX_CACHE_REFRESH_MARGIN = int(os.getenv("PREFIX_CACHE_REFRESH_MARGIN", "300"))
+# Gemini refuses explicit caches below a per-model minimum (1,024 tokens for 2.5 Flash);
+# shorter prefixes are not worth a registration call and always go inline
+PREFIX_CACHE_MIN_TOKENS = int(os.getenv("PREFIX_CACHE_MIN_TOKENS", "1024"))
+# After a failed registration, wait this long before trying that prefix again
+PREFIX_CACHE_RETRY_AFTER = int(os.getenv("PREFIX_CACHE_RETRY_AFTER", "600"))
+
+# Statuses a generate call returns when the referenced cache expired or was deleted upstream
+STALE_CACHE_STATUS = (400, 403, 404)
+
+
+class PrefixCache:
+    """Registers static prompt prefixes as Gemini cachedContents and keeps them alive"""
+
+    def __init__(self, api_key, enabled=True):
+        self.api_key = api_key
+        self.enabled = enabled
+        self.entries = {}
+        self.retry_at = {}
+        self.tasks = {}
+        self.created = 0
+        self.refreshed = 0
+        self.failures = 0
+        self.invalidated = 0
+
+    def lookup(self, model_name, analysis, system):
+        """Name of a live cache holding this prefix, or None to send it inline.
+
+        Registration and refresh run as background tasks, so a request never waits on them.
+        """
+        if not self.enabled or not system or chunking.estimate_tokens(system) < PREFIX_CACHE_MIN_TOKENS:
+            return None
+
+        key = (model_name, analysis)
+        now = time.time()
+        entry = self.entries.get(key)
+        if entry is not None and entry["expires_at"] <= now:
+            del self.entries[key]
+            entry = None
+
+        due = entry is None or entry["expires_at"] - now < PREFIX_CACHE_REFRESH_MARGIN
+        if due and key not in self.tasks and self.retry_at.get(key, 0) <= now:
+            task = asyncio.create_task(self._register(key, system, entry))
+            self.tasks[key] = task
+            task.add_done_callback(lambda _: self.tasks.pop(key, None))
+        return entry["name"] if entry is not None else None
+
+    async def _register(self, key, system, entry):
+        model_name, analysis = key
+        base = upstream.GEMINI_BASE_URL
+        try:
+            if entry is not None:
+                response = await upstream.patch_json(
+                    f"{base}/{entry['name']}?updateMask=ttl&key={self.api_key}",
+                    {"ttl": f"{PREFIX_CACHE_TTL}s"}, timeout=10, service="gemini"
+                )
+            else:
+                response = await upstream.post_json(
+                    f"{base}/cachedContents?key={self.api_key}",
+                    {
+                        "model": f"models/{model_name}",
+                        "displayName": f"karipap-{analysis}",
+                        "systemInstruction": {"parts": [{"text": system}]},
+                        "ttl": f"{PREFIX_CACHE_TTL}s",
+                    },
+                    timeout=10, service="gemini"
+                )
+            if response.status_code != 200:
+                raise RuntimeError(f"{response.status_code} - {response.text[:200]}")
+
+            name = response.json().get("name") or entry["name"]
+            self.entries[key] = {"name": name, "expires_at": time.time() + PREFIX_CACHE_TTL}
+            if entry is None:
+                self.created += 1
+                logger.info(f"Registered {analysis} prompt prefix for {model_name} as {name}")
+            else:
+                self.refreshed += 1
+        except Exception as e:
+            self.failures += 1
+            self.retry_at[key] = time.time() + PREFIX_CACHE_RETRY_AFTER
+            logger.warning(f"Could not cache the {analysis} prompt prefix, sending it inline: {e}")
+
+    def invalidate(self, model_name, analysis):
+        """Forget a cache that upstream no longer accepts; the next lookup registers a new one"""
+        if self.entries.pop((model_name, analysis), None) is not None:
+            self.invalidated += 1
+
+    def stats(self):
+        now = time.time()
+        return {
+            "enabled": self.enabled,
+            "min_tokens": PREFIX_CACHE_MIN_TOKENS,
+            "active": {
+                f"{model}/{analysis}": {"name": entry["name"], "expires_in": round(entry["expires_at"] - now)}
+                for (model, analysis), entry in self.entries.items()
+            },
+            "created": self.created,
+            "refreshed": self.refreshed,
+            "failures": self.failures,
+            "invalidated": self.invalidated,
+        }
+
+    async def close(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+
+
+gemini_prefixes = PrefixCache(os.getenv("GEMINI_API_KEY"), PREFIX_CACHE_ENABLED)
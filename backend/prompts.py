@@ -0,0 +1,225 @@
+import textwrap
+
+# Prompt text for the Gemini analyses. The framework steps, JSON shapes and guidelines
+# are shared by the single-analysis, combined and packed instructions.
+
+FAKE_NEWS_FRAMEWORK = """1. SOURCE EVALUATION:
+   - Does the text cite specific, verifiable sources?
+   - Are there authoritative references (experts, institutions, studies)?
+   - Is there attribution for claims made?
+
+2. LANGUAGE ANALYSIS:
+   - Check for emotional manipulation (outrage, fear, sensationalism)
+   - Identify loaded language or exaggerated terms
+   - Look for absolute statements ("always," "never," "everyone")
+   - Detect clickbait patterns or hyperbolic phrasing
+
+3. FACTUAL CONSISTENCY:
+   - Are claims specific and verifiable?
+   - Does the text make impossible or highly unlikely claims?
+   - Are there internal contradictions?
+   - Is the timeline logical and consistent?
+
+4. CONTEXT ASSESSMENT:
+   - Does the text provide balanced information?
+   - Are there missing key details that would change interpretation?
+   - Is it presenting opinion as fact?
+   - Does it acknowledge complexity or nuance?
+
+5. RED FLAG IDENTIFICATION:
+   - Unsubstantiated conspiracy theories
+   - Misrepresentation of scientific consensus
+   - False equivalency or false balance
+   - Cherry-picked data or statistics
+   - Ad hominem attacks or straw man arguments"""
+
+FAKE_NEWS_JSON_FORMAT = """{
+    "prediction": "Fake" or "Not Fake" or "Uncertain",
+    "confidence": (number 0-100, based on strength of evidence),
+    "explanation": "A comprehensive explanation that references specific elements from the text and explains why it's fake/real",
+    "key_points": [
+        "Specific concerning element or verification point 1",
+        "Specific concerning element or verification point 2", 
+        "Specific concerning element or verification point 3"
+    ]
+}"""
+
+FAKE_NEWS_GUIDELINES = """- Use "Uncertain" if the text lacks enough information for a definitive judgment
+- Base confidence on: clarity of evidence, presence of verifiable claims, and strength of red flags
+- In explanation, explicitly reference words/phrases from the text
+- For "Not Fake" predictions, highlight what makes it credible
+- For "Fake" predictions, explain exactly what makes it unreliable"""
+
+CLICKBAIT_FRAMEWORK = """1. EMOTIONAL MANIPULATION CHECK:
+   - Does it provoke strong emotions (shock, anger, curiosity)?
+   - Are there emotional trigger words (unbelievable, shocking, mind-blowing)?
+   - Does it exploit fear, outrage, or FOMO (fear of missing out)?
+
+2. INFORMATION-PROMISE GAP:
+   - Does it promise more information than it delivers?
+   - Are there vague but enticing claims?
+   - Is the headline misleading relative to what you'd expect?
+
+3. CURIOSITY EXPLOITATION:
+   - Does it create curiosity without satisfying it?
+   - Uses patterns like "X will make you Y" or "This is what happens when..."
+   - Numbered lists that seem arbitrary ("10 reasons why...")
+
+4. LINGUISTIC PATTERNS:
+   - All caps or excessive punctuation
+   - Superlatives and exaggerations ("the most," "ever," "in history")
+   - Direct address to reader ("you won't believe," "you need to see")
+   - Absolute statements ("everyone is talking about")
+
+5. MANIPULATIVE TECHNIQUES:
+   - Creating false urgency
+   - Using mystery without substance
+   - Exploiting social proof ("going viral," "everyone's sharing")
+   - Making extraordinary claims without evidence"""
+
+CLICKBAIT_JSON_FORMAT = """{
+    "score": (0-100 number, where 0 = legitimate headline, 100 = extreme clickbait),
+    "prediction": "Clickbait" or "Not Clickbait",
+    "confidence": (0-100 number based on strength of indicators),
+    "explanation": "Detailed explanation referencing specific words/phrases that influenced the score",
+    "clickbait_elements": [
+        "Specific clickbait element identified 1 (quote the text)",
+        "Specific clickbait element identified 2 (quote the text)",
+        "Specific clickbait element identified 3 (quote the text)"
+    ]
+}"""
+
+CLICKBAIT_GUIDELINES = """- Score 0-30: Legitimate, informative headline
+- Score 31-60: Mild clickbait tendencies
+- Score 61-100: Strong clickbait
+- In explanation, quote specific words/phrases that are problematic
+- Clickbait elements should be concrete, quoted examples from the text"""
+
+
+def _nested(block):
+    """Indent a JSON shape so it can sit inside the combined object"""
+    return textwrap.indent(block, "    ").lstrip()
+
+
+# SYSTEM INSTRUCTIONS
+# The static part of every prompt, built once at import. It goes out as Gemini's
+# systemInstruction (or is registered once as a cachedContents prefix), so each request
+# only carries the text itself. Keyed by analysis name.
+
+FAKE_NEWS_SYSTEM = f"""You are a professional fact-checker and fake news detection expert with years of experience. Analyze the news text in the user message using a systematic verification framework.
+
+ANALYSIS FRAMEWORK (apply each step):
+
+{FAKE_NEWS_FRAMEWORK}
+
+Now, based on this systematic analysis, provide your verdict in the exact JSON format below. Be specific and reference actual content from the text in your explanation.
+
+{FAKE_NEWS_JSON_FORMAT}
+
+Important guidelines:
+{FAKE_NEWS_GUIDELINES}
+
+Return ONLY the JSON, no additional text."""
+
+CLICKBAIT_SYSTEM = f"""You are an expert in digital media analysis specializing in clickbait detection. Analyze the headline/text in the user message using a comprehensive clickbait assessment framework.
+
+CLICKBAIT ASSESSMENT FRAMEWORK:
+
+{CLICKBAIT_FRAMEWORK}
+
+Now analyze the text and provide your assessment in the exact JSON format below. Be specific about what elements contribute to clickbait score.
+
+{CLICKBAIT_JSON_FORMAT}
+
+Guidelines:
+{CLICKBAIT_GUIDELINES}
+
+Return ONLY the JSON, no additional text."""
+
+# One prompt covering both analyses, so the text is uploaded and read only once
+COMBINED_SYSTEM = f"""You are a professional fact-checker and digital media analyst. Analyze the news text in the user message twice: PART A checks it for misinformation, PART B checks it for clickbait. Keep the two assessments independent.
+
+PART A - FAKE NEWS ANALYSIS FRAMEWORK (apply each step):
+
+{FAKE_NEWS_FRAMEWORK}
+
+PART B - CLICKBAIT ASSESSMENT FRAMEWORK:
+
+{CLICKBAIT_FRAMEWORK}
+
+Now provide both assessments in the exact JSON format below. Be specific and reference actual content from the text in each explanation.
+
+{{
+    "fake_news": {_nested(FAKE_NEWS_JSON_FORMAT)},
+    "clickbait": {_nested(CLICKBAIT_JSON_FORMAT)}
+}}
+
+PART A guidelines:
+{FAKE_NEWS_GUIDELINES}
+
+PART B guidelines:
+{CLICKBAIT_GUIDELINES}
+
+Return ONLY the JSON, no additional text."""
+
+
+def _packed_system(analysis_type):
+    """Several short texts per request; each verdict carries the number of the text it belongs to"""
+    if analysis_type == "fakenews":
+        intro = "You are a professional fact-checker and fake news detection expert with years of experience."
+        framework = f"ANALYSIS FRAMEWORK (apply each step to every text):\n\n{FAKE_NEWS_FRAMEWORK}"
+        json_format = FAKE_NEWS_JSON_FORMAT
+        guidelines = f"Important guidelines:\n{FAKE_NEWS_GUIDELINES}"
+    else:
+        intro = "You are an expert in digital media analysis specializing in clickbait detection."
+        framework = f"CLICKBAIT ASSESSMENT FRAMEWORK (apply to every text):\n\n{CLICKBAIT_FRAMEWORK}"
+        json_format = CLICKBAIT_JSON_FORMAT
+        guidelines = f"Guidelines:\n{CLICKBAIT_GUIDELINES}"
+    item_format = json_format.replace("{\n", '{\n    "id": (the number of the text, e.g. 1),\n', 1)
+
+    return f"""{intro} The user message contains numbered texts. Analyze each of them on its own; do not let one text influence the verdict on another.
+
+{framework}
+
+Now provide one assessment per text in the exact JSON format below, in the same order as the texts.
+
+{{
+    "results": [
+        {textwrap.indent(item_format, "        ").lstrip()}
+    ]
+}}
+
+{guidelines}
+
+Return ONLY the JSON, no additional text."""
+
+
+SYSTEM_INSTRUCTIONS = {
+    "fakenews": FAKE_NEWS_SYSTEM,
+    "clickbait": CLICKBAIT_SYSTEM,
+    "combined": COMBINED_SYSTEM,
+    "packed_fakenews": _packed_system("fakenews"),
+    "packed_clickbait": _packed_system("clickbait"),
+}
+
+
+def article(text):
+    """The per-request user message for the single-text analyses"""
+    return f'TEXT TO ANALYZE:\n"{text}"'
+
+
+def numbered_texts(texts):
+    """The per-request user message for a packed batch"""
+    numbered = "\n\n".join(f'[{number}] "{text}"' for number, text in enumerate(texts, 1))
+    return f"""TEXTS TO ANALYZE:
+{numbered}"""
+
+
+def repair_prompt(reply):
+    """Ask for a malformed reply to be rewritten as valid JSON; the response schema does the rest"""
+    return f"""The text below was meant to be a single JSON object matching the response schema, but it is malformed or incomplete. Rewrite it as valid JSON that matches the schema. Keep the original wording and values wherever possible; do not re-analyze anything.
+
+MALFORMED REPLY:
+{reply}
+
+Return ONLY the JSON, no additional text."""
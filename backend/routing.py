@@ -0,0 +1,106 @@
+import os
+
+# Model cascade per analysis. Each analysis is first answered by the cheapest, fastest
+# model in its tier list and re-run on the next tier only when the verdict is unsure:
+# confidence below the analysis's threshold, an "Uncertain" prediction, no valid JSON,
+# or an error from the tier (e.g. 404 for a model this key can't use, or its own 429
+# quota). The last tier's verdict is always final. Tiers missing from Gemini's model
+# list (fetched at start-up) are skipped rather than failing on every request. Tiers
+# and thresholds are read per analysis, falling back to the defaults:
+#   GEMINI_MODELS=gemini-2.5-flash-lite,gemini-2.5-flash     cheapest first
+#   GEMINI_MODELS_FAKENEWS=gemini-2.5-flash,gemini-2.5-pro
+#   ESCALATE_BELOW_CONFIDENCE=70, ESCALATE_BELOW_CONFIDENCE_CLICKBAIT=60
+# A single model in the list turns the cascade off for that analysis.
+DEFAULT_MODELS = os.getenv("GEMINI_MODELS", "gemini-2.5-flash-lite,gemini-2.5-flash")
+DEFAULT_ESCALATE_BELOW = float(os.getenv("ESCALATE_BELOW_CONFIDENCE", "70"))
+
+# Packed batch analyses and the streaming path use the tiers of the analysis they pack
+ANALYSES = ("fakenews", "clickbait", "combined")
+UNSURE_PREDICTIONS = ("Uncertain",)
+
+
+def _models(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+class Route:
+    """Model tiers and escalation threshold for one analysis, with answer/escalation counts"""
+
+    def __init__(self, analysis, models, escalate_below):
+        if not models:
+            raise ValueError(f"no Gemini models configured for {analysis}")
+        self.analysis = analysis
+        self.models = models
+        self.escalate_below = escalate_below
+        self.answers = {}
+        self.escalations = {}
+
+    def tiers(self, available=None):
+        """(tier number from 1, model name) pairs to try, leaving out models missing from
+        `available`. Every tier is tried while the list is unknown or if none is in it."""
+        tiers = list(enumerate(self.models, 1))
+        if available:
+            listed = [(tier, model_name) for tier, model_name in tiers if model_name in available]
+            if listed:
+                return listed
+        return tiers
+
+    def escalation_reason(self, verdicts):
+        """Why these verdicts should go to the next tier, or None to accept them.
+
+        verdicts is a list of shaped verdicts (two for the combined analysis), or None
+        when the model gave no valid reply.
+        """
+        if verdicts is None:
+            return "invalid"
+        if any(verdict.get("prediction") in UNSURE_PREDICTIONS for verdict in verdicts):
+            return "uncertain"
+        if any(verdict.get("confidence", 0) < self.escalate_below for verdict in verdicts):
+            return "low_confidence"
+        return None
+
+    def answered(self, model_name, tier):
+        key = (model_name, tier)
+        self.answers[key] = self.answers.get(key, 0) + 1
+
+    def escalated(self, model_name, reason):
+        key = (model_name, reason)
+        self.escalations[key] = self.escalations.get(key, 0) + 1
+
+    def stats(self):
+        answered = sum(self.answers.values())
+        escalated = sum(self.escalations.values())
+        return {
+            "models": self.models,
+            "escalate_below_confidence": self.escalate_below,
+            "answered": answered,
+            "escalated": escalated,
+            # Escalations per final verdict; 0.25 means a quarter of verdicts needed a second model
+            "escalation_rate": round(escalated / answered, 4) if answered else 0.0,
+        }
+
+
+def _route(analysis):
+    suffix = analysis.upper()
+    return Route(
+        analysis,
+        _models(os.getenv(f"GEMINI_MODELS_{suffix}", DEFAULT_MODELS)),
+        float(os.getenv(f"ESCALATE_BELOW_CONFIDENCE_{suffix}", DEFAULT_ESCALATE_BELOW)),
+    )
+
+
+routes = {analysis: _route(analysis) for analysis in ANALYSES}
+
+
+def route(analysis):
+    """The Route for an analysis; "packed_fakenews" and friends share their analysis's route"""
+    return routes[analysis.replace("packed_", "")]
+
+
+def all_models():
+    """Every configured model, cheapest tiers first"""
+    return list(dict.fromkeys(name for entry in routes.values() for name in entry.models))
+
+
+def stats():
+    return {analysis: entry.stats() for analysis, entry in routes.items()}
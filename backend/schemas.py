@@ -0,0 +1,135 @@
+import copy
+
+# Response schemas for Gemini's JSON mode (generationConfig.responseSchema, an OpenAPI
+# subset). The same schemas validate what comes back, so every helper gets a dict with
+# the documented fields and types or nothing at all.
+
+FAKE_NEWS = {
+    "type": "OBJECT",
+    "properties": {
+        "prediction": {"type": "STRING", "enum": ["Fake", "Not Fake", "Uncertain"]},
+        "confidence": {"type": "INTEGER", "minimum": 0, "maximum": 100},
+        "explanation": {"type": "STRING"},
+        "key_points": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["prediction", "confidence", "explanation", "key_points"],
+    "propertyOrdering": ["prediction", "confidence", "explanation", "key_points"],
+}
+
+CLICKBAIT = {
+    "type": "OBJECT",
+    "properties": {
+        "score": {"type": "INTEGER", "minimum": 0, "maximum": 100},
+        "prediction": {"type": "STRING", "enum": ["Clickbait", "Not Clickbait"]},
+        "confidence": {"type": "INTEGER", "minimum": 0, "maximum": 100},
+        "explanation": {"type": "STRING"},
+        "clickbait_elements": {"type": "ARRAY", "items": {"type": "STRING"}},
+    },
+    "required": ["score", "prediction", "confidence", "explanation", "clickbait_elements"],
+    "propertyOrdering": ["score", "prediction", "confidence", "explanation", "clickbait_elements"],
+}
+
+COMBINED = {
+    "type": "OBJECT",
+    "properties": {"fake_news": FAKE_NEWS, "clickbait": CLICKBAIT},
+    "required": ["fake_news", "clickbait"],
+    "propertyOrdering": ["fake_news", "clickbait"],
+}
+
+ANALYSES = {"fakenews": FAKE_NEWS, "clickbait": CLICKBAIT}
+
+
+def batch_item(analysis_type):
+    """One entry of a packed reply: the single-analysis shape plus the text's number"""
+    item = copy.deepcopy(ANALYSES[analysis_type])
+    item["properties"] = {"id": {"type": "INTEGER"}, **item["properties"]}
+    item["required"] = ["id"] + item["required"]
+    item["propertyOrdering"] = ["id"] + item["propertyOrdering"]
+    return item
+
+
+def batch(analysis_type):
+    return {
+        "type": "OBJECT",
+        "properties": {"results": {"type": "ARRAY", "items": batch_item(analysis_type)}},
+        "required": ["results"],
+    }
+
+
+def conform_batch(value, analysis_type):
+    """Validate a packed reply entry by entry: {id: result} for the entries that conform"""
+    if not isinstance(value, dict) or not isinstance(value.get("results"), list):
+        raise SchemaError("$.results: expected an array")
+    item_schema = batch_item(analysis_type)
+    results = {}
+    for index, entry in enumerate(value["results"]):
+        try:
+            item = conform(entry, item_schema, f"$.results[{index}]")
+        except SchemaError:
+            continue
+        results[item.pop("id")] = item
+    return results
+
+
+def generation_config(schema):
+    return {"responseMimeType": "application/json", "responseSchema": schema}
+
+
+class SchemaError(ValueError):
+    pass
+
+
+def conform(value, schema, path="$"):
+    """Check value against schema and return a cleaned copy.
+
+    Lenient where the meaning is unambiguous: numeric strings and floats become
+    integers, numbers are clamped into range, enum values match case-insensitively and
+    unknown object keys are dropped. Anything else raises SchemaError.
+    """
+    kind = schema["type"]
+    if kind == "OBJECT":
+        if not isinstance(value, dict):
+            raise SchemaError(f"{path}: expected an object")
+        cleaned = {}
+        for name, subschema in schema["properties"].items():
+            if name in value and value[name] is not None:
+                cleaned[name] = conform(value[name], subschema, f"{path}.{name}")
+            elif name in schema.get("required", ()):
+                raise SchemaError(f"{path}.{name}: missing")
+        return cleaned
+
+    if kind == "ARRAY":
+        if not isinstance(value, list):
+            raise SchemaError(f"{path}: expected an array")
+        return [conform(item, schema["items"], f"{path}[{index}]") for index, item in enumerate(value)]
+
+    if kind in ("INTEGER", "NUMBER"):
+        if isinstance(value, bool):
+            raise SchemaError(f"{path}: expected a number")
+        if isinstance(value, str):
+            try:
+                value = float(value.strip().rstrip("%"))
+            except ValueError:
+                raise SchemaError(f"{path}: expected a number") from None
+        if not isinstance(value, (int, float)):
+            raise SchemaError(f"{path}: expected a number")
+        if "minimum" in schema:
+            value = max(schema["minimum"], value)
+        if "maximum" in schema:
+            value = min(schema["maximum"], value)
+        return int(round(value)) if kind == "INTEGER" else value
+
+    if kind == "STRING":
+        if not isinstance(value, str):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            else:
+                raise SchemaError(f"{path}: expected a string")
+        if "enum" in schema:
+            for option in schema["enum"]:
+                if option.lower() == value.strip().lower():
+                    return option
+            raise SchemaError(f"{path}: {value!r} is not one of {schema['enum']}")
+        return value
+
+    raise SchemaError(f"{path}: unsupported schema type {kind}")
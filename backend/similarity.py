@@ -0,0 +1,234 @@
+import hashlib
+import os
+import random
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+
+# Near-duplicate matching: MinHash signatures over character shingles, bucketed with LSH
+# so a lookup only compares against texts that share at least one band.
+#
+# Shingle overlap can't tell a hoax from its debunk: "Kerajaan akan memberi RM5000" and
+# "Kerajaan TIDAK akan memberi RM5000" score about 0.95. So a verdict is only reused when
+# both texts also carry the same claim markers - the same negation/debunk words and the
+# same numbers. Raising the threshold instead would not fix this (one inserted word barely
+# moves the score) and would lose the reworded copies the index exists for.
+NEAR_DUP_THRESHOLD = float(os.getenv("NEAR_DUP_THRESHOLD", "0.8"))
+NEAR_DUP_MAX_ENTRIES = int(os.getenv("NEAR_DUP_MAX_ENTRIES", "20000"))
+NEAR_DUP_TTL = int(os.getenv("NEAR_DUP_TTL", os.getenv("CACHE_TTL", "86400")))
+NEAR_DUP_MIN_SHINGLES = int(os.getenv("NEAR_DUP_MIN_SHINGLES", "8"))
+# MinHash costs 64 hashes per shingle in pure Python (about 0.15 s for 6k characters), so
+# long texts are signed over their first and last NEAR_DUP_SAMPLE_CHARS characters only.
+# Forwarded copies keep their opening and closing lines; claim markers still cover the
+# whole text, so a changed amount or negation in the middle still blocks reuse.
+NEAR_DUP_SAMPLE_CHARS = int(os.getenv("NEAR_DUP_SAMPLE_CHARS", "1000"))
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+# Chinese text has no word spaces and each character carries far more information than
+# a Latin letter, so CJK runs get shorter shingles than English/Malay runs
+CJK_SHINGLE = 2
+LATIN_SHINGLE = 5
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_rng = random.Random(1116)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+
+# Words that flip or dispute a claim; matched on the cleaned text (lowercase, punctuation removed)
+NEGATION_WORDS = (
+    "not", "no", "never", "none", "nobody", "nothing", "nor", "cannot", "isn't", "aren't", "wasn't",
+    "weren't", "don't", "doesn't", "didn't", "won't", "can't", "hasn't", "haven't", "isn", "aren",
+    "wasn", "weren", "don", "doesn", "didn", "won", "hasn", "haven", "fake", "false", "hoax", "untrue",
+    "tidak", "tak", "bukan", "tiada", "takde", "jangan", "belum", "tanpa", "palsu", "bohong", "nafi",
+)
+NEGATION_CJK = ("没有", "不是", "并非", "谣言", "辟谣", "不", "没", "未", "非", "无", "别", "勿", "假")
+_NEGATION_LATIN = re.compile(r"\b(?:" + "|".join(re.escape(word) for word in NEGATION_WORDS) + r")\b")
+_NEGATION_CJK = re.compile("|".join(re.escape(word) for word in NEGATION_CJK))
+# "RM5,000", "RM 5000" and "5000" are the same amount
+_NUMBER = re.compile(r"\d[\d,]*(?:\.\d+)?")
+
+
+def claim_markers(text):
+    """Negation/debunk words and numbers in a text; near-duplicates must agree on both"""
+    normalized = unicodedata.normalize("NFKC", text).lower()
+    cleaned = clean_text(text)
+    negations = set(_NEGATION_LATIN.findall(cleaned)) | set(_NEGATION_CJK.findall(cleaned))
+    numbers = {number.replace(",", "") for number in _NUMBER.findall(normalized)}
+    return frozenset(negations), frozenset(numbers)
+
+
+def _is_cjk(char):
+    code = ord(char)
+    return (
+        0x4E00 <= code <= 0x9FFF or 0x3400 <= code <= 0x4DBF
+        or 0x20000 <= code <= 0x2A6DF or 0xF900 <= code <= 0xFAFF
+        or 0x3040 <= code <= 0x30FF or 0xAC00 <= code <= 0xD7AF
+    )
+
+
+def clean_text(text):
+    """Lowercase and keep only letters/digits, so emoji, punctuation and spacing noise drop out"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    kept = []
+    for char in text:
+        if unicodedata.category(char)[0] in ("L", "N"):
+            kept.append(char)
+        elif kept and kept[-1] != " ":
+            kept.append(" ")
+    return "".join(kept).strip()
+
+
+def shingles(text):
+    """Split into CJK / non-CJK runs and take character n-grams from each"""
+    cleaned = clean_text(text)
+    result = set()
+    run, run_is_cjk = [], None
+    for char in cleaned + "\x00":
+        char_is_cjk = _is_cjk(char)
+        if char == "\x00" or (run and char_is_cjk != run_is_cjk):
+            segment = "".join(run).strip()
+            size = CJK_SHINGLE if run_is_cjk else LATIN_SHINGLE
+            if len(segment) <= size:
+                if segment:
+                    result.add(segment)
+            else:
+                result.update(segment[i:i + size] for i in range(len(segment) - size + 1))
+            run = []
+        run.append(char)
+        run_is_cjk = char_is_cjk
+    return result
+
+
+def sample(text):
+    """The text itself, or its first and last NEAR_DUP_SAMPLE_CHARS characters when longer"""
+    if len(text) <= 2 * NEAR_DUP_SAMPLE_CHARS:
+        return text
+    return text[:NEAR_DUP_SAMPLE_CHARS] + "\n" + text[-NEAR_DUP_SAMPLE_CHARS:]
+
+
+def _shingle_hash(shingle):
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def minhash(shingle_set):
+    hashes = [_shingle_hash(s) for s in shingle_set]
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes)
+        for a, b in _PERMUTATIONS
+    )
+
+
+def signature_similarity(sig_a, sig_b):
+    return sum(1 for x, y in zip(sig_a, sig_b) if x == y) / NUM_PERM
+
+
+def _bands(signature):
+    return [(band, signature[band * ROWS:(band + 1) * ROWS]) for band in range(BANDS)]
+
+
+class NearDuplicateIndex:
+    """Bounded MinHash/LSH index mapping previously analysed texts to their verdicts"""
+
+    def __init__(self, threshold=NEAR_DUP_THRESHOLD, max_entries=NEAR_DUP_MAX_ENTRIES, ttl=NEAR_DUP_TTL):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._buckets = {}
+        self.hits = 0
+        self.misses = 0
+        self.guarded = 0
+
+    def signature(self, text):
+        """MinHash signature, or None when the text is too short to match reliably"""
+        shingle_set = shingles(sample(text))
+        if len(shingle_set) < NEAR_DUP_MIN_SHINGLES:
+            return None
+        return minhash(shingle_set)
+
+    def fingerprint(self, text):
+        """(signature, claim markers), or None when the text is too short to match. Takes tens
+        of milliseconds on long texts, so async callers run it in a worker thread."""
+        signature = self.signature(text)
+        if signature is None:
+            return None
+        return signature, claim_markers(text)
+
+    def lookup(self, signature, markers):
+        """Return (entry_id, similarity, entry) for the best match above threshold whose
+        claim_markers() equal `markers`, or None"""
+        now = time.time()
+        candidates = set()
+        for band in _bands(signature):
+            candidates.update(self._buckets.get(band, ()))
+        best = None
+        for entry_id in candidates:
+            entry = self._entries.get(entry_id)
+            if entry is None:
+                continue
+            if entry["expires_at"] < now:
+                self._remove(entry_id)
+                continue
+            similarity = signature_similarity(signature, entry["signature"])
+            if similarity < self.threshold:
+                continue
+            if entry["markers"] != markers:
+                # Same wording, different claim (a negation or an amount changed)
+                self.guarded += 1
+                continue
+            if best is None or similarity > best[1]:
+                best = (entry_id, similarity, entry)
+        if best is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(best[0])
+        return best
+
+    def add(self, entry_id, fingerprint, text, result):
+        signature, markers = fingerprint
+        if entry_id in self._entries:
+            self._remove(entry_id)
+        self._entries[entry_id] = {
+            "signature": signature,
+            "markers": markers,
+            "preview": text[:120],
+            "result": result,
+            "expires_at": time.time() + self.ttl,
+        }
+        for band in _bands(signature):
+            self._buckets.setdefault(band, set()).add(entry_id)
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for band in _bands(entry["signature"]):
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[band]
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "guarded": self.guarded,
+        }
+
+
+fake_news_index = NearDuplicateIndex()
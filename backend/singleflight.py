@@ -0,0 +1,48 @@
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key onto one shared upstream call.
+
+    The first caller for a key starts the call as a task; everyone arriving while it
+    is in flight awaits the same task, so they all get its result, or its exception
+    (including timeouts). A waiter that gives up early does not cancel the call for
+    the others.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self._inflight = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key, fn, timeout=None):
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+        else:
+            self.calls += 1
+            call = fn() if timeout is None else asyncio.wait_for(fn(), timeout)
+            task = asyncio.ensure_future(call)
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved even if every waiter has already gone away
+        if not task.cancelled() and task.exception() is not None:
+            logger.debug(f"{self.name} single-flight call failed: {task.exception()!r}")
+
+    def stats(self):
+        total = self.calls + self.coalesced
+        return {
+            "upstream_calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": round(self.coalesced / total, 4) if total else 0.0,
+            "in_flight": len(self._inflight),
+        }
@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+import logging
+import os
+
+import httpx
+
+import governor
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# httpx logs every request URL at INFO, and our URLs carry the API keys as a query parameter
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Upstream endpoints (overridable so the backend can be pointed at a local stand-in)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta").rstrip("/")
+VISION_BASE_URL = os.getenv("VISION_BASE_URL", "https://vision.googleapis.com/v1").rstrip("/")
+
+# Pool sizing: how many upstream calls may be in flight at once, and how many idle
+# keep-alive connections we hold on to between requests
+UPSTREAM_MAX_CONCURRENCY = int(os.getenv("UPSTREAM_MAX_CONCURRENCY", "256"))
+UPSTREAM_MAX_KEEPALIVE = int(os.getenv("UPSTREAM_MAX_KEEPALIVE", "64"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "30"))
+
+_client = None
+_semaphore = None
+
+
+def get_client():
+    """Return the shared pooled AsyncClient, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=UPSTREAM_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=UPSTREAM_MAX_CONCURRENCY,
+                max_keepalive_connections=UPSTREAM_MAX_KEEPALIVE,
+            ),
+            headers={'Content-Type': 'application/json'},
+        )
+    return _client
+
+
+def _get_semaphore():
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(UPSTREAM_MAX_CONCURRENCY)
+    return _semaphore
+
+
+async def _attempt(service, request):
+    """Issue one HTTP attempt, recording its latency, status and the in-flight count"""
+    label = service or "other"
+    async with _get_semaphore():
+        with metrics.UPSTREAM_INFLIGHT.track_inprogress(service=label), metrics.UPSTREAM_SECONDS.time(service=label):
+            try:
+                response = await request()
+            except Exception:
+                metrics.UPSTREAM_RESPONSES.inc(service=label, status="error")
+                raise
+    metrics.UPSTREAM_RESPONSES.inc(service=label, status=response.status_code)
+    return response
+
+
+async def _governed(send, service):
+    if service is None:
+        return await send()
+    return await governor.governors[service].call(send)
+
+
+async def post_json(url, body, timeout=UPSTREAM_TIMEOUT, service=None):
+    """POST a JSON body upstream without blocking the event loop.
+
+    Passing a service name ("gemini" / "vision") routes the call through that
+    service's rate limiter, retry policy and circuit breaker.
+    """
+    async def send():
+        return await _attempt(service, lambda: get_client().post(url, json=body, timeout=timeout))
+    return await _governed(send, service)
+
+
+async def patch_json(url, body, timeout=UPSTREAM_TIMEOUT, service=None):
+    """PATCH a JSON body upstream (same routing as post_json)"""
+    async def send():
+        return await _attempt(service, lambda: get_client().patch(url, json=body, timeout=timeout))
+    return await _governed(send, service)
+
+
+async def get(url, timeout=UPSTREAM_TIMEOUT, service=None):
+    """GET an upstream URL without blocking the event loop"""
+    async def send():
+        return await _attempt(service, lambda: get_client().get(url, timeout=timeout))
+    return await _governed(send, service)
+
+
+@contextlib.asynccontextmanager
+async def stream_post(url, body, timeout=UPSTREAM_TIMEOUT, service=None):
+    """POST a JSON body and hand back the response while its body is still streaming.
+
+    Streams are admitted through the service governor but not retried, since part
+    of the body may already have been forwarded to the client.
+    """
+    gov = governor.governors[service] if service else None
+    probe = await gov.admit() if gov is not None else None
+    label = service or "other"
+    try:
+        async with _get_semaphore():
+            with metrics.UPSTREAM_INFLIGHT.track_inprogress(service=label):
+                try:
+                    async with get_client().stream("POST", url, json=body, timeout=timeout) as response:
+                        metrics.UPSTREAM_RESPONSES.inc(service=label, status=response.status_code)
+                        if gov is not None:
+                            gov.record(response.status_code)
+                        yield response
+                except httpx.TransportError:
+                    metrics.UPSTREAM_RESPONSES.inc(service=label, status="error")
+                    if gov is not None:
+                        gov.breaker.record_failure()
+                    raise
+    except BaseException:
+        # Cancelled (client disconnect, wait_for) before the probe had an outcome
+        if gov is not None:
+            gov.breaker.release_probe(probe)
+        raise
+
+
+async def close_client():
+    """Close the shared client (called on app shutdown)"""
+    global _client
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import os
+import time
+
+import governor
+import images
+import upstream
+
+logger = logging.getLogger(__name__)
+
+# Start-up phase run in the background as soon as the app starts: open pooled
+# connections (TLS included) to the Gemini and Vision hosts, validate both API keys
+# once, cache Gemini's model list and load lazily imported code. /health reports
+# not-ready until it is done, so a platform that waits for readiness never routes a
+# user's first analysis into a cold process.
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "2"))
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))
+# A failed check is retried by /health at most this often
+WARMUP_RECHECK_INTERVAL = float(os.getenv("WARMUP_RECHECK_INTERVAL", "30"))
+MODEL_LIST_TTL = int(os.getenv("MODEL_LIST_TTL", "3600"))
+# Only these mean the key itself is bad. A 429, a 5xx or a network error says nothing
+# about the key, so it marks the check "degraded" and the instance stays ready: pulling
+# every replica out of rotation during a quota burst would turn it into an outage.
+KEY_REJECTED_STATUSES = (400, 401, 403)
+
+
+class StartupState:
+    """Start-up timings, key checks and the cached Gemini model list"""
+
+    def __init__(self, import_started):
+        self.import_started = import_started
+        self.import_seconds = None
+        self.warmup_seconds = None
+        self.first_response_seconds = None
+        self.ready = False
+        self.checks = {}
+        self.models = None
+        self.models_fetched_at = 0.0
+        self.task = None
+        self.recheck_at = 0.0
+
+    def imported(self):
+        self.import_seconds = time.perf_counter() - self.import_started
+        logger.info(f"Application imported in {self.import_seconds:.3f}s")
+
+    def first_response(self):
+        """Called after every response; only the first one is recorded"""
+        if self.first_response_seconds is None:
+            self.first_response_seconds = time.perf_counter() - self.import_started
+            logger.info(f"First response sent {self.first_response_seconds:.3f}s after import started")
+
+    def timings(self):
+        return {
+            "import_seconds": _round(self.import_seconds),
+            "warmup_seconds": _round(self.warmup_seconds),
+            "time_to_first_response_seconds": _round(self.first_response_seconds),
+        }
+
+
+def _round(value):
+    return round(value, 3) if value is not None else None
+
+
+async def _check(request, count=1):
+    """Send `count` concurrent probes (each may open its own pooled connection); returns the check result.
+    A failed check has "ok" false, plus "degraded" true unless the key was rejected."""
+    started = time.perf_counter()
+    try:
+        responses = await asyncio.wait_for(asyncio.gather(*(request() for _ in range(count))), WARMUP_TIMEOUT)
+    except Exception as e:
+        return {"ok": False, "degraded": True, "error": f"{type(e).__name__}: {e}".rstrip(": "),
+                "latency": _round(time.perf_counter() - started)}, None
+    response = responses[0]
+    result = {"ok": response.status_code == 200, "status": response.status_code,
+              "latency": _round(time.perf_counter() - started)}
+    if response.status_code != 200:
+        result["error"] = response.text[:200]
+        if response.status_code not in KEY_REJECTED_STATUSES:
+            result["degraded"] = True
+    return result, response
+
+
+def _outcome(check):
+    if check["ok"]:
+        return "ok"
+    return "degraded" if check.get("degraded") else "FAILED"
+
+
+async def check_gemini(state, api_key, count=1):
+    """List the models: validates the key, warms the connection and fills the model list cache"""
+    if not api_key:
+        state.checks["gemini"] = {"ok": False, "error": "GEMINI_API_KEY is not set"}
+        return
+    url = f"{upstream.GEMINI_BASE_URL}/models?key={api_key}"
+    result, response = await _check(lambda: upstream.get(url, timeout=WARMUP_TIMEOUT, service="gemini"), count)
+    if result["ok"]:
+        state.models = [m["name"].replace("models/", "") for m in response.json().get("models", [])]
+        state.models_fetched_at = time.time()
+    state.checks["gemini"] = result
+
+
+async def check_vision(state, api_key, count=1):
+    """An annotate call with no images: free, but still rejects an invalid key"""
+    if not api_key:
+        state.checks["vision"] = {"ok": False, "error": "GOOGLE_VISION_KEY is not set"}
+        return
+    url = f"{upstream.VISION_BASE_URL}/images:annotate?key={api_key}"
+    result, _ = await _check(
+        lambda: upstream.post_json(url, {"requests": []}, timeout=WARMUP_TIMEOUT, service="vision"), count
+    )
+    state.checks["vision"] = result
+
+
+async def warm_up(state, gemini_key, vision_key, extra=()):
+    """Run every warm-up step concurrently; never raises"""
+    started = time.perf_counter()
+    if WARMUP_ENABLED:
+        steps = [
+            check_gemini(state, gemini_key, WARMUP_CONNECTIONS),
+            check_vision(state, vision_key, WARMUP_CONNECTIONS),
+            asyncio.to_thread(images.preload),
+            *extra,
+        ]
+        for outcome in await asyncio.gather(*steps, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                logger.warning(f"Warm-up step failed: {outcome}")
+    else:
+        state.checks = {"gemini": {"ok": True, "skipped": True}, "vision": {"ok": True, "skipped": True}}
+    state.warmup_seconds = time.perf_counter() - started
+    state.ready = True
+    state.recheck_at = time.monotonic() + WARMUP_RECHECK_INTERVAL
+    logger.info(f"Warm-up finished in {state.warmup_seconds:.3f}s: "
+                + ", ".join(f"{name} {_outcome(check)}" for name, check in state.checks.items()))
+
+
+def start(state, gemini_key, vision_key, extra=()):
+    state.task = asyncio.create_task(warm_up(state, gemini_key, vision_key, extra))
+
+
+async def recheck(state, gemini_key, vision_key):
+    """Re-run the failed and degraded key checks, rate limited, so a transient failure at start-up doesn't stick"""
+    failed = [name for name, check in state.checks.items() if not check["ok"]]
+    if not failed or time.monotonic() < state.recheck_at:
+        return
+    state.recheck_at = time.monotonic() + WARMUP_RECHECK_INTERVAL
+    checks = {"gemini": lambda: check_gemini(state, gemini_key), "vision": lambda: check_vision(state, vision_key)}
+    await asyncio.gather(*(checks[name]() for name in failed))
+
+
+async def model_list(state, gemini_key):
+    """Gemini's model list, refetched only when the cached copy is older than MODEL_LIST_TTL"""
+    if state.models is None or time.time() - state.models_fetched_at > MODEL_LIST_TTL:
+        await check_gemini(state, gemini_key)
+    return state.models
+
+
+def readiness(state):
+    """(ready, body) for /health: ready once warm-up is done and neither key was rejected.
+    A check that hit a 429, 5xx or network error, or an open circuit breaker, shows as
+    "degraded" but stays ready; requests fail fast or get the quota verdict meanwhile."""
+    circuits = {service: gov.breaker.state for service, gov in governor.governors.items()}
+    outcomes = {name: _outcome(check) for name, check in state.checks.items()}
+    ready = state.ready and "FAILED" not in outcomes.values()
+    degraded = sorted(
+        [name for name, outcome in outcomes.items() if outcome == "degraded"]
+        + [f"{service}_circuit" for service, circuit in circuits.items() if circuit != "closed"]
+    )
+    if not state.ready:
+        status = "starting"
+    elif not ready:
+        status = "unhealthy"
+    elif degraded:
+        status = "degraded"
+    else:
+        status = "healthy"
+    body = {
+        "status": status,
+        "checks": state.checks,
+        "circuits": circuits,
+        "startup": state.timings(),
+    }
+    if degraded:
+        body["degraded"] = degraded
+    return ready, body
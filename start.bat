@@ -20,7 +20,7 @@ if not exist "frontend\node_modules" (
 :: Install backend requirements
 echo Installing backend requirements...
 cd backend
-python -m pip install fastapi uvicorn python-dotenv requests pydantic python-multipart
+python -m pip install fastapi uvicorn python-dotenv httpx pydantic python-multipart Pillow
 cd ..
 
 echo.